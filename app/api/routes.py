@@ -1,15 +1,31 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.concurrency import run_in_threadpool
 from fastapi import APIRouter, Form
-import pandas as pd
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse, JSONResponse
+from starlette.background import BackgroundTask
 import asyncio
-from io import BytesIO
+import json
+import os
+from urllib.parse import quote
 from pydantic import BaseModel
-from app.services.processor import buscar_melhor_localizacao
-from app.core.config import settings
+from app.core.logs import obter_logger
+from app.core.metrics import iniciar_resumo, exportar_prometheus
+from app.core.prontidao import prontidao
 from app.services.database import salvar_endereco_editado_db
+from app.services.jobs import gerenciador_jobs, LoteResultados, executar_no_store
+from app.services.geocoder import cache_geocode, singleflight_here, limitador_here
+from app.services.ingestao import abrir_planilha
+from app.services.exportacao import FORMATOS_EXPORTACAO, gerar_xlsx, gerar_csv, gerar_circuit
+from app.services.indice_enderecos import indice_fuzzy, indice_vizinhos
+from app.services.executor_cpu import executor_cpu
+from app.services.planejador import planejador
+from app.services.pipeline import (
+    processar_blocos_em_ordem_de_conclusao,
+    limpar_valores,
+    obter_cache_linhas
+)
 
 router = APIRouter()
+log = obter_logger("api")
 
 class EnderecoEditado(BaseModel):
     endereco_normalizado: str
@@ -20,44 +36,206 @@ class EnderecoEditado(BaseModel):
 
 @router.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
-    try:
-        content = await file.read()
-        df = await run_in_threadpool(pd.read_excel, BytesIO(content))
-        df = df.reset_index(drop=True)
-    except Exception as e:
-        raise HTTPException(400, f"Erro ao ler Excel: {e}")
-
-    # máx 10 requisições simultâneas p/ API
-    sem = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
-
-    async def process_row(index, row):
-        async with sem:
-            lat, lng, is_partial, is_cond, status, endereco_normalizado = await buscar_melhor_localizacao(row)
-            return {
-                "idx": index,
-                "Geo_Latitude": lat,
-                "Geo_Longitude": lng,
-                "Partial_Match": is_partial,
-                "Cond_Match": is_cond,
-                "Status_Log": status,
-                "Endereco Normalizado": endereco_normalizado
-            }
-
-    tasks = [process_row(idx, row) for idx, row in df.iterrows()]
-    
-    #Executa tudo, 
-    results = await asyncio.gather(*tasks)
-
-    final_data = []
-    for r, original in zip(results, df.to_dict(orient="records")):
-        merged = {**original, **r}
-        final_data.append(merged)
+    resumo = iniciar_resumo()
+    planilha = await abrir_planilha(file)
+
+    results = {}
+    async for idx, original, resultado in processar_blocos_em_ordem_de_conclusao(planilha.blocos()):
+        results[idx] = limpar_valores({**original, **resultado})
+
+    final_data = [results[idx] for idx in sorted(results)]
 
     return {
         "rows": len(final_data),
-        "data": final_data
+        "data": final_data,
+        "timings": resumo.exportar()
+    }
+
+def _evento_ndjson(evento: dict) -> bytes:
+    return (json.dumps(evento, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+@router.post("/upload/stream")
+async def upload_file_stream(file: UploadFile = File(...)):
+    """
+    Mesmo processamento do /upload, mas devolve NDJSON: um evento por linha
+    geocodificada assim que ela fica pronta, com contadores de progresso.
+    O evento "end" traz o resumo de tempos do upload. "total" é estimado sem
+    ler o arquivo inteiro e pode ser null (CSV). Uma falha no meio do
+    processamento vira um evento "error" (o status HTTP já foi enviado);
+    sem "end", o cliente deve tratar o upload como incompleto.
+
+    As linhas e os resultados também são gravados em um job (job_id no
+    evento "start"), para exportar pelo /jobs/{job_id}/export sem reenviar dados.
+    """
+    resumo = iniciar_resumo()
+    planilha = await abrir_planilha(file)
+    total = planilha.total_estimado
+    store = gerenciador_jobs.store
+    job_id = await executar_no_store(store.criar_job, file.filename, [], "streaming")
+
+    async def eventos():
+        concluidas = 0
+        lote = LoteResultados(store, job_id)
+        encerrado = False
+        ingestao_completa = False
+
+        async def encerrar(status: str, erro: str = None):
+            nonlocal encerrado
+            encerrado = True
+            await lote.descarregar()
+            await executar_no_store(store.atualizar_status, job_id, status, erro)
+
+        async def blocos_gravados():
+            nonlocal ingestao_completa
+            async for bloco in gerenciador_jobs.gravar_blocos(job_id, planilha.blocos()):
+                yield bloco
+            ingestao_completa = True
+
+        try:
+            yield _evento_ndjson({"type": "start", "total": total, "job_id": job_id})
+
+            async for idx, original, resultado in processar_blocos_em_ordem_de_conclusao(blocos_gravados()):
+                concluidas += 1
+                await lote.adicionar(idx, resultado)
+                merged = limpar_valores({**original, **resultado})
+                yield _evento_ndjson({
+                    "type": "row",
+                    "done": concluidas,
+                    "total": total,
+                    "row": merged
+                })
+
+            await encerrar("done")
+            yield _evento_ndjson({
+                "type": "end",
+                "rows": concluidas,
+                "total": concluidas,
+                "job_id": job_id,
+                "timings": resumo.exportar()
+            })
+        except Exception as e:
+            log.exception("Erro no upload em stream (job %s)", job_id)
+            # Com a planilha inteira gravada o job pode ser retomado; sem ela, não
+            await encerrar("failed" if ingestao_completa else "interrupted", repr(e))
+            yield _evento_ndjson({"type": "error", "detail": str(e) or repr(e), "done": concluidas, "job_id": job_id})
+        finally:
+            if not encerrado:
+                # Cliente desconectou: o que foi gravado continua lá, mas só é
+                # retomável se a planilha chegou inteira
+                status = "failed" if ingestao_completa else "interrupted"
+                await asyncio.shield(encerrar(status, "Upload interrompido antes do fim"))
+            planilha.fechar()
+
+    return StreamingResponse(eventos(), media_type="application/x-ndjson")
+
+@router.post("/jobs")
+async def criar_job(file: UploadFile = File(...)):
+    planilha = await abrir_planilha(file)
+    job_id = await gerenciador_jobs.submeter_blocos(file.filename, planilha.blocos())
+    return await executar_no_store(gerenciador_jobs.store.obter_job, job_id)
+
+@router.get("/jobs/{job_id}")
+async def status_job(job_id: str):
+    job = await executar_no_store(gerenciador_jobs.store.obter_job, job_id)
+    if not job:
+        raise HTTPException(404, "Job não encontrado")
+    job["linhas_por_segundo"] = gerenciador_jobs.linhas_por_segundo(job_id)
+    return job
+
+@router.get("/jobs/{job_id}/results")
+async def resultados_job(job_id: str, offset: int = 0, limit: int = 500):
+    job = await executar_no_store(gerenciador_jobs.store.obter_job, job_id)
+    if not job:
+        raise HTTPException(404, "Job não encontrado")
+
+    limit = max(1, min(limit, 5000))
+    data = await executar_no_store(gerenciador_jobs.store.listar_resultados, job_id, offset, limit)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "total": job["total"],
+        "concluidas": job["concluidas"],
+        "offset": offset,
+        "rows": len(data),
+        "data": data
     }
 
+def _anexo(nome_arquivo: str) -> dict:
+    return {"Content-Disposition": f"attachment; filename*=utf-8''{quote(nome_arquivo)}"}
+
+@router.get("/jobs/{job_id}/export")
+async def exportar_job(job_id: str, formato: str = "xlsx"):
+    """
+    Exporta os resultados gravados de um job concluído, sem passar pelo
+    navegador. xlsx: abas Encontrados / Parciais / Condomínios / Não
+    encontrados; csv: uma planilha com a coluna Categoria; circuit: rota do Circuit.
+    """
+    if formato not in FORMATOS_EXPORTACAO:
+        raise HTTPException(400, f"Formato inválido. Use: {', '.join(FORMATOS_EXPORTACAO)}")
+    job = await executar_no_store(gerenciador_jobs.store.obter_job, job_id)
+    if not job:
+        raise HTTPException(404, "Job não encontrado")
+    if job["status"] == "interrupted":
+        raise HTTPException(409, "Job interrompido antes de receber a planilha inteira")
+    if job["status"] != "done":
+        raise HTTPException(409, "Job ainda não concluído")
+
+    nome = os.path.splitext(job["arquivo"] or "resultado")[0] + "_processado"
+    linhas = lambda: gerenciador_jobs.store.iterar_resultados(job_id)
+
+    if formato == "xlsx":
+        caminho = await asyncio.to_thread(gerar_xlsx, linhas)
+        return FileResponse(
+            caminho,
+            filename=f"{nome}.xlsx",
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            background=BackgroundTask(os.unlink, caminho)
+        )
+    if formato == "csv":
+        return StreamingResponse(gerar_csv(linhas), media_type="text/csv; charset=utf-8", headers=_anexo(f"{nome}.csv"))
+    return StreamingResponse(
+        gerar_circuit(linhas), media_type="text/csv; charset=utf-8", headers=_anexo(f"{nome}_CIRCUIT.csv")
+    )
+
+@router.post("/jobs/{job_id}/resume")
+async def retomar_job(job_id: str):
+    job = await executar_no_store(gerenciador_jobs.store.obter_job, job_id)
+    if not job:
+        raise HTTPException(404, "Job não encontrado")
+
+    # "ingesting"/"streaming" ainda estão recebendo linhas e "interrupted" não
+    # recebeu todas; "running" só se o worker deste processo não estiver com
+    # ele (restart no meio do job)
+    if not gerenciador_jobs.pode_retomar(job):
+        raise HTTPException(409, f"Job com status {job['status']} não pode ser retomado")
+    gerenciador_jobs.enfileirar(job_id)
+    return await executar_no_store(gerenciador_jobs.store.obter_job, job_id)
+
+@router.get("/cache/stats")
+async def estatisticas_cache():
+    cache_linhas = await asyncio.to_thread(obter_cache_linhas)
+    return {
+        **cache_geocode.estatisticas(),
+        "singleflight": singleflight_here.estatisticas(),
+        "limitador": limitador_here.estatisticas(),
+        "indice_fuzzy": {"entradas": len(indice_fuzzy), "hits": indice_fuzzy.hits},
+        "indice_vizinhos": {"quadras": len(indice_vizinhos), "hits": indice_vizinhos.hits},
+        "executor_cpu": executor_cpu.estatisticas(),
+        "cache_linhas": cache_linhas.estatisticas() if cache_linhas is not None else None,
+        "planejador": planejador.resumo()
+    }
+
+@router.get("/ready")
+async def pronto():
+    """200 quando banco e bibliotecas já foram aquecidos; 503 enquanto não."""
+    estado = prontidao.estado()
+    return JSONResponse(estado, status_code=200 if estado["pronto"] else 503)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metricas():
+    """Métricas no formato texto do Prometheus."""
+    return PlainTextResponse(exportar_prometheus(), media_type="text/plain; version=0.0.4")
+
 @router.post("/salvar_endereco_editado")
 async def salvar_endereco_editado(
     endereco_normalizado: str = Form(...),
@@ -66,11 +244,17 @@ async def salvar_endereco_editado(
     lat: float = Form(...),
     lng: float = Form(...)
 ):
-    resultado = salvar_endereco_editado_db(
+    resultado = await salvar_endereco_editado_db(
         endereco_normalizado,
         bairro,
         cidade,
         lat,
         lng
     )
+    cache_linhas = await asyncio.to_thread(obter_cache_linhas)
+    if cache_linhas is not None and "erro" not in resultado:
+        # Linhas com este endereço voltam a ser processadas (e passam a usar a correção)
+        resultado["linhas_invalidadas"] = await asyncio.to_thread(
+            cache_linhas.invalidar_endereco, endereco_normalizado
+        )
     return resultado
\ No newline at end of file
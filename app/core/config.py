@@ -4,6 +4,92 @@ class Settings:
     HERE_API_KEY = os.getenv("HERE_API_KEY")
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-    MAX_CONCURRENT_REQUESTS = 10 
+    # "supabase" (produção), "sqlite" (arquivo local) ou "memoria" (fake em processo)
+    DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "supabase")
+    DATABASE_SQLITE_PATH = os.getenv("DATABASE_SQLITE_PATH", "data/enderecos.db")
+    DB_PREFETCH_CHUNK = int(os.getenv("DB_PREFETCH_CHUNK", "100"))
+    DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "8"))
+    DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "5"))
+    DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "200"))
+    DB_WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "5"))
+    HERE_GEOCODE_URL = os.getenv("HERE_GEOCODE_URL", "https://geocode.search.hereapi.com/v1/geocode")
+    HERE_TIMEOUT = float(os.getenv("HERE_TIMEOUT", "10"))
+    # Linhas processadas em paralelo por upload/job
+    MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
+    # Limites da HERE para o processo inteiro (todos os uploads somados).
+    # HERE_QPS=0: sem teto fixo, a concorrência adaptativa (429/Retry-After) acha o limite
+    HERE_QPS = float(os.getenv("HERE_QPS", "0"))
+    HERE_BURST = float(os.getenv("HERE_BURST", "10"))
+    HERE_MIN_CONCURRENCY = int(os.getenv("HERE_MIN_CONCURRENCY", "1"))
+    HERE_MAX_CONCURRENCY = int(os.getenv("HERE_MAX_CONCURRENCY", "10"))
+    HERE_MAX_RETRIES = int(os.getenv("HERE_MAX_RETRIES", "3"))
+    HERE_BACKOFF_BASE = float(os.getenv("HERE_BACKOFF_BASE", "0.5"))
+    HERE_BACKOFF_MAX = float(os.getenv("HERE_BACKOFF_MAX", "10"))
+    # Geocoding em lote para jobs grandes (POST /jobs), via um proxy de lote
+    # (contrato em app/services/geocoder_lote.py). "auto": lote a partir de
+    # BATCH_PROXY_MIN_ROWS linhas, se BATCH_PROXY_URL estiver configurada | "consulta" | "lote"
+    GEOCODER_BACKEND = os.getenv("GEOCODER_BACKEND", "auto")
+    BATCH_PROXY_URL = os.getenv("BATCH_PROXY_URL", "")
+    BATCH_PROXY_MIN_ROWS = int(os.getenv("BATCH_PROXY_MIN_ROWS", "2000"))
+    BATCH_PROXY_POLL_INTERVAL = float(os.getenv("BATCH_PROXY_POLL_INTERVAL", "2"))
+    BATCH_PROXY_TIMEOUT = float(os.getenv("BATCH_PROXY_TIMEOUT", "900"))
+    # "sequential": uma estratégia por vez | "hedged": estratégias em paralelo, cancela no primeiro score 100
+    SEARCH_MODE = os.getenv("SEARCH_MODE", "sequential")
+    HEDGE_STAGGER_MS = float(os.getenv("HEDGE_STAGGER_MS", "100"))
+    # Ordem das estratégias aprendida por (cidade, bairro, padrão do endereço):
+    # "on" | "shadow" (só coleta estatísticas) | "off". Caminho vazio: estatísticas só em memória
+    PLANNER_MODE = os.getenv("PLANNER_MODE", "on")
+    PLANNER_STATS_PATH = os.getenv("PLANNER_STATS_PATH", "data/planner_stats.db")
+    PLANNER_MIN_SAMPLES = int(os.getenv("PLANNER_MIN_SAMPLES", "20"))
+    PLANNER_SKIP_RATE = float(os.getenv("PLANNER_SKIP_RATE", "0.05"))
+    PLANNER_EXPLORE = float(os.getenv("PLANNER_EXPLORE", "0.05"))
+    # Ingestão em blocos: linhas por bloco, blocos lidos à frente e linhas lidas
+    # ainda não entregues (limita a memória independente do tamanho do arquivo)
+    INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "500"))
+    INGEST_QUEUE_CHUNKS = int(os.getenv("INGEST_QUEUE_CHUNKS", "2"))
+    INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "1000"))
+    UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "")
+    # Normalização e pontuação de candidatos: "inline" (pontua no event loop,
+    # normaliza no pool padrão de threads) | "thread" | "process" (CPU_WORKERS processos)
+    CPU_EXECUTOR = os.getenv("CPU_EXECUTOR", "inline")
+    CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0")) or os.cpu_count() or 1
+    CPU_BATCH_MAX = int(os.getenv("CPU_BATCH_MAX", "64"))
+    MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.db")
+    # Resultados das linhas de um job são gravados em lote: a cada N linhas ou a cada intervalo segundos
+    JOBS_WRITE_BATCH_SIZE = int(os.getenv("JOBS_WRITE_BATCH_SIZE", "200"))
+    JOBS_WRITE_FLUSH_INTERVAL = float(os.getenv("JOBS_WRITE_FLUSH_INTERVAL", "1"))
+
+    # Cache de respostas da HERE (memória + disco). Caminho vazio desliga o disco.
+    GEOCODE_CACHE_MAX_ITENS = int(os.getenv("GEOCODE_CACHE_MAX_ITENS", "20000"))
+    GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+    GEOCODE_CACHE_TTL_NEGATIVO = float(os.getenv("GEOCODE_CACHE_TTL_NEGATIVO", str(24 * 3600)))
+    GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "data/geocode_cache.db")
+    # Disco: no máximo N respostas (0 = sem limite), gravadas em lote a cada N novas ou intervalo segundos
+    GEOCODE_CACHE_DISK_MAX_ROWS = int(os.getenv("GEOCODE_CACHE_DISK_MAX_ROWS", "500000"))
+    GEOCODE_CACHE_WRITE_BATCH_SIZE = int(os.getenv("GEOCODE_CACHE_WRITE_BATCH_SIZE", "200"))
+    GEOCODE_CACHE_FLUSH_INTERVAL = float(os.getenv("GEOCODE_CACHE_FLUSH_INTERVAL", "2"))
+    # Cache do resultado completo de cada linha (reenvio da mesma planilha). Caminho vazio desliga.
+    ROW_CACHE_PATH = os.getenv("ROW_CACHE_PATH", "data/row_cache.db")
+    ROW_CACHE_TTL = float(os.getenv("ROW_CACHE_TTL", str(7 * 24 * 3600)))
+
+    # Pool HTTP compartilhado (keep-alive com a HERE)
+    HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+    HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+    # Índice local dos endereços já geocodificados (variações de grafia sem chamar a HERE)
+    FUZZY_INDEX_ENABLED = os.getenv("FUZZY_INDEX_ENABLED", "1") == "1"
+    FUZZY_INDEX_MIN_SCORE = float(os.getenv("FUZZY_INDEX_MIN_SCORE", "90"))
+    # Interpolação entre lotes vizinhos da mesma quadra (NEIGHBOR_INTERPOLATED)
+    NEIGHBOR_INDEX_ENABLED = os.getenv("NEIGHBOR_INDEX_ENABLED", "1") == "1"
+    NEIGHBOR_MAX_GAP = int(os.getenv("NEIGHBOR_MAX_GAP", "10"))
+
+    # Logs: nível do logger "geoprocessor", formato ("json" ou "texto") e fração
+    # das linhas com rastreio de candidatos (só aparece com LOG_LEVEL=DEBUG)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_CANDIDATE_SAMPLE_RATE = float(os.getenv("LOG_CANDIDATE_SAMPLE_RATE", "0.01"))
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from app.core.config import settings
+
+# Contexto da linha em processamento. Cada tarefa asyncio recebe uma cópia,
+# então linhas e estratégias em paralelo não se misturam.
+ctx_linha = ContextVar("ctx_linha", default=None)
+ctx_estrategia = ContextVar("ctx_estrategia", default=None)
+ctx_job = ContextVar("ctx_job", default=None)
+_ctx_rastrear = ContextVar("_ctx_rastrear", default=False)
+
+CAMPOS_CONTEXTO = ("idx", "estrategia", "job")
+
+logger = logging.getLogger("geoprocessor")
+logger_candidatos = logging.getLogger("geoprocessor.candidatos")
+
+_listener = None
+
+
+def obter_logger(nome: str) -> logging.Logger:
+    """obter_logger("processor") -> logger "geoprocessor.processor"."""
+    return logging.getLogger(f"geoprocessor.{nome}")
+
+
+class FiltroContexto(logging.Filter):
+    """Copia as ContextVars para o registro ainda na tarefa de origem (antes da fila)."""
+
+    def filter(self, record):
+        record.idx = ctx_linha.get()
+        record.estrategia = ctx_estrategia.get()
+        record.job = ctx_job.get()
+        return True
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro; campos de contexto vazios são omitidos."""
+
+    def format(self, record):
+        dados = {
+            "ts": round(record.created, 3),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for campo in CAMPOS_CONTEXTO:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                dados[campo] = valor
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FormatadorTexto(logging.Formatter):
+    def format(self, record):
+        contexto = " ".join(
+            f"{campo}={getattr(record, campo)}"
+            for campo in CAMPOS_CONTEXTO
+            if getattr(record, campo, None) is not None
+        )
+        hora = time.strftime("%H:%M:%S", time.localtime(record.created))
+        texto = f"{hora} {record.levelname:<7} {record.name} {record.getMessage()}"
+        if contexto:
+            texto += f" [{contexto}]"
+        if record.exc_info:
+            texto += "\n" + self.formatException(record.exc_info)
+        return texto
+
+
+def iniciar_logging():
+    """
+    Liga o logger "geoprocessor": o registro entra numa fila em memória
+    (QueueHandler) e uma thread (QueueListener) escreve no stdout, então
+    o event loop nunca espera I/O de log. Chamadas repetidas não duplicam handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatador = FormatadorJSON() if settings.LOG_FORMAT == "json" else FormatadorTexto()
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(formatador)
+
+    fila = queue.SimpleQueue()
+    entrada = QueueHandler(fila)
+    entrada.addFilter(FiltroContexto())
+
+    logger.handlers = [entrada]
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.propagate = False
+
+    _listener = QueueListener(fila, saida)
+    _listener.start()
+
+
+def parar_logging():
+    """Esvazia a fila e encerra a thread de escrita."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        logger.handlers = []
+        logger.propagate = True
+
+
+def amostrar_linha() -> bool:
+    """
+    Sorteia se a linha atual terá o rastreio detalhado de candidatos
+    (LOG_CANDIDATE_SAMPLE_RATE, com geoprocessor.candidatos em DEBUG).
+    """
+    rastrear = (
+        settings.LOG_CANDIDATE_SAMPLE_RATE > 0
+        and logger_candidatos.isEnabledFor(logging.DEBUG)
+        and random.random() < settings.LOG_CANDIDATE_SAMPLE_RATE
+    )
+    _ctx_rastrear.set(rastrear)
+    return rastrear
+
+
+def linha_rastreada() -> bool:
+    return _ctx_rastrear.get()
@@ -0,0 +1,215 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Buckets em segundos: de consultas em memória (~1ms) a chamadas lentas da HERE
+BUCKETS_PADRAO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registro = []
+_coletores = []
+
+# Resumo de tempos do upload atual (ver iniciar_resumo). As tarefas das linhas
+# herdam o contexto, então todas gravam no mesmo objeto.
+_ctx_resumo = ContextVar("_ctx_resumo", default=None)
+
+
+def _rotulos(nomes, valores) -> str:
+    if not nomes:
+        return ""
+    pares = ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores))
+    return "{" + pares + "}"
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._valores = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = tuple(rotulos.get(n, "") for n in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos) -> float:
+        return self._valores.get(tuple(rotulos.get(n, "") for n in self.rotulos), 0)
+
+    def exportar(self) -> list:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for chave, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}")
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = (), buckets: tuple = BUCKETS_PADRAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def observar(self, valor: float, **rotulos):
+        chave = tuple(rotulos.get(n, "") for n in self.rotulos)
+        posicao = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                # [contagem por bucket (+Inf no fim), soma, total]
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self) -> list:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        nomes = self.rotulos + ("le",)
+        with self._lock:
+            for chave, (contagens, soma, total) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, contagem in zip(self.buckets + ("+Inf",), contagens):
+                    acumulado += contagem
+                    le = limite if limite == "+Inf" else _numero(float(limite))
+                    linhas.append(f"{self.nome}_bucket{_rotulos(nomes, chave + (le,))} {acumulado}")
+                linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}")
+                linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {total}")
+        return linhas
+
+
+def registrar_coletor(funcao):
+    """
+    funcao() -> [(nome, tipo, ajuda, {rotulos}, valor), ...], lida a cada scrape.
+    Usado para expor contadores que já existem em outros objetos (cache, limitador).
+    """
+    _coletores.append(funcao)
+    return funcao
+
+
+def exportar_prometheus() -> str:
+    linhas = []
+    for metrica in _registro:
+        linhas.extend(metrica.exportar())
+
+    vistos = set()
+    for coletor in _coletores:
+        for nome, tipo, ajuda, rotulos, valor in coletor():
+            if nome not in vistos:
+                vistos.add(nome)
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+            linhas.append(f"{nome}{_rotulos(tuple(rotulos), tuple(rotulos.values()))} {_numero(valor)}")
+    return "\n".join(linhas) + "\n"
+
+
+# --- Métricas da aplicação ---
+
+tempo_etapa = Histograma(
+    "geoprocessor_etapa_duracao_segundos",
+    "Duração de cada etapa do processamento",
+    ("etapa",)
+)
+tempo_estrategia = Histograma(
+    "geoprocessor_estrategia_duracao_segundos",
+    "Duração de cada estratégia de busca (consulta HERE + pontuação)",
+    ("estrategia",)
+)
+chamadas_here = Contador(
+    "geoprocessor_here_chamadas_total",
+    "Chamadas à HERE (após retentativas) por status final",
+    ("status",)
+)
+consultas_proxy_lote = Contador(
+    "geoprocessor_proxy_lote_consultas_total",
+    "Consultas enviadas ao proxy de geocoding em lote, por resultado (fallback: resolvida por consulta individual)",
+    ("resultado",)
+)
+consultas_banco = Contador(
+    "geoprocessor_banco_consultas_total",
+    "Endereços procurados na base de endereços conhecidos, por resultado",
+    ("resultado",)
+)
+linhas_processadas = Contador(
+    "geoprocessor_linhas_total",
+    "Linhas processadas por Status_Log",
+    ("status",)
+)
+
+
+class ResumoTempos:
+    """Tempos agregados de um único upload, devolvidos junto com os resultados."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.linhas = 0
+
+    def adicionar(self, etapa: str, segundos: float):
+        dados = self.etapas.get(etapa)
+        if dados is None:
+            dados = self.etapas[etapa] = [0, 0.0, 0.0]
+        dados[0] += 1
+        dados[1] += segundos
+        dados[2] = max(dados[2], segundos)
+
+    def exportar(self) -> dict:
+        total = time.perf_counter() - self.inicio
+        return {
+            "total_ms": round(total * 1000, 1),
+            "linhas": self.linhas,
+            "linhas_por_segundo": round(self.linhas / total, 2) if total > 0 else None,
+            "etapas": {
+                etapa: {
+                    "n": n,
+                    "total_ms": round(soma * 1000, 1),
+                    "media_ms": round(soma * 1000 / n, 2),
+                    "max_ms": round(maximo * 1000, 1)
+                }
+                for etapa, (n, soma, maximo) in self.etapas.items()
+            }
+        }
+
+
+def iniciar_resumo() -> ResumoTempos:
+    resumo = ResumoTempos()
+    _ctx_resumo.set(resumo)
+    return resumo
+
+
+def observar_etapa(etapa: str, segundos: float):
+    tempo_etapa.observar(segundos, etapa=etapa)
+    resumo = _ctx_resumo.get()
+    if resumo is not None:
+        resumo.adicionar(etapa, segundos)
+
+
+@contextmanager
+def cronometrar(etapa: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar_etapa(etapa, time.perf_counter() - inicio)
+
+
+def contar_linha(status: str):
+    # "FUZZY_DB_MATCH (97)" -> "FUZZY_DB_MATCH": o score não vira rótulo
+    linhas_processadas.inc(status=status.split(" (")[0])
+    resumo = _ctx_resumo.get()
+    if resumo is not None:
+        resumo.linhas += 1
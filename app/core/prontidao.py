@@ -0,0 +1,48 @@
+import asyncio
+import inspect
+import time
+from app.core.logs import obter_logger
+
+log = obter_logger("prontidao")
+
+
+class Prontidao:
+    """
+    Componentes pesados aquecidos em segundo plano pelo lifespan. O servidor
+    aceita requisições logo que sobe (o que não estiver pronto é criado no
+    primeiro uso); /ready só responde 200 quando os obrigatórios terminaram.
+    """
+
+    def __init__(self):
+        self._componentes = {}
+
+    def aquecer(self, nome: str, funcao, obrigatorio: bool = True) -> asyncio.Task:
+        """
+        Registra o componente e o aquece numa tarefa. funcao: coroutine
+        function, ou função bloqueante (roda numa thread).
+        """
+        self._componentes[nome] = {"pronto": False, "obrigatorio": obrigatorio, "ms": None, "erro": None}
+        return asyncio.create_task(self._executar(self._componentes[nome], nome, funcao))
+
+    async def _executar(self, componente: dict, nome: str, funcao):
+        inicio = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(funcao):
+                await funcao()
+            else:
+                await asyncio.to_thread(funcao)
+            componente["pronto"] = True
+        except Exception as e:
+            log.warning("Falha ao aquecer %s: %r", nome, e)
+            componente["erro"] = repr(e)
+        finally:
+            componente["ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    def pronto(self) -> bool:
+        return all(c["pronto"] for c in self._componentes.values() if c["obrigatorio"])
+
+    def estado(self) -> dict:
+        return {"pronto": self.pronto(), "componentes": {nome: dict(c) for nome, c in self._componentes.items()}}
+
+
+prontidao = Prontidao()
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.services.write_behind import BufferEscrita
+
+_ESPACOS = re.compile(r"\s+")
+_ESPACO_VIRGULA = re.compile(r"\s*,\s*")
+
+
+def normalizar_chave(query: str) -> str:
+    """'rua  rc-010 ,12-5, goiânia' -> 'RUA RC-010, 12-5, GOIÂNIA'"""
+    texto = _ESPACOS.sub(" ", str(query).strip().upper())
+    return _ESPACO_VIRGULA.sub(", ", texto)
+
+
+class LRUComTTL:
+    """Dicionário LRU limitado por tamanho, com expiração por item."""
+
+    def __init__(self, max_itens: int, ttl: float):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self.evictions = 0
+
+    def obter(self, chave):
+        item = self._dados.get(chave)
+        if item is None:
+            return None
+        expira_em, valor = item
+        if expira_em < time.time():
+            del self._dados[chave]
+            return None
+        self._dados.move_to_end(chave)
+        return valor
+
+    def contem(self, chave) -> bool:
+        """Como obter(), mas sem mexer na ordem do LRU."""
+        item = self._dados.get(chave)
+        return item is not None and item[0] >= time.time()
+
+    def salvar(self, chave, valor, expira_em: float = None):
+        self._dados[chave] = (expira_em or time.time() + self.ttl, valor)
+        self._dados.move_to_end(chave)
+        while len(self._dados) > self.max_itens:
+            self._dados.popitem(last=False)
+            self.evictions += 1
+
+    def remover(self, chave):
+        self._dados.pop(chave, None)
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class CacheDisco:
+    """
+    Camada persistente em SQLite: sobrevive a restarts e é compartilhada entre
+    workers. Síncrona: o CacheGeocode só a usa na thread dele. limpar() apaga
+    os vencidos e, acima de max_linhas, os que vencem primeiro.
+
+    O número de linhas é mantido em memória (sem COUNT(*) a cada limpar()) e
+    recontado a cada RECONTAR_A_CADA limpezas, para incluir o que outros
+    workers gravaram.
+    """
+    RECONTAR_A_CADA = 100
+
+    def __init__(self, caminho: str, max_linhas: int = 0):
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.max_linhas = max_linhas
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                chave TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                items TEXT NOT NULL,
+                expira_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS geocode_cache_expira_em ON geocode_cache (expira_em);
+        """)
+        self._conn.commit()
+        self._linhas = self._contar()
+        self._limpezas = 0
+
+    def _contar(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+
+    def obter(self, chave):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, items, expira_em FROM geocode_cache WHERE chave = ?", (chave,)
+            ).fetchone()
+        # Vencido: fica para o próximo limpar()
+        if not row or row[2] < time.time():
+            return None
+        return (json.loads(row[1]), row[0]), row[2]
+
+    def salvar_lote(self, registros: list):
+        """registros: [{"chave", "items", "status", "expira_em"}, ...], um commit só."""
+        chaves = list({r["chave"] for r in registros})
+        with self._lock:
+            # Só chaves novas aumentam a contagem (INSERT OR REPLACE também conta as trocadas)
+            existentes = 0
+            for inicio in range(0, len(chaves), 500):
+                bloco = chaves[inicio:inicio + 500]
+                existentes += self._conn.execute(
+                    f"SELECT COUNT(*) FROM geocode_cache WHERE chave IN ({','.join('?' * len(bloco))})", bloco
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO geocode_cache (chave, status, items, expira_em) VALUES (?, ?, ?, ?)",
+                (
+                    (r["chave"], r["status"], json.dumps(r["items"], ensure_ascii=False), r["expira_em"])
+                    for r in registros
+                )
+            )
+            self._conn.commit()
+            self._linhas += len(chaves) - existentes
+
+    def limpar(self) -> int:
+        """Número de linhas removidas."""
+        with self._lock:
+            removidas = self._conn.execute(
+                "DELETE FROM geocode_cache WHERE expira_em < ?", (time.time(),)
+            ).rowcount
+            self._limpezas += 1
+            if self._limpezas % self.RECONTAR_A_CADA == 0:
+                self._linhas = self._contar()
+            else:
+                self._linhas = max(0, self._linhas - removidas)
+            if self.max_linhas:
+                excesso = self._linhas - self.max_linhas
+                if excesso > 0:
+                    cortadas = self._conn.execute(
+                        "DELETE FROM geocode_cache WHERE chave IN "
+                        "(SELECT chave FROM geocode_cache ORDER BY expira_em LIMIT ?)",
+                        (excesso,)
+                    ).rowcount
+                    self._linhas -= cortadas
+                    removidas += cortadas
+            self._conn.commit()
+        return removidas
+
+    def __len__(self):
+        return self._linhas
+
+
+class CacheGeocode:
+    """
+    Cache de respostas da HERE em dois níveis: LRU em memória + SQLite em disco.
+    Resultados OK e NOT_FOUND ficam em caches separados; o negativo expira antes.
+    Erros (API_ERROR, EXCEPTION, NO_KEY) nunca são cacheados.
+
+    O disco fica fora do event loop: leituras (e a abertura do SQLite) rodam
+    numa thread própria e as gravações vão em lote (write-behind), a cada
+    lote_disco respostas ou intervalo_disco segundos, cada lote seguido da
+    limpeza dos vencidos e do excesso sobre max_linhas_disco. iniciar() e
+    parar() ligam o timer e descarregam o que faltar.
+    """
+
+    def __init__(self, max_itens: int, ttl: float, ttl_negativo: float, caminho_disco: str = None,
+                 max_linhas_disco: int = 0, lote_disco: int = 200, intervalo_disco: float = 2.0):
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.positivo = LRUComTTL(max_itens, ttl)
+        self.negativo = LRUComTTL(max(1, max_itens // 4), ttl_negativo)
+        self.caminho_disco = caminho_disco
+        self.max_linhas_disco = max_linhas_disco
+        self._disco = None
+        self._lock_disco = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocode_cache")
+        self._escrita = BufferEscrita(self._gravar_lote_disco, "chave", lote_disco, intervalo_disco)
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.hits_negativos = 0
+        self.misses = 0
+        self.removidas_disco = 0
+
+    @property
+    def disco(self):
+        # Usado só na thread do cache: abrir o SQLite não trava o event loop
+        with self._lock_disco:
+            if self._disco is None and self.caminho_disco:
+                self._disco = CacheDisco(self.caminho_disco, self.max_linhas_disco)
+        return self._disco
+
+    async def _no_disco(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, funcao, *args)
+
+    async def obter(self, query: str):
+        chave = normalizar_chave(query)
+
+        valor = self.positivo.obter(chave)
+        if valor is not None:
+            self.hits_memoria += 1
+            return valor
+
+        valor = self.negativo.obter(chave)
+        if valor is not None:
+            self.hits_negativos += 1
+            return valor
+
+        if self.caminho_disco:
+            encontrado = await self._no_disco(self._obter_disco, chave)
+            if encontrado:
+                valor, expira_em = encontrado
+                self._camada_memoria(valor[1]).salvar(chave, valor, expira_em)
+                self.hits_disco += 1
+                return valor
+
+        self.misses += 1
+        return None
+
+    def contem(self, query: str) -> bool:
+        """Se a consulta está em memória. Não conta nas estatísticas nem lê o disco."""
+        chave = normalizar_chave(query)
+        return self.positivo.contem(chave) or self.negativo.contem(chave)
+
+    def salvar(self, query: str, items: list, status: str):
+        if status == "OK":
+            ttl = self.ttl
+        elif status == "NOT_FOUND":
+            ttl = self.ttl_negativo
+        else:
+            return
+
+        chave = normalizar_chave(query)
+        expira_em = time.time() + ttl
+        self._camada_memoria(status).salvar(chave, (items, status), expira_em)
+        if self.caminho_disco:
+            self._escrita.adicionar({"chave": chave, "items": items, "status": status, "expira_em": expira_em})
+
+    def _obter_disco(self, chave):
+        return self.disco.obter(chave)
+
+    def _salvar_disco(self, registros: list):
+        self.disco.salvar_lote(registros)
+        self.removidas_disco += self.disco.limpar()
+
+    async def _gravar_lote_disco(self, registros: list):
+        await self._no_disco(self._salvar_disco, registros)
+
+    async def iniciar(self):
+        if self.caminho_disco:
+            await self._escrita.iniciar()
+
+    async def parar(self):
+        await self._escrita.parar()
+
+    def _camada_memoria(self, status: str) -> LRUComTTL:
+        return self.positivo if status == "OK" else self.negativo
+
+    def estatisticas(self) -> dict:
+        return {
+            "hits_memoria": self.hits_memoria,
+            "hits_disco": self.hits_disco,
+            "hits_negativos": self.hits_negativos,
+            "misses": self.misses,
+            "evictions": self.positivo.evictions + self.negativo.evictions,
+            "itens_memoria": len(self.positivo),
+            "itens_negativos": len(self.negativo),
+            "disco_pendentes": len(self._escrita),
+            "disco_removidas": self.removidas_disco
+        }
+
+
+class CacheLinhas:
+    """
+    Resultado completo de cada linha da planilha, endereçado pelo conteúdo
+    (ver processor.chave_resultado). Guarda também o endereço normalizado do
+    resultado, para invalidar as linhas de um endereço corrigido manualmente.
+    """
+
+    # Limite de parâmetros por consulta do SQLite
+    LOTE_SQL = 500
+
+    def __init__(self, caminho: str, ttl: float):
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_linhas (
+                chave TEXT PRIMARY KEY,
+                endereco_normalizado TEXT,
+                resultado TEXT NOT NULL,
+                expira_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_linhas_endereco ON cache_linhas (endereco_normalizado);
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.invalidadas = 0
+
+    def obter_lote(self, chaves) -> dict:
+        """{chave: resultado} das chaves em cache e ainda válidas."""
+        chaves = list(chaves)
+        agora = time.time()
+        encontrados = {}
+        with self._lock:
+            for inicio in range(0, len(chaves), self.LOTE_SQL):
+                parte = chaves[inicio:inicio + self.LOTE_SQL]
+                marcadores = ",".join("?" * len(parte))
+                for chave, resultado in self._conn.execute(
+                    f"SELECT chave, resultado FROM cache_linhas WHERE chave IN ({marcadores}) AND expira_em >= ?",
+                    (*parte, agora)
+                ):
+                    encontrados[chave] = json.loads(resultado)
+        self.hits += len(encontrados)
+        self.misses += len(chaves) - len(encontrados)
+        return encontrados
+
+    def salvar_lote(self, itens: list):
+        """itens: [(chave, resultado), ...]"""
+        expira_em = time.time() + self.ttl
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache_linhas (chave, endereco_normalizado, resultado, expira_em) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (chave, resultado.get("Endereco Normalizado"), json.dumps(resultado, ensure_ascii=False), expira_em)
+                    for chave, resultado in itens
+                )
+            )
+            self._conn.commit()
+
+    def invalidar_endereco(self, endereco_normalizado: str) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM cache_linhas WHERE endereco_normalizado = ?", (endereco_normalizado,)
+            )
+            self._conn.commit()
+        self.invalidadas += cur.rowcount
+        return cur.rowcount
+
+    def estatisticas(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "invalidadas": self.invalidadas}
@@ -1,98 +1,338 @@
-from supabase import create_client, Client
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from app.core.config import settings
+from app.core.logs import obter_logger
+from app.core.metrics import cronometrar
+from app.services.write_behind import BufferEscrita
+from app.services.indice_enderecos import atualizar_indices
 
-if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
-    print("AVISO: SUPABASE_URL ou SUPABASE_KEY não configurados no config.py")
-    supabase = None
-else:
-    supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+TABELA = "enderecos_processados"
+COLUNAS = ["endereco_normalizado", "bairro", "cidade", "lat", "lng"]
 
-def salvar_endereco_encontrado(dados: dict):
-    if not supabase:
-        return
+log = obter_logger("database")
 
-    try:
-        endereco_norm = dados.get("endereco_normalizado")
-
-        if not endereco_norm:
-            print("Dados sem endereco_normalizado")
-            return None
-        
-        existente = (
-            supabase.table("enderecos_processados")
-            .select("*")
-            .eq("endereco_normalizado", endereco_norm)
+
+class RepositorioSupabase:
+    def __init__(self, url: str, key: str):
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def buscar(self, endereco_normalizado: str):
+        resultado = (
+            self.client.table(TABELA)
+            .select("lat, lng, endereco_normalizado")
+            .eq("endereco_normalizado", endereco_normalizado)
             .execute()
         )
+        return resultado.data[0] if resultado.data else None
 
-        if existente.data and len(existente.data) > 0:
-            return {
-                "mensagem": "Endereço já existe",
-                "registro": existente.data[0]
-            }
-        response = (
-            supabase.table("enderecos_processados")
-            .insert(dados)
+    def buscar_em_lote(self, enderecos: list) -> list:
+        resultado = (
+            self.client.table(TABELA)
+            .select("lat, lng, endereco_normalizado")
+            .in_("endereco_normalizado", enderecos)
             .execute()
         )
-        return response
+        return resultado.data or []
 
-    except Exception as e:
-        print(f"Erro ao salvar no Supabase: {e}")
+    def listar_todos(self, pagina: int = 1000) -> list:
+        registros = []
+        while True:
+            resultado = (
+                self.client.table(TABELA)
+                .select(", ".join(COLUNAS))
+                .order("id")
+                .range(len(registros), len(registros) + pagina - 1)
+                .execute()
+            )
+            registros.extend(resultado.data or [])
+            if len(resultado.data or []) < pagina:
+                return registros
+
+    def upsert_em_lote(self, registros: list, sobrescrever: bool = False) -> list:
+        # Requer UNIQUE (endereco_normalizado) na tabela do Supabase
+        resultado = (
+            self.client.table(TABELA)
+            .upsert(registros, on_conflict="endereco_normalizado", ignore_duplicates=not sobrescrever)
+            .execute()
+        )
+        return resultado.data or []
+
+
+class RepositorioSQLite:
+    """Mesma tabela do Supabase em um arquivo local, para rodar e medir offline."""
+
+    def __init__(self, caminho: str):
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                endereco_normalizado TEXT NOT NULL,
+                bairro TEXT,
+                cidade TEXT,
+                lat REAL,
+                lng REAL
+            )
+        """)
+        self._conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{TABELA}_endereco ON {TABELA} (endereco_normalizado)"
+        )
+        self._conn.commit()
+
+    def buscar(self, endereco_normalizado: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT lat, lng, endereco_normalizado FROM {TABELA} WHERE endereco_normalizado = ? LIMIT 1",
+                (endereco_normalizado,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def buscar_em_lote(self, enderecos: list) -> list:
+        marcadores = ", ".join("?" for _ in enderecos)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT lat, lng, endereco_normalizado FROM {TABELA} WHERE endereco_normalizado IN ({marcadores})",
+                list(enderecos)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def listar_todos(self) -> list:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(COLUNAS)} FROM {TABELA}").fetchall()
+        return [dict(r) for r in rows]
+
+    def upsert_em_lote(self, registros: list, sobrescrever: bool = False) -> list:
+        if sobrescrever:
+            conflito = ", ".join(f"{c} = excluded.{c}" for c in COLUNAS[1:])
+        else:
+            conflito = None
+        sql = (
+            f"INSERT INTO {TABELA} ({', '.join(COLUNAS)}) VALUES (?, ?, ?, ?, ?) "
+            f"ON CONFLICT (endereco_normalizado) DO {'UPDATE SET ' + conflito if conflito else 'NOTHING'}"
+        )
+        with self._lock:
+            self._conn.executemany(sql, [[r.get(c) for c in COLUNAS] for r in registros])
+            self._conn.commit()
+            marcadores = ", ".join("?" for _ in registros)
+            rows = self._conn.execute(
+                f"SELECT * FROM {TABELA} WHERE endereco_normalizado IN ({marcadores})",
+                [r.get("endereco_normalizado") for r in registros]
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+
+class RepositorioMemoria:
+    """Fake em processo: mesma interface, sem I/O. Útil para testes e benchmarks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._registros = []
+        self._por_endereco = {}
+
+    def buscar(self, endereco_normalizado: str):
+        registro = self._por_endereco.get(endereco_normalizado)
+        return dict(registro) if registro else None
+
+    def buscar_em_lote(self, enderecos: list) -> list:
+        return [dict(self._por_endereco[e]) for e in enderecos if e in self._por_endereco]
+
+    def listar_todos(self) -> list:
+        with self._lock:
+            return [dict(r) for r in self._registros]
+
+    def upsert_em_lote(self, registros: list, sobrescrever: bool = False) -> list:
+        gravados = []
+        with self._lock:
+            for dados in registros:
+                chave = dados.get("endereco_normalizado")
+                existente = self._por_endereco.get(chave)
+                if existente is None:
+                    existente = {"id": len(self._registros) + 1, **{c: dados.get(c) for c in COLUNAS}}
+                    self._registros.append(existente)
+                    self._por_endereco[chave] = existente
+                elif sobrescrever:
+                    existente.update({c: dados.get(c) for c in COLUNAS})
+                gravados.append(dict(existente))
+        return gravados
+
+
+def criar_repositorio():
+    if settings.DATABASE_BACKEND == "sqlite":
+        return RepositorioSQLite(settings.DATABASE_SQLITE_PATH)
+
+    if settings.DATABASE_BACKEND == "memoria":
+        return RepositorioMemoria()
+
+    if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+        log.warning("SUPABASE_URL ou SUPABASE_KEY não configurados no config.py")
         return None
-    
-def buscar_coordenadas(endereco_normalizado: str):
+    return RepositorioSupabase(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+
+# Criado no primeiro uso (o lifespan antecipa, fora do event loop): importar o
+# supabase-py e montar o cliente pesa no cold start. Pode ser substituído antes
+# do primeiro uso (benchmarks).
+repositorio = None
+_repositorio_criado = False
+_lock_repositorio = threading.Lock()
 
-    if not supabase:
-        return {"erro": "Supabase não configurado"}
+
+def obter_repositorio():
+    global repositorio, _repositorio_criado
+    if not _repositorio_criado:
+        with _lock_repositorio:
+            if not _repositorio_criado:
+                if repositorio is None:
+                    repositorio = criar_repositorio()
+                _repositorio_criado = True
+    return repositorio
+
+
+# Os clientes (supabase-py, sqlite3) são bloqueantes: rodam neste pool limitado,
+# com timeout, para não travar o event loop nem acumular threads quando o banco fica lento.
+_executor = ThreadPoolExecutor(max_workers=settings.DB_MAX_WORKERS, thread_name_prefix="db")
+
+
+async def _executar(funcao, *args):
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(_executor, funcao, *args),
+        timeout=settings.DB_TIMEOUT
+    )
+
+
+async def _obter_repositorio_async():
+    """obter_repositorio para o event loop: se o cliente ainda não existe, é criado no pool do banco."""
+    if _repositorio_criado:
+        return repositorio
+    return await asyncio.get_running_loop().run_in_executor(_executor, obter_repositorio)
+
+
+async def gravar_enderecos_em_lote(registros: list):
+    """Upsert em lote pela chave endereco_normalizado; registros já existentes são mantidos."""
+    repositorio = await _obter_repositorio_async()
+    if not repositorio or not registros:
+        return []
+    with cronometrar("db_escrita"):
+        gravados = await _executar(repositorio.upsert_em_lote, registros)
+    atualizar_indices(gravados)
+    return gravados
+
+
+async def listar_enderecos() -> list:
+    """Todos os endereços conhecidos, para montar os índices locais (sem o DB_TIMEOUT: a tabela pode ser grande)."""
+    repositorio = await _obter_repositorio_async()
+    if not repositorio:
+        return []
+    return await asyncio.get_running_loop().run_in_executor(_executor, repositorio.listar_todos)
+
+
+# Matches perfeitos novos entram aqui e são gravados em lote (write-behind)
+buffer_escrita = BufferEscrita(
+    gravar_enderecos_em_lote,
+    chave="endereco_normalizado",
+    tamanho_max=settings.DB_WRITE_BATCH_SIZE,
+    intervalo=settings.DB_WRITE_FLUSH_INTERVAL
+)
+
+
+def _formatar_registro(registro: dict):
+    return {
+        "latitude": registro.get("lat"),
+        "longitude": registro.get("lng"),
+        "endereco_normalizado": registro.get("endereco_normalizado"),
+        "mensagem": "Endereço encontrado"
+    }
+
+
+async def buscar_coordenadas(endereco_normalizado: str):
+    repositorio = await _obter_repositorio_async()
+    if not repositorio:
+        return {"erro": "Banco de endereços não configurado"}
 
     if not endereco_normalizado:
         return {"erro": "endereco_normalizado é obrigatório"}
 
     try:
-        resultado = (
-            supabase.table("enderecos_processados")
-            .select("lat, lng, endereco_normalizado")
-            .eq("endereco_normalizado", endereco_normalizado)
-            .execute()
-        )
-
-        if resultado.data and len(resultado.data) > 0:
-            registro = resultado.data[0]
-            return {
-                "latitude": registro.get("lat"),
-                "longitude": registro.get("lng"),
-                "endereco_normalizado": registro.get("endereco_normalizado"),
-                "mensagem": "Endereço encontrado"
-            }
+        with cronometrar("db_consulta"):
+            registro = await _executar(repositorio.buscar, endereco_normalizado)
+        if registro:
+            return _formatar_registro(registro)
 
         return None
 
+    except asyncio.TimeoutError:
+        return {"erro": "Timeout ao consultar banco"}
     except Exception as e:
-        return {"erro": f"Erro ao consultar Supabase: {e}"}
-    
+        return {"erro": f"Erro ao consultar banco: {e}"}
 
-def salvar_endereco_editado_db(endereco_normalizado: str, bairro: str, cidade: str, lat: float, lng: float):
-    try:
-        inserido = (
-            supabase.table("enderecos_processados")
-            .insert({
-                "endereco_normalizado": endereco_normalizado,
-                "bairro": bairro,
-                "cidade": cidade,
-                "lat": lat,
-                "lng": lng
-            })
-            .execute()
+
+async def buscar_coordenadas_em_lote(enderecos_normalizados) -> dict:
+    """
+    Busca vários endereços em poucas consultas IN (blocos de DB_PREFETCH_CHUNK,
+    executados em paralelo no pool do banco).
+    Retorna {endereco_normalizado: registro formatado como buscar_coordenadas}
+    apenas para os encontrados. Blocos com erro ou timeout são ignorados: esses
+    endereços seguem para a geocodificação normalmente.
+    """
+    repositorio = await _obter_repositorio_async()
+    if not repositorio:
+        return {}
+
+    distintos = sorted({e for e in enderecos_normalizados if e})
+    tamanho = settings.DB_PREFETCH_CHUNK
+    blocos = [distintos[i:i + tamanho] for i in range(0, len(distintos), tamanho)]
+
+    with cronometrar("db_prefetch"):
+        respostas = await asyncio.gather(
+            *(_executar(repositorio.buscar_em_lote, bloco) for bloco in blocos),
+            return_exceptions=True
         )
 
+    encontrados = {}
+    for resposta in respostas:
+        if isinstance(resposta, BaseException):
+            log.warning("Erro ao consultar lote no banco: %r", resposta)
+            continue
+        for registro in resposta:
+            chave = registro.get("endereco_normalizado")
+            if chave and chave not in encontrados:
+                encontrados[chave] = _formatar_registro(registro)
+
+    return encontrados
+
+
+async def salvar_endereco_editado_db(endereco_normalizado: str, bairro: str, cidade: str, lat: float, lng: float):
+    repositorio = await _obter_repositorio_async()
+    if not repositorio:
+        return {"erro": "Banco de endereços não configurado"}
+
+    try:
+        # Correção manual sobrescreve as coordenadas já gravadas para o endereço
+        gravados = await _executar(repositorio.upsert_em_lote, [{
+            "endereco_normalizado": endereco_normalizado,
+            "bairro": bairro,
+            "cidade": cidade,
+            "lat": lat,
+            "lng": lng
+        }], True)
+        atualizar_indices(gravados)
+
         return {
             "mensagem": "Endereço inserido manualmente",
-            "registro": inserido.data[0]
+            "registro": gravados[0] if gravados else None
         }
 
+    except asyncio.TimeoutError:
+        log.error("Timeout ao salvar endereço no banco")
+        return {"erro": "Timeout ao salvar endereço no banco"}
     except Exception as e:
-        print("Erro ao salvar endereço no banco:", e)
+        log.error("Erro ao salvar endereço no banco: %s", e)
         return {"erro": str(e)}
-
-    
@@ -0,0 +1,124 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from app.core.config import settings
+from app.core.logs import obter_logger
+from app.core.metrics import registrar_coletor
+from app.services.pontuacao import selecionar_melhor_candidato, pontuar_lote
+
+log = obter_logger("executor_cpu")
+
+MODOS = ("inline", "thread", "process")
+
+
+def _aquecer():
+    # Importa pandas e normalizer/pontuacao (rapidfuzz) antes da primeira planilha
+    import pandas  # noqa: F401
+    import app.services.normalizer  # noqa: F401
+    return True
+
+
+class ExecutorCPU:
+    """
+    Tira do event loop o trabalho de CPU (normalização dos blocos e pontuação
+    dos candidatos da HERE). As pontuações pedidas na mesma volta do loop
+    seguem juntas para o pool (até lote_max por envio), então o custo de
+    envio entre processos é pago por lote e não por estratégia.
+    """
+
+    def __init__(self, modo: str, workers: int, lote_max: int):
+        if modo not in MODOS:
+            raise ValueError(f"CPU_EXECUTOR inválido: {modo} (use {', '.join(MODOS)})")
+        self.modo = modo
+        self.workers = workers
+        self.lote_max = lote_max
+        self._executor = None
+        self._pendentes = []
+        self._agendado = False
+        self.lotes = 0
+        self.pontuacoes = 0
+
+    def iniciar(self):
+        if self.modo == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+        elif self.modo == "process":
+            metodos = multiprocessing.get_all_start_methods()
+            # forkserver: os processos não herdam threads nem conexões abertas deste processo
+            contexto = multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=contexto)
+            for _ in range(self.workers):
+                self._executor.submit(_aquecer)
+        if self._executor is not None:
+            log.info("Etapa de CPU: %s com %s workers", self.modo, self.workers)
+
+    def parar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def executar(self, funcao, *args):
+        """funcao(*args) no pool; sem pool, no pool padrão de threads do asyncio."""
+        if self._executor is None:
+            return await asyncio.to_thread(funcao, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, funcao, *args)
+
+    async def pontuar(self, candidatos: list, alvo):
+        """selecionar_melhor_candidato(candidatos, alvo), em lote no pool quando houver um."""
+        if self._executor is None:
+            return selecionar_melhor_candidato(candidatos, alvo)
+
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._pendentes.append((candidatos, alvo, futuro))
+        if len(self._pendentes) >= self.lote_max:
+            self._despachar()
+        elif not self._agendado:
+            self._agendado = True
+            loop.call_soon(self._despachar)
+        return await futuro
+
+    def _despachar(self):
+        self._agendado = False
+        pendentes, self._pendentes = self._pendentes, []
+        if not pendentes:
+            return
+        self.lotes += 1
+        self.pontuacoes += len(pendentes)
+        lote = asyncio.get_running_loop().run_in_executor(
+            self._executor, pontuar_lote, [(candidatos, alvo) for candidatos, alvo, _ in pendentes]
+        )
+
+        def distribuir(tarefa):
+            erro = None if tarefa.cancelled() else tarefa.exception()
+            for i, (_, _, futuro) in enumerate(pendentes):
+                # A linha que esperava pode ter sido cancelada (cliente desconectou)
+                if futuro.done():
+                    continue
+                if tarefa.cancelled():
+                    futuro.cancel()
+                elif erro is not None:
+                    futuro.set_exception(erro)
+                else:
+                    futuro.set_result(tarefa.result()[i])
+
+        lote.add_done_callback(distribuir)
+
+    def estatisticas(self) -> dict:
+        return {
+            "modo": self.modo,
+            "workers": self.workers if self._executor is not None else 0,
+            "lotes": self.lotes,
+            "pontuacoes": self.pontuacoes,
+            "media_por_lote": round(self.pontuacoes / self.lotes, 2) if self.lotes else None
+        }
+
+
+executor_cpu = ExecutorCPU(settings.CPU_EXECUTOR, settings.CPU_WORKERS, settings.CPU_BATCH_MAX)
+
+
+@registrar_coletor
+def _metricas_executor_cpu():
+    return [
+        ("geoprocessor_cpu_lotes_total", "counter", "Lotes de pontuação enviados ao pool de CPU", {}, executor_cpu.lotes),
+        ("geoprocessor_cpu_pontuacoes_total", "counter", "Pontuações feitas no pool de CPU", {}, executor_cpu.pontuacoes),
+    ]
@@ -0,0 +1,129 @@
+import csv
+import io
+import re
+import tempfile
+from app.core.config import settings
+
+# Mesmas abas, na mesma ordem, do exportToExcel do front
+ABAS = ("Encontrados", "Encontrados Parcialmente", "Condominios Identificados", "Nao Encontrados - Erros")
+FORMATOS_EXPORTACAO = ("xlsx", "csv", "circuit")
+# O front descarta a coluna de índice que vem de planilhas salvas pelo pandas
+COLUNAS_IGNORADAS = frozenset({"Unnamed: 0"})
+RE_QUADRA_LOTE = re.compile(r",\s*([0-9]+)-([0-9]+)")
+LINHAS_POR_PEDACO = 500
+
+
+def classificar(linha: dict) -> str:
+    if linha.get("Cond_Match"):
+        return ABAS[2]
+    if linha.get("Partial_Match"):
+        return ABAS[1]
+    if linha.get("Geo_Latitude") and linha.get("Geo_Longitude") != "Não encontrado":
+        return ABAS[0]
+    return ABAS[3]
+
+
+def _colunas_por_aba(linhas) -> dict:
+    """Primeira passada: {aba: colunas na ordem em que aparecem} (só abas com linhas)."""
+    colunas = {}
+    for linha in linhas:
+        vistas = colunas.setdefault(classificar(linha), {})
+        for coluna in linha:
+            if coluna not in COLUNAS_IGNORADAS:
+                vistas.setdefault(coluna, None)
+    return {aba: list(colunas[aba]) for aba in ABAS if aba in colunas}
+
+
+def gerar_xlsx(linhas) -> str:
+    """
+    linhas: função que devolve um iterador novo sobre os resultados (são
+    lidos duas vezes: colunas e depois conteúdo). Grava com o writer
+    write-only do openpyxl, que não mantém as linhas em memória, e devolve
+    o caminho do arquivo temporário.
+    """
+    # openpyxl só é importado na primeira exportação: pesa no cold start
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def celula(aba, valor):
+        if isinstance(valor, str):
+            valor = ILLEGAL_CHARACTERS_RE.sub("", valor)
+            if valor.startswith("="):
+                # Texto da planilha nunca vira fórmula
+                texto = WriteOnlyCell(aba, valor)
+                texto.data_type = "s"
+                return texto
+        return valor
+
+    colunas = _colunas_por_aba(linhas())
+    livro = Workbook(write_only=True)
+    abas = {}
+    for nome, cabecalho in colunas.items():
+        abas[nome] = livro.create_sheet(nome)
+        abas[nome].append(cabecalho)
+
+    for linha in linhas():
+        nome = classificar(linha)
+        aba = abas[nome]
+        aba.append([celula(aba, linha.get(coluna)) for coluna in colunas[nome]])
+
+    with tempfile.NamedTemporaryFile(
+        suffix=".xlsx", prefix="export_", dir=settings.UPLOAD_SPOOL_DIR or None, delete=False
+    ) as destino:
+        caminho = destino.name
+    livro.save(caminho)
+    return caminho
+
+
+def gerar_csv(linhas):
+    """CSV único com todas as linhas; a coluna "Categoria" traz a aba do XLSX."""
+    colunas = {}
+    for colunas_aba in _colunas_por_aba(linhas()).values():
+        colunas.update(dict.fromkeys(colunas_aba))
+    colunas = list(colunas)
+
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM: o Excel só reconhece UTF-8 (acentos) com ele
+    buffer.write("\ufeff")
+    escritor.writerow(["Categoria", *colunas])
+    for n, linha in enumerate(linhas(), 1):
+        escritor.writerow([classificar(linha), *(linha.get(coluna) for coluna in colunas)])
+        if n % LINHAS_POR_PEDACO == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _numero(valor) -> str:
+    # Como o JS imprime números: -16.0 -> "-16"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def gerar_circuit(linhas):
+    """
+    Rota no formato que o exportToCircuit do front gera: uma linha por
+    coordenada, com as sequências (posição na planilha) que caem nela e a
+    quadra/lote do endereço normalizado.
+    """
+    agrupadas = {}
+    for seq, linha in enumerate(linhas(), 1):
+        lat, lng = linha.get("Geo_Latitude"), linha.get("Geo_Longitude")
+        if lat == "Não encontrado" or lng == "Não encontrado" or not lat or not lng:
+            continue
+        chave = (lat, lng)
+        grupo = agrupadas.get(chave)
+        if grupo is None:
+            match = RE_QUADRA_LOTE.search(linha.get("Endereco Normalizado") or "")
+            quadra, lote = match.groups() if match else ("", "")
+            grupo = agrupadas[chave] = [quadra, lote, []]
+        grupo[2].append(seq)
+
+    yield "Geo_Latitude,Observacoes\n".encode("utf-8")
+    for (lat, lng), (quadra, lote, sequencias) in agrupadas.items():
+        obs = f"{', '.join(map(str, sequencias))} - Quadra:{quadra} - Lote:{lote}"
+        yield f'{_numero(lat)}, {_numero(lng)},"{obs}"\n'.encode("utf-8")
@@ -1,35 +1,161 @@
-import aiohttp
+import asyncio
 import urllib.parse
+from contextvars import ContextVar
+import aiohttp
 from app.core.config import settings
+from app.core.logs import obter_logger
+from app.core.metrics import chamadas_here, cronometrar, registrar_coletor
+from app.services.http_client import obter_sessao_http
+from app.services.cache import CacheGeocode, normalizar_chave
+from app.services.singleflight import SingleFlight
+from app.services.rate_limiter import LimitadorHERE, ler_retry_after
+
+# 429/5xx são temporários: repetidos com backoff. Outros códigos viram API_ERROR na hora.
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+log = obter_logger("geocoder")
+
+cache_geocode = CacheGeocode(
+    max_itens=settings.GEOCODE_CACHE_MAX_ITENS,
+    ttl=settings.GEOCODE_CACHE_TTL,
+    ttl_negativo=settings.GEOCODE_CACHE_TTL_NEGATIVO,
+    caminho_disco=settings.GEOCODE_CACHE_PATH or None,
+    max_linhas_disco=settings.GEOCODE_CACHE_DISK_MAX_ROWS,
+    lote_disco=settings.GEOCODE_CACHE_WRITE_BATCH_SIZE,
+    intervalo_disco=settings.GEOCODE_CACHE_FLUSH_INTERVAL
+)
+
+# Limite do processo inteiro, compartilhado por todos os uploads e jobs
+limitador_here = LimitadorHERE(
+    qps=settings.HERE_QPS,
+    burst=settings.HERE_BURST,
+    concorrencia_min=settings.HERE_MIN_CONCURRENCY,
+    concorrencia_max=settings.HERE_MAX_CONCURRENCY,
+    backoff_base=settings.HERE_BACKOFF_BASE,
+    backoff_max=settings.HERE_BACKOFF_MAX
+)
+
+# Consultas idênticas em voo (mesma planilha ou uploads simultâneos) viram uma só
+singleflight_here = SingleFlight()
+
+class BackendGeocoder:
+    """
+    Como as linhas de um upload chegam na HERE. geocodificar(consulta) ->
+    (items, status); preparar(consultas) recebe de antemão as consultas de um
+    job inteiro (o backend por consulta ignora, o em lote envia todas de uma vez).
+    """
+    nome = "consulta"
+    em_lote = False
+
+    def preparar(self, consultas: list):
+        pass
+
+    async def geocodificar(self, consulta: str):
+        return await geocode_with_here(consulta)
+
+    async def fechar(self):
+        pass
+
+
+geocoder_por_consulta = BackendGeocoder()
+
+# Backend do upload atual; as tarefas das linhas herdam do pipeline
+ctx_geocoder = ContextVar("ctx_geocoder", default=geocoder_por_consulta)
+
+
+async def geocodificar(consulta: str):
+    return await ctx_geocoder.get().geocodificar(consulta)
 
-MEMORY_CACHE = {}
 
 async def geocode_with_here(address: str):
+    em_cache = await cache_geocode.obter(address)
+    if em_cache is not None:
+        return em_cache
+
     if not settings.HERE_API_KEY:
         return [], "NO_KEY"
 
-    #if address in MEMORY_CACHE:
-        return MEMORY_CACHE[address]
+    return await singleflight_here.executar(
+        normalizar_chave(address),
+        lambda: _consultar_here(address)
+    )
+
+async def _consultar_here(address: str):
+    with cronometrar("here"):
+        items, status = await _consultar_here_com_retentativas(address)
+    chamadas_here.inc(status=status)
+    return items, status
 
+async def _consultar_here_com_retentativas(address: str):
     # Força uso de + para espaço e , literal
     encoded_query = urllib.parse.quote_plus(address).replace("%2C", ",")
-    url = f"https://geocode.search.hereapi.com/v1/geocode?q={encoded_query}&apiKey={settings.HERE_API_KEY}"
+    url = f"{settings.HERE_GEOCODE_URL}?q={encoded_query}&apiKey={settings.HERE_API_KEY}"
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=10) as response:
-                if response.status != 200:
+    status_final = "API_ERROR"
+    for tentativa in range(settings.HERE_MAX_RETRIES + 1):
+        retry_after = None
+        resultado_limite = "erro"
+        adquirido = False
+        try:
+            # adquirir() devolve a vaga sozinho se for cancelado no meio
+            await limitador_here.adquirir()
+            adquirido = True
+            session = obter_sessao_http()
+            async with session.get(url) as response:
+                if response.status == 200:
+                    resultado_limite = "ok"
+                    data = await response.json()
+                    # RETORNA A LISTA INTEIRA DE CANDIDATOS
+                    if "items" in data and len(data["items"]) > 0:
+                        items = data["items"]
+                        cache_geocode.salvar(address, items, "OK")
+                        return items, "OK"
+
+                    cache_geocode.salvar(address, [], "NOT_FOUND")
+                    return [], "NOT_FOUND"
+
+                if response.status not in STATUS_RETENTAVEIS:
+                    # 400/401/403...: repetir não adianta
                     return [], "API_ERROR"
 
-                data = await response.json()
-                # RETORNA A LISTA INTEIRA DE CANDIDATOS
-                if "items" in data and len(data["items"]) > 0:
-                    items = data["items"]
-                    MEMORY_CACHE[address] = (items, "OK")
-                    return items, "OK"
+                if response.status in (429, 503):
+                    resultado_limite = "sobrecarga"
+                    retry_after = ler_retry_after(response.headers.get("Retry-After"))
+                status_final = "API_ERROR"
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning("Erro HERE (tentativa %s): %r", tentativa + 1, e)
+            status_final = "EXCEPTION"
+        except Exception as e:
+            log.exception("Erro HERE: %s", e)
+            return [], "EXCEPTION"
+        finally:
+            if adquirido:
+                limitador_here.liberar(resultado_limite, retry_after)
+
+        if tentativa < settings.HERE_MAX_RETRIES:
+            limitador_here.retentativas += 1
+            await asyncio.sleep(limitador_here.tempo_backoff(tentativa, retry_after))
+
+    return [], status_final
 
-    except Exception as e:
-        print(f"Erro HERE: {e}")
-        return [], "EXCEPTION"
 
-    return [], "NOT_FOUND"
\ No newline at end of file
+@registrar_coletor
+def _metricas_geocoder():
+    cache = cache_geocode.estatisticas()
+    voo = singleflight_here.estatisticas()
+    limite = limitador_here.estatisticas()
+    return [
+        ("geoprocessor_cache_consultas_total", "counter", "Consultas ao cache da HERE por resultado",
+         {"resultado": "hit_memoria"}, cache["hits_memoria"]),
+        ("geoprocessor_cache_consultas_total", "counter", "", {"resultado": "hit_disco"}, cache["hits_disco"]),
+        ("geoprocessor_cache_consultas_total", "counter", "", {"resultado": "hit_negativo"}, cache["hits_negativos"]),
+        ("geoprocessor_cache_consultas_total", "counter", "", {"resultado": "miss"}, cache["misses"]),
+        ("geoprocessor_cache_itens", "gauge", "Itens no cache em memória", {}, cache["itens_memoria"] + cache["itens_negativos"]),
+        ("geoprocessor_here_coalescidas_total", "counter", "Consultas HERE atendidas por outra idêntica em voo", {},
+         voo["coalescidas"]),
+        ("geoprocessor_here_limite_concorrencia", "gauge", "Limite adaptativo de chamadas simultâneas à HERE", {},
+         limite["limite_concorrencia"]),
+        ("geoprocessor_here_retentativas_total", "counter", "Retentativas de chamadas à HERE", {},
+         limite["retentativas"]),
+    ]
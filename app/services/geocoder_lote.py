@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+import aiohttp
+from app.core.config import settings
+from app.core.logs import obter_logger
+from app.core.metrics import cronometrar, consultas_proxy_lote
+from app.services.cache import normalizar_chave
+from app.services.geocoder import BackendGeocoder, cache_geocode, geocode_with_here, geocoder_por_consulta
+from app.services.http_client import obter_sessao_http
+
+log = obter_logger("geocoder_lote")
+
+
+class GeocoderProxyLote(BackendGeocoder):
+    """
+    Backend para jobs grandes: todas as consultas do job (sem repetição e
+    fora do cache) vão de uma vez para um proxy de geocoding em lote, um
+    serviço à parte que guarda as credenciais e conversa com o provedor de
+    lote (ex.: HERE Batch Geocoder). Cada linha espera a resposta da sua
+    consulta, que é entregue assim que chega no resultado do lote. O que o
+    lote não resolver (erro, timeout, consulta que não foi no lote) cai no
+    cliente por consulta da HERE.
+
+    Contrato do proxy em BATCH_PROXY_URL (benchmarks/here_stub.py o implementa):
+        POST {url}/jobs               {"queries": ["...", ...]} -> 2xx {"id": "..."}
+        GET  {url}/jobs/{id}          -> {"status": "running" | "completed" | "failed"}
+        GET  {url}/jobs/{id}/results  -> NDJSON, uma linha por consulta:
+            {"query": "...", "items": [...]}  items no formato do GET /v1/geocode da HERE
+            {"query": "...", "error": "..."}  consulta que o provedor não resolveu
+    A chave da HERE não é enviada ao proxy.
+    """
+    nome = "proxy_lote"
+    em_lote = True
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        # chave da consulta -> Future com (items, status), ou None se o lote não resolveu
+        self._pendentes = {}
+        self._tarefas = set()
+
+    def preparar(self, consultas: list):
+        novas = {}
+        for consulta in consultas:
+            chave = normalizar_chave(consulta)
+            if chave in self._pendentes or chave in novas:
+                continue
+            if cache_geocode.contem(consulta):
+                continue
+            novas[chave] = consulta
+        if not novas:
+            return
+
+        loop = asyncio.get_running_loop()
+        futuros = {chave: loop.create_future() for chave in novas}
+        self._pendentes.update(futuros)
+        tarefa = asyncio.create_task(self._executar(novas, futuros))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    async def geocodificar(self, consulta: str):
+        futuro = self._pendentes.get(normalizar_chave(consulta))
+        if futuro is not None:
+            # shield: uma linha cancelada não cancela a resposta que outras linhas esperam
+            resultado = await asyncio.shield(futuro)
+            if resultado is not None:
+                return resultado
+            consultas_proxy_lote.inc(resultado="fallback")
+        return await geocode_with_here(consulta)
+
+    async def fechar(self):
+        for tarefa in list(self._tarefas):
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+
+    async def _executar(self, consultas: dict, futuros: dict):
+        def resolver(chave, resultado):
+            futuro = futuros.get(chave)
+            if futuro is not None and not futuro.done():
+                futuro.set_result(resultado)
+            self._pendentes.pop(chave, None)
+
+        try:
+            with cronometrar("proxy_lote"):
+                lote_id = await self._submeter(list(consultas.values()))
+                log.info("Lote %s enviado ao proxy: %s consultas", lote_id, len(consultas))
+                await self._aguardar(lote_id)
+                async for consulta, items, erro in self._ler_resultados(lote_id):
+                    if erro:
+                        consultas_proxy_lote.inc(resultado="erro")
+                        resolver(normalizar_chave(consulta), None)
+                        continue
+                    status = "OK" if items else "NOT_FOUND"
+                    consultas_proxy_lote.inc(resultado=status)
+                    cache_geocode.salvar(consulta, items, status)
+                    resolver(normalizar_chave(consulta), (items, status))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            detalhe = f"HTTP {e.status}" if isinstance(e, aiohttp.ClientResponseError) else repr(e)
+            log.warning("Lote do proxy falhou (%s consultas), seguindo por consulta: %s", len(consultas), detalhe)
+        finally:
+            for chave in futuros:
+                resolver(chave, None)
+
+    async def _submeter(self, consultas: list) -> str:
+        session = obter_sessao_http()
+        async with session.post(f"{self.url}/jobs", json={"queries": consultas}) as response:
+            response.raise_for_status()
+            return (await response.json())["id"]
+
+    async def _aguardar(self, lote_id: str):
+        session = obter_sessao_http()
+        limite = time.monotonic() + settings.BATCH_PROXY_TIMEOUT
+        while True:
+            async with session.get(f"{self.url}/jobs/{lote_id}") as response:
+                response.raise_for_status()
+                status = (await response.json()).get("status")
+            if status == "completed":
+                return
+            if status == "failed":
+                raise RuntimeError(f"lote {lote_id} terminou com falha")
+            if time.monotonic() > limite:
+                raise asyncio.TimeoutError(f"lote {lote_id} não terminou em {settings.BATCH_PROXY_TIMEOUT}s")
+            await asyncio.sleep(settings.BATCH_PROXY_POLL_INTERVAL)
+
+    async def _ler_resultados(self, lote_id: str):
+        session = obter_sessao_http()
+        # O download pode passar do timeout total da sessão; vale só o tempo entre leituras
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=settings.HERE_TIMEOUT)
+        async with session.get(f"{self.url}/jobs/{lote_id}/results", timeout=timeout) as response:
+            response.raise_for_status()
+            async for linha in response.content:
+                if not linha.strip():
+                    continue
+                dados = json.loads(linha)
+                yield dados.get("query", ""), dados.get("items") or [], dados.get("error")
+
+
+def backend_para(linhas: int) -> BackendGeocoder:
+    """Backend para um job com `linhas` linhas a processar."""
+    modo = settings.GEOCODER_BACKEND
+    if not settings.BATCH_PROXY_URL or not settings.HERE_API_KEY or modo == "consulta":
+        return geocoder_por_consulta
+    if modo == "lote" or (linhas or 0) >= settings.BATCH_PROXY_MIN_ROWS:
+        return GeocoderProxyLote(settings.BATCH_PROXY_URL)
+    return geocoder_por_consulta
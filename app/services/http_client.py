@@ -0,0 +1,38 @@
+import aiohttp
+from app.core.config import settings
+
+# Sessão única do processo, aberta/fechada pelo lifespan do FastAPI
+_sessao: aiohttp.ClientSession = None
+
+
+def _criar_sessao() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_LIMIT,
+        limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(total=settings.HERE_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def iniciar_sessao_http():
+    global _sessao
+    if _sessao is None or _sessao.closed:
+        _sessao = _criar_sessao()
+    return _sessao
+
+
+def obter_sessao_http() -> aiohttp.ClientSession:
+    """Devolve a sessão compartilhada; cria sob demanda fora do lifespan (scripts, benchmarks)."""
+    global _sessao
+    if _sessao is None or _sessao.closed:
+        _sessao = _criar_sessao()
+    return _sessao
+
+
+async def fechar_sessao_http():
+    global _sessao
+    if _sessao is not None and not _sessao.closed:
+        await _sessao.close()
+    _sessao = None
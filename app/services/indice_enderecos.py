@@ -0,0 +1,257 @@
+import asyncio
+import re
+import unicodedata
+from dataclasses import dataclass
+from rapidfuzz import fuzz
+from app.core.config import settings
+from app.core.logs import obter_logger
+from app.services.normalizer import extrair_valores_quadra_lote, extrair_base_rua
+from app.services.parser import ParsedAddress
+
+log = obter_logger("indice_enderecos")
+
+RE_NAO_ALFANUMERICO = re.compile(r"[^A-Z0-9]+")
+RE_LETRA_NUMERO = re.compile(r"([A-Z])(\d)|(\d)([A-Z])")
+ABREVIACOES = {
+    "R": "RUA", "AV": "AVENIDA", "AL": "ALAMEDA", "TV": "TRAVESSA", "ROD": "RODOVIA",
+    "ST": "SETOR", "JD": "JARDIM", "RES": "RESIDENCIAL", "VL": "VILA", "PQ": "PARQUE", "CJ": "CONJUNTO"
+}
+PREPOSICOES = frozenset({"DA", "DAS", "DE", "DO", "DOS"})
+# Bairros com grafias diferentes ainda precisam ser o mesmo bairro
+SIMILARIDADE_MIN_BAIRRO = 80
+
+
+def _tokens(texto: str) -> list:
+    """'Av. RC-010 das Orquídeas' -> ['AVENIDA', 'RC', '10', 'ORQUIDEAS']"""
+    if not texto:
+        return []
+    sem_acento = unicodedata.normalize("NFKD", str(texto).upper()).encode("ascii", "ignore").decode()
+    sem_acento = RE_LETRA_NUMERO.sub(lambda m: " ".join(g for g in m.groups() if g), sem_acento)
+    tokens = []
+    for token in RE_NAO_ALFANUMERICO.sub(" ", sem_acento).split():
+        if token.isdigit():
+            token = str(int(token))
+        token = ABREVIACOES.get(token, token)
+        if token not in PREPOSICOES:
+            tokens.append(token)
+    return tokens
+
+
+def chave_rua(base_rua: str) -> tuple:
+    """
+    (texto canônico, assinatura) da rua. A assinatura junta os códigos e números
+    ('RC 10' -> 'RC10', 'RUA 1' -> '1'): ruas com códigos diferentes nunca
+    caem no mesmo bloco, por mais parecido que seja o texto.
+    """
+    tokens = _tokens(base_rua)
+    assinatura = []
+    for i, token in enumerate(tokens):
+        if token.isdigit():
+            anterior = tokens[i - 1] if i else ""
+            if anterior.isalpha() and len(anterior) <= 3 and anterior not in ABREVIACOES.values():
+                assinatura.append(anterior + token)
+            else:
+                assinatura.append(token)
+    return " ".join(tokens), tuple(assinatura)
+
+
+def canonizar_bairro(bairro: str) -> str:
+    return " ".join(_tokens(bairro))
+
+
+@dataclass(frozen=True, slots=True)
+class EntradaIndice:
+    endereco_normalizado: str
+    rua: str
+    assinatura: tuple
+    bairro: str
+    cidade: str
+    quadra: str
+    lote: str
+    lat: float
+    lng: float
+
+
+def preparar_entrada(registro: dict):
+    """Registro de enderecos_processados -> EntradaIndice (None se não tiver quadra, lote e coordenadas)."""
+    endereco = registro.get("endereco_normalizado")
+    if not endereco or registro.get("lat") is None or registro.get("lng") is None:
+        return None
+    quadra, lote = extrair_valores_quadra_lote(endereco)
+    if not quadra or not lote:
+        return None
+    rua, assinatura = chave_rua(extrair_base_rua(endereco))
+    return EntradaIndice(
+        endereco_normalizado=endereco,
+        rua=rua,
+        assinatura=assinatura,
+        bairro=canonizar_bairro(registro.get("bairro")),
+        cidade=canonizar_bairro(registro.get("cidade")),
+        quadra=quadra,
+        lote=lote,
+        lat=registro["lat"],
+        lng=registro["lng"]
+    )
+
+
+class IndiceFuzzy:
+    """
+    Índice em memória dos endereços já geocodificados, para resolver variações
+    de grafia sem chamar a HERE. Bloco: (assinatura da rua, quadra); dentro do
+    bloco o lote tem que ser o mesmo e a rua é comparada com rapidfuzz.
+    """
+
+    def __init__(self, score_minimo: float):
+        self.score_minimo = score_minimo
+        self._blocos = {}
+        self._por_endereco = {}
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._por_endereco)
+
+    def adicionar(self, entrada: EntradaIndice, sobrescrever: bool = True):
+        antiga = self._por_endereco.get(entrada.endereco_normalizado)
+        if antiga is not None:
+            if not sobrescrever:
+                return
+            self._bloco(antiga).pop(antiga.endereco_normalizado, None)
+        self._por_endereco[entrada.endereco_normalizado] = entrada
+        self._bloco(entrada)[entrada.endereco_normalizado] = entrada
+
+    def _bloco(self, entrada: EntradaIndice) -> dict:
+        chave = (entrada.assinatura, entrada.quadra)
+        bloco = self._blocos.get(chave)
+        if bloco is None:
+            bloco = self._blocos[chave] = {}
+        return bloco
+
+    def buscar(self, alvo: ParsedAddress):
+        """Melhor entrada parecida com o alvo: (EntradaIndice, score 0-100) ou None."""
+        if not alvo.quadra or not alvo.lote or not self._por_endereco:
+            return None
+        rua_alvo, assinatura = chave_rua(alvo.base_rua)
+        bloco = self._blocos.get((assinatura, alvo.quadra))
+        if not bloco:
+            return None
+
+        bairro_alvo = canonizar_bairro(alvo.bairro)
+        cidade_alvo = canonizar_bairro(alvo.cidade)
+        melhor, melhor_score = None, -1
+        for entrada in bloco.values():
+            if entrada.lote != alvo.lote:
+                continue
+            if cidade_alvo and entrada.cidade and entrada.cidade != cidade_alvo:
+                continue
+            score = fuzz.token_sort_ratio(rua_alvo, entrada.rua)
+            if score < self.score_minimo:
+                continue
+            if bairro_alvo and entrada.bairro:
+                score_bairro = fuzz.token_sort_ratio(bairro_alvo, entrada.bairro)
+                if score_bairro < SIMILARIDADE_MIN_BAIRRO:
+                    continue
+                score = 0.75 * score + 0.25 * score_bairro
+            if score > melhor_score:
+                melhor, melhor_score = entrada, score
+
+        if melhor is None:
+            return None
+        self.hits += 1
+        return melhor, int(melhor_score)
+
+
+class IndiceVizinhos:
+    """
+    (rua, bairro, quadra) -> {lote: (lat, lng)} dos lotes já geocodificados.
+    Um lote desconhecido é estimado por interpolação linear entre o lote
+    conhecido imediatamente abaixo e o imediatamente acima, desde que os dois
+    estejam a no máximo distancia_max lotes (lotes distantes costumam estar do
+    outro lado da quadra).
+    """
+
+    def __init__(self, distancia_max: int):
+        self.distancia_max = distancia_max
+        self._quadras = {}
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._quadras)
+
+    def adicionar(self, entrada: EntradaIndice, sobrescrever: bool = True):
+        chave = (entrada.rua, entrada.bairro, entrada.quadra)
+        lotes = self._quadras.get(chave)
+        if lotes is None:
+            lotes = self._quadras[chave] = {}
+        lote = int(entrada.lote)
+        if sobrescrever or lote not in lotes:
+            lotes[lote] = (entrada.lat, entrada.lng)
+
+    def interpolar(self, alvo: ParsedAddress):
+        """(lat, lng, lote_abaixo, lote_acima) estimados para o lote do alvo, ou None."""
+        if not alvo.quadra or not alvo.lote or not self._quadras:
+            return None
+        lotes = self._quadras.get((chave_rua(alvo.base_rua)[0], canonizar_bairro(alvo.bairro), alvo.quadra))
+        if not lotes:
+            return None
+
+        lote = int(alvo.lote)
+        if lote in lotes:
+            lat, lng = lotes[lote]
+            self.hits += 1
+            return lat, lng, lote, lote
+
+        abaixo = max((n for n in lotes if n < lote), default=None)
+        acima = min((n for n in lotes if n > lote), default=None)
+        if abaixo is None or acima is None or acima - abaixo > self.distancia_max:
+            return None
+
+        fracao = (lote - abaixo) / (acima - abaixo)
+        (lat_a, lng_a), (lat_b, lng_b) = lotes[abaixo], lotes[acima]
+        self.hits += 1
+        return lat_a + (lat_b - lat_a) * fracao, lng_a + (lng_b - lng_a) * fracao, abaixo, acima
+
+
+indice_fuzzy = IndiceFuzzy(settings.FUZZY_INDEX_MIN_SCORE)
+indice_vizinhos = IndiceVizinhos(settings.NEIGHBOR_MAX_GAP)
+
+
+def _indices_ativos() -> list:
+    indices = []
+    if settings.FUZZY_INDEX_ENABLED:
+        indices.append(indice_fuzzy)
+    if settings.NEIGHBOR_INDEX_ENABLED:
+        indices.append(indice_vizinhos)
+    return indices
+
+
+def atualizar_indices(registros: list, sobrescrever: bool = True):
+    """Registros novos ou corrigidos de enderecos_processados entram nos índices na hora."""
+    indices = _indices_ativos()
+    if not indices:
+        return
+    for registro in registros or ():
+        entrada = preparar_entrada(registro)
+        if entrada:
+            for indice in indices:
+                indice.adicionar(entrada, sobrescrever)
+
+
+async def carregar_indices(listar_enderecos):
+    """
+    Carga inicial a partir do banco (listar_enderecos: coroutine que devolve
+    todos os registros). Entradas adicionadas durante a carga são mais novas
+    que a leitura e não são sobrescritas.
+    """
+    indices = _indices_ativos()
+    if not indices:
+        return
+    try:
+        registros = await listar_enderecos()
+        entradas = await asyncio.to_thread(lambda: [e for e in map(preparar_entrada, registros) if e])
+    except Exception as e:
+        log.warning("Índice de endereços não carregado: %r", e)
+        return
+    for entrada in entradas:
+        for indice in indices:
+            indice.adicionar(entrada, sobrescrever=False)
+    log.info("Índices de endereços carregados: %s entradas", len(entradas))
@@ -0,0 +1,242 @@
+import asyncio
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from fastapi import UploadFile, HTTPException
+from app.core.config import settings
+from app.core.metrics import observar_etapa
+
+FORMATOS = {
+    ".xlsx": "xlsx", ".xlsm": "xlsx",
+    ".xls": "xls",
+    ".csv": "csv", ".txt": "csv",
+    ".parquet": "parquet", ".pq": "parquet"
+}
+_FIM = object()
+
+
+def detectar_formato(nome_arquivo: str) -> str:
+    extensao = os.path.splitext(nome_arquivo or "")[1].lower()
+    # Sem extensão reconhecida: o formato histórico do upload é Excel
+    return FORMATOS.get(extensao, "xlsx")
+
+
+def _nomes_colunas(cabecalho) -> list:
+    """Mesmos nomes que o pandas daria: vazio vira 'Unnamed: i', repetido vira 'X.1'."""
+    nomes, vistos = [], {}
+    for i, valor in enumerate(cabecalho):
+        nome = f"Unnamed: {i}" if valor is None or str(valor).strip() == "" else valor
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def _ler_xlsx(caminho: str, tamanho: int):
+    from openpyxl import load_workbook
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = livro.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = _nomes_colunas(cabecalho)
+        bloco, vazias = [], []
+        for valores in linhas:
+            linha = {
+                coluna: (math.nan if valor is None else valor)
+                for coluna, valor in zip(colunas, valores)
+            }
+            for coluna in colunas[len(valores):]:
+                linha[coluna] = math.nan
+            # Linhas vazias no fim da aba são descartadas (como no pd.read_excel);
+            # no meio, continuam contando para o idx
+            if all(valor is None for valor in valores):
+                vazias.append(linha)
+                continue
+            bloco.extend(vazias)
+            vazias = []
+            bloco.append(linha)
+            if len(bloco) >= tamanho:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
+    finally:
+        livro.close()
+
+
+def _ler_xls(caminho: str, tamanho: int):
+    # .xls antigo não tem leitor em streaming: lê inteiro e entrega em blocos
+    import pandas as pd
+    df = pd.read_excel(caminho)
+    for inicio in range(0, len(df), tamanho):
+        yield df.iloc[inicio:inicio + tamanho].to_dict(orient="records")
+
+
+def _abrir_csv(caminho: str):
+    """Planilhas exportadas no Brasil costumam vir em latin-1 e separadas por ';'."""
+    with open(caminho, "rb") as arquivo:
+        amostra = arquivo.read(64 * 1024)
+    try:
+        amostra.decode("utf-8-sig")
+        codificacao = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacao = "latin-1"
+    primeira_linha = amostra.split(b"\n", 1)[0].decode(codificacao, errors="ignore")
+    separador = ";" if primeira_linha.count(";") > primeira_linha.count(",") else ","
+    return codificacao, separador
+
+
+def _ler_csv(caminho: str, tamanho: int):
+    import pandas as pd
+    codificacao, separador = _abrir_csv(caminho)
+    with pd.read_csv(caminho, sep=separador, encoding=codificacao, chunksize=tamanho) as leitor:
+        for df in leitor:
+            yield df.to_dict(orient="records")
+
+
+def _ler_parquet(caminho: str, tamanho: int):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Leitura de Parquet requer o pacote pyarrow")
+    arquivo = pq.ParquetFile(caminho)
+    for lote in arquivo.iter_batches(batch_size=tamanho):
+        yield lote.to_pandas().to_dict(orient="records")
+
+
+LEITORES = {"xlsx": _ler_xlsx, "xls": _ler_xls, "csv": _ler_csv, "parquet": _ler_parquet}
+
+
+def estimar_total(caminho: str, formato: str):
+    """Número de linhas sem ler o arquivo inteiro (None quando não dá para saber barato)."""
+    try:
+        if formato == "xlsx":
+            from openpyxl import load_workbook
+            livro = load_workbook(caminho, read_only=True)
+            try:
+                maximo = livro.active.max_row
+            finally:
+                livro.close()
+            return max(0, maximo - 1) if maximo else None
+        if formato == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(caminho).metadata.num_rows
+    except Exception:
+        return None
+    return None
+
+
+class Planilha:
+    """
+    Upload gravado em disco e lido em blocos de INGEST_CHUNK_ROWS linhas por
+    uma thread. Os blocos passam por uma fila curta: se o geocoding atrasa, a
+    leitura espera, então a memória não cresce com o tamanho do arquivo.
+    """
+
+    def __init__(self, caminho: str, nome: str, formato: str):
+        self.caminho = caminho
+        self.nome = nome
+        self.formato = formato
+        self.total_estimado = None
+        self._fila = None
+        self._parar = threading.Event()
+        self._thread = None
+        self._primeiro = None
+        self._proximo_idx = 0
+
+    async def _iniciar(self):
+        loop = asyncio.get_running_loop()
+        self._fila = asyncio.Queue(maxsize=settings.INGEST_QUEUE_CHUNKS)
+        self.total_estimado = await asyncio.to_thread(estimar_total, self.caminho, self.formato)
+
+        def entregar(item):
+            # Bloqueia a thread de leitura até haver espaço na fila
+            if not self._parar.is_set():
+                asyncio.run_coroutine_threadsafe(self._fila.put(item), loop).result()
+
+        def ler():
+            try:
+                leitor = LEITORES[self.formato](self.caminho, settings.INGEST_CHUNK_ROWS)
+                while not self._parar.is_set():
+                    inicio = time.perf_counter()
+                    bloco = next(leitor, _FIM)
+                    if bloco is _FIM:
+                        break
+                    entregar((bloco, time.perf_counter() - inicio))
+                leitor.close()
+                entregar(_FIM)
+            except Exception as e:
+                entregar(e)
+
+        self._thread = threading.Thread(target=ler, name="ingestao", daemon=True)
+        self._thread.start()
+
+        # Erro de formato aparece aqui, antes de qualquer resposta ser enviada
+        self._primeiro = await self._proximo_bloco()
+
+    async def _proximo_bloco(self):
+        item = await self._fila.get()
+        if item is _FIM:
+            return None
+        if isinstance(item, Exception):
+            raise item
+        bloco, segundos = item
+        observar_etapa("leitura_planilha", segundos)
+        inicio = self._proximo_idx
+        self._proximo_idx += len(bloco)
+        return [(inicio + i, linha) for i, linha in enumerate(bloco)]
+
+    async def blocos(self):
+        """Blocos de pares (idx, linha), com idx global na planilha."""
+        try:
+            bloco = self._primeiro
+            self._primeiro = None
+            while bloco:
+                yield bloco
+                bloco = await self._proximo_bloco()
+        finally:
+            self.fechar()
+
+    def fechar(self):
+        self._parar.set()
+        if self._fila is not None:
+            # Destrava a thread se ela estiver esperando espaço na fila
+            while not self._fila.empty():
+                self._fila.get_nowait()
+        if os.path.exists(self.caminho):
+            try:
+                os.unlink(self.caminho)
+            except OSError:
+                pass
+
+
+async def _gravar_em_disco(file: UploadFile, sufixo: str) -> str:
+    def copiar():
+        with tempfile.NamedTemporaryFile(
+            suffix=sufixo, prefix="upload_", dir=settings.UPLOAD_SPOOL_DIR or None, delete=False
+        ) as destino:
+            file.file.seek(0)
+            shutil.copyfileobj(file.file, destino, 1024 * 1024)
+            return destino.name
+    return await asyncio.to_thread(copiar)
+
+
+async def abrir_planilha(file: UploadFile) -> Planilha:
+    """Grava o upload em disco e começa a leitura. Arquivo ilegível -> HTTP 400."""
+    formato = detectar_formato(file.filename)
+    caminho = await _gravar_em_disco(file, os.path.splitext(file.filename or "")[1] or ".xlsx")
+    planilha = Planilha(caminho, file.filename, formato)
+    try:
+        await planilha._iniciar()
+    except Exception as e:
+        planilha.fechar()
+        raise HTTPException(400, f"Erro ao ler planilha ({formato}): {e}")
+    return planilha
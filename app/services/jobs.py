@@ -0,0 +1,418 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.logs import obter_logger, ctx_job
+from app.core.metrics import registrar_coletor
+from app.services.pipeline import processar_blocos_em_ordem_de_conclusao, consultas_do_job, limpar_valores
+from app.services.geocoder_lote import backend_para
+
+log = obter_logger("jobs")
+
+
+class JobStore(ABC):
+    """Interface do armazenamento de jobs. Implementações: SQLiteJobStore."""
+
+    @abstractmethod
+    def criar_job(self, arquivo: str, linhas: list, status: str = "queued") -> str:
+        ...
+
+    @abstractmethod
+    def adicionar_linhas(self, job_id: str, linhas: list):
+        ...
+
+    @abstractmethod
+    def obter_job(self, job_id: str):
+        ...
+
+    @abstractmethod
+    def atualizar_status(self, job_id: str, status: str, erro: str = None):
+        ...
+
+    @abstractmethod
+    def linhas_pendentes(self, job_id: str, depois_de: int = -1, limite: int = 1000) -> list:
+        """Até `limite` linhas sem resultado com idx > depois_de, em ordem de idx."""
+
+    @abstractmethod
+    def salvar_resultados(self, job_id: str, itens: list):
+        """itens: [(idx, resultado), ...], gravados numa transação só."""
+
+    @abstractmethod
+    def listar_resultados(self, job_id: str, offset: int = 0, limit: int = 500) -> list:
+        ...
+
+    @abstractmethod
+    def iterar_resultados(self, job_id: str, tamanho: int = 1000):
+        ...
+
+    @abstractmethod
+    def jobs_incompletos(self) -> list:
+        ...
+
+    @abstractmethod
+    def marcar_interrompidos(self, erro: str) -> int:
+        """Jobs que ficaram "ingesting"/"streaming" (sem dono após um restart) viram "interrupted"."""
+
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, caminho: str):
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                arquivo TEXT,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                concluidas INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_linhas (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                entrada TEXT NOT NULL,
+                resultado TEXT,
+                PRIMARY KEY (job_id, idx)
+            );
+        """)
+        self._conn.commit()
+
+    def criar_job(self, arquivo, linhas, status="queued"):
+        job_id = uuid.uuid4().hex
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, arquivo, status, total, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, arquivo, status, len(linhas), agora, agora)
+            )
+            self._conn.executemany(
+                "INSERT INTO job_linhas (job_id, idx, entrada) VALUES (?, ?, ?)",
+                (
+                    (job_id, idx, json.dumps(limpar_valores(linha), ensure_ascii=False, default=str))
+                    for idx, linha in linhas
+                )
+            )
+            self._conn.commit()
+        return job_id
+
+    def adicionar_linhas(self, job_id, linhas):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO job_linhas (job_id, idx, entrada) VALUES (?, ?, ?)",
+                (
+                    (job_id, idx, json.dumps(limpar_valores(linha), ensure_ascii=False, default=str))
+                    for idx, linha in linhas
+                )
+            )
+            self._conn.execute(
+                "UPDATE jobs SET total = total + ?, atualizado_em = ? WHERE id = ?",
+                (len(linhas), time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def obter_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, arquivo, status, total, concluidas, erro, criado_em, atualizado_em FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0],
+            "arquivo": row[1],
+            "status": row[2],
+            "total": row[3],
+            "concluidas": row[4],
+            "erro": row[5],
+            "criado_em": row[6],
+            "atualizado_em": row[7]
+        }
+
+    def atualizar_status(self, job_id, status, erro=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, erro = ?, atualizado_em = ? WHERE id = ?",
+                (status, erro, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def linhas_pendentes(self, job_id, depois_de=-1, limite=1000):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, entrada FROM job_linhas WHERE job_id = ? AND idx > ? AND resultado IS NULL "
+                "ORDER BY idx LIMIT ?",
+                (job_id, depois_de, limite)
+            ).fetchall()
+        # None volta a ser NaN para a linha chegar no processador igual a uma linha do pandas
+        return [
+            (idx, {k: (float("nan") if v is None else v) for k, v in json.loads(entrada).items()})
+            for idx, entrada in rows
+        ]
+
+    def salvar_resultados(self, job_id, itens):
+        valores = [
+            (json.dumps(limpar_valores(resultado), ensure_ascii=False, default=str), job_id, idx)
+            for idx, resultado in itens
+        ]
+        with self._lock:
+            gravadas = 0
+            for registro in valores:
+                gravadas += self._conn.execute(
+                    "UPDATE job_linhas SET resultado = ? WHERE job_id = ? AND idx = ? AND resultado IS NULL",
+                    registro
+                ).rowcount
+            if gravadas:
+                self._conn.execute(
+                    "UPDATE jobs SET concluidas = concluidas + ?, atualizado_em = ? WHERE id = ?",
+                    (gravadas, time.time(), job_id)
+                )
+            self._conn.commit()
+
+    def listar_resultados(self, job_id, offset=0, limit=500):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entrada, resultado FROM job_linhas WHERE job_id = ? AND resultado IS NOT NULL "
+                "ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        return [{**json.loads(entrada), **json.loads(resultado)} for entrada, resultado in rows]
+
+    def iterar_resultados(self, job_id, tamanho=1000):
+        # Paginação por idx (não OFFSET): custo constante por página em jobs grandes
+        ultimo = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, entrada, resultado FROM job_linhas WHERE job_id = ? AND idx > ? "
+                    "AND resultado IS NOT NULL ORDER BY idx LIMIT ?",
+                    (job_id, ultimo, tamanho)
+                ).fetchall()
+            for ultimo, entrada, resultado in rows:
+                yield {**json.loads(entrada), **json.loads(resultado)}
+            if len(rows) < tamanho:
+                return
+
+    def jobs_incompletos(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY criado_em"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def marcar_interrompidos(self, erro):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted', erro = ?, atualizado_em = ? "
+                "WHERE status IN ('ingesting', 'streaming')",
+                (erro, time.time())
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+
+# Uma thread só: as gravações de cada job chegam no SQLite na ordem em que foram pedidas
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs")
+
+
+async def executar_no_store(funcao, *args):
+    """Operação do JobStore (SQLite síncrono) fora do event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, funcao, *args)
+
+
+class LoteResultados:
+    """
+    Resultados das linhas de um job acumulados e gravados juntos (um commit
+    por lote, fora do event loop): a cada JOBS_WRITE_BATCH_SIZE linhas ou
+    JOBS_WRITE_FLUSH_INTERVAL segundos. Quem usa chama descarregar() no fim.
+    """
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._itens = []
+        self._ultima_descarga = time.monotonic()
+
+    async def adicionar(self, idx: int, resultado: dict):
+        self._itens.append((idx, resultado))
+        if (len(self._itens) >= settings.JOBS_WRITE_BATCH_SIZE
+                or time.monotonic() - self._ultima_descarga >= settings.JOBS_WRITE_FLUSH_INTERVAL):
+            await self.descarregar()
+
+    async def descarregar(self):
+        itens, self._itens = self._itens, []
+        self._ultima_descarga = time.monotonic()
+        if itens:
+            await executar_no_store(self.store.salvar_resultados, self.job_id, itens)
+
+
+class GerenciadorJobs:
+    """
+    Fila de jobs com um número fixo de workers (MAX_CONCURRENT_JOBS).
+    Cada job processa suas linhas com o mesmo pipeline do /upload e grava
+    o resultado linha a linha, então pode ser retomado de onde parou.
+    """
+
+    def __init__(self, store: JobStore = None):
+        self.store = store
+        self._fila = asyncio.Queue()
+        self._enfileirados = set()
+        self._workers = []
+        # job_id -> [início, linhas concluídas nesta execução] dos jobs rodando
+        self._progresso = {}
+
+    async def iniciar(self):
+        if self.store is None:
+            self.store = SQLiteJobStore(settings.JOBS_DB_PATH)
+
+        for _ in range(settings.MAX_CONCURRENT_JOBS):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+        # A planilha (ou a conexão do stream) desses se perdeu no restart: ficam
+        # "interrupted", só com parte das linhas, e não podem ser retomados nem exportados
+        interrompidos = await executar_no_store(
+            self.store.marcar_interrompidos, "Servidor reiniciado antes do fim do envio"
+        )
+        if interrompidos:
+            log.warning("%s job(s) em envio marcados como falhos após restart", interrompidos)
+
+        # Retoma jobs interrompidos por restart do worker
+        for job_id in await executar_no_store(self.store.jobs_incompletos):
+            log.info("Retomando job %s", job_id)
+            self.enfileirar(job_id)
+
+    async def parar(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submeter_blocos(self, arquivo: str, blocos) -> str:
+        """
+        Cria o job a partir de uma planilha lida em blocos (Planilha.blocos()).
+        O job fica "ingesting" até o último bloco ser gravado e só então entra na fila;
+        se a leitura falhar no meio, fica "interrupted".
+        """
+        job_id = await executar_no_store(self.store.criar_job, arquivo, [], "ingesting")
+        try:
+            async for _ in self.gravar_blocos(job_id, blocos):
+                pass
+        except Exception as e:
+            await executar_no_store(
+                self.store.atualizar_status, job_id, "interrupted", f"Erro ao ler planilha: {e}"
+            )
+            raise
+        await executar_no_store(self.store.atualizar_status, job_id, "queued")
+        self.enfileirar(job_id)
+        return job_id
+
+    async def gravar_blocos(self, job_id: str, blocos):
+        """Grava cada bloco nas linhas do job e o repassa adiante."""
+        async for bloco in blocos:
+            await executar_no_store(self.store.adicionar_linhas, job_id, bloco)
+            yield bloco
+
+    async def blocos_pendentes(self, job_id: str):
+        """
+        Linhas ainda sem resultado, lidas do store em blocos de INGEST_CHUNK_ROWS
+        conforme o pipeline pede: o job não é carregado inteiro na memória.
+        """
+        ultimo = -1
+        while True:
+            bloco = await executar_no_store(
+                self.store.linhas_pendentes, job_id, ultimo, settings.INGEST_CHUNK_ROWS
+            )
+            if not bloco:
+                return
+            yield bloco
+            ultimo = bloco[-1][0]
+
+    def pode_retomar(self, job: dict) -> bool:
+        # "interrupted" não entra: a planilha não foi lida até o fim, e retomar
+        # entregaria como "done" só a parte que chegou
+        if job["status"] == "running":
+            return job["job_id"] not in self._enfileirados
+        return job["status"] in ("queued", "failed")
+
+    def enfileirar(self, job_id: str):
+        if job_id in self._enfileirados:
+            return
+        self._enfileirados.add(job_id)
+        self._fila.put_nowait(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._fila.get()
+            try:
+                await self._executar_job(job_id)
+            finally:
+                self._enfileirados.discard(job_id)
+                self._fila.task_done()
+
+    async def _executar_job(self, job_id: str):
+        # As tarefas das linhas herdam o contexto: todo log do job leva o job_id
+        ctx_job.set(job_id)
+        await executar_no_store(self.store.atualizar_status, job_id, "running")
+        progresso = self._progresso[job_id] = [time.perf_counter(), 0]
+        lote = LoteResultados(self.store, job_id)
+        backend = None
+        try:
+            try:
+                job = await executar_no_store(self.store.obter_job, job_id)
+                backend = backend_para(job["total"] - job["concluidas"])
+                if backend.em_lote:
+                    # Um lote só por job: as consultas de todas as linhas pendentes, sem repetição
+                    backend.preparar(await consultas_do_job(self.blocos_pendentes(job_id)))
+                async for idx, _, resultado in processar_blocos_em_ordem_de_conclusao(
+                    self.blocos_pendentes(job_id), backend
+                ):
+                    await lote.adicionar(idx, resultado)
+                    progresso[1] += 1
+            finally:
+                # Também no shutdown: o que já foi processado não é refeito na retomada
+                await asyncio.shield(lote.descarregar())
+                if backend is not None:
+                    await backend.fechar()
+        except asyncio.CancelledError:
+            # Shutdown: o job continua "running" e é retomado no próximo start
+            raise
+        except Exception as e:
+            log.exception("Erro no job %s", job_id)
+            await executar_no_store(self.store.atualizar_status, job_id, "failed", str(e))
+            return
+        finally:
+            self._progresso.pop(job_id, None)
+
+        await executar_no_store(self.store.atualizar_status, job_id, "done")
+
+    def linhas_por_segundo(self, job_id: str):
+        """Vazão da execução atual do job; None se ele não está rodando."""
+        progresso = self._progresso.get(job_id)
+        if progresso is None:
+            return None
+        decorrido = time.perf_counter() - progresso[0]
+        return round(progresso[1] / decorrido, 2) if decorrido > 0 else 0.0
+
+
+gerenciador_jobs = GerenciadorJobs()
+
+
+@registrar_coletor
+def _metricas_jobs():
+    # Só jobs rodando: o rótulo job não cresce sem limite
+    return [
+        ("geoprocessor_job_linhas_por_segundo", "gauge", "Vazão de cada job em execução",
+         {"job": job_id}, gerenciador_jobs.linhas_por_segundo(job_id))
+        for job_id in list(gerenciador_jobs._progresso)
+    ]
@@ -1,20 +1,47 @@
 import re
+from functools import lru_cache
 from rapidfuzz import fuzz
-import pandas as pd
+from app.core.logs import obter_logger
+
+log = obter_logger("normalizer")
+
+RE_NUMEROS = re.compile(r'\d+')
+RE_SEPARA_NUMERO_LETRA = re.compile(r'(\d)([a-zA-Z])')
+RE_SEPARA_LETRA_NUMERO = re.compile(r'([a-zA-Z])(\d)')
+
+# Quadra e lote numa única varredura: os prefixos não compartilham letras,
+# então um match nunca esconde o outro
+RE_QUADRA_OU_LOTE = re.compile(
+    r"\b(?:(?:Q|QD|D|QUADRA|QDA|QU|QR|QUAD|QDR)\s*[-.]?\s*0*(?P<quadra>\d+)"
+    r"|(?:L|LT|LOTE|LO|LTO|LOT)\s*[-.]?\s*0*(?P<lote>\d+))\b"
+)
+# Regex mais restritivo para evitar pegar ano ou CEP
+RE_PAR_NUMERICO = re.compile(r"\b(\d{1,4})\s*[-/]\s*(\d{1,4})\b")
+
+# Lista de paradas para cortar o nome da rua
+SEPARADORES_RUA = (
+    ",", " - ", " NUMERO", " Nº",
+    " Q", " QD", " QUADRA", " Q.", " QU ", " QR ",
+    " L", " LT", " LOTE", " L.",
+    " ESQUINA", " ESQ" 
+)
+RE_SEPARADORES_RUA = re.compile("|".join(re.escape(sep) for sep in SEPARADORES_RUA))
 
 def similaridade_texto(a, b):
     if not a or not b: return 0
     return fuzz.token_set_ratio(str(a).upper(), str(b).upper()) / 100.0
 
 def extrair_numeros(texto):
-    return re.findall(r'\d+', texto)
+    return RE_NUMEROS.findall(texto)
 
 def separar_letras_numeros(texto):
     """Garante espaço entre letras e números (ex: 'd77' -> 'd 77')"""
-    texto = re.sub(r'(\d)([a-zA-Z])', r'\1 \2', texto)
-    texto = re.sub(r'([a-zA-Z])(\d)', r'\1 \2', texto)
+    texto = RE_SEPARA_NUMERO_LETRA.sub(r'\1 \2', texto)
+    texto = RE_SEPARA_LETRA_NUMERO.sub(r'\1 \2', texto)
     return texto
 
+# Memoizado: os mesmos rótulos de candidatos da HERE se repetem entre linhas
+@lru_cache(maxsize=65536)
 def extrair_valores_quadra_lote(texto):
     if not texto: return None, None
     
@@ -25,25 +52,19 @@ def extrair_valores_quadra_lote(texto):
     val_quadra = None
     val_lote = None
 
-    # 2. Regex Robusto
-    padrao_quadra = r"\b(?:Q|QD|D|QUADRA|QDA|QU|QR|QUAD|QDR)\s*[-.]?\s*0*(\d+)\b"
-    padrao_lote = r"\b(?:L|LT|LOTE|LO|LTO|LOT)\s*[-.]?\s*0*(\d+)\b"
-
-    # Busca Quadra
-    match_q = re.search(padrao_quadra, texto_limpo)
-    if match_q: 
-        val_quadra = str(int(match_q.group(1)))
-
-    # Busca Lote
-    match_l = re.search(padrao_lote, texto_limpo)
-    if match_l: 
-        val_lote = str(int(match_l.group(1)))
+    # 2. Primeira quadra e primeiro lote, numa varredura só
+    for match in RE_QUADRA_OU_LOTE.finditer(texto_limpo):
+        if match.group("quadra") is not None:
+            if val_quadra is None:
+                val_quadra = str(int(match.group("quadra")))
+        elif val_lote is None:
+            val_lote = str(int(match.group("lote")))
+        if val_quadra and val_lote:
+            break
     
     # 3. Fallback (Último recurso)
     if not val_quadra or not val_lote:
-        # Regex mais restritivo para evitar pegar ano ou CEP
-        matches = re.finditer(r"\b(\d{1,4})\s*[-/]\s*(\d{1,4})\b", texto_limpo)
-        for m in matches:
+        for m in RE_PAR_NUMERICO.finditer(texto_limpo):
             v1 = m.group(1)
             v2 = m.group(2)
             
@@ -58,79 +79,204 @@ def extrair_valores_quadra_lote(texto):
 
     return val_quadra, val_lote
 
+@lru_cache(maxsize=64)
+def _re_separadores_sem(ignorados):
+    return re.compile("|".join(re.escape(sep) for sep in SEPARADORES_RUA if sep not in ignorados))
+
 def extrair_base_rua(endereco):
     if not endereco: return ""
     texto = endereco.upper().strip()
-    
-    # Lista de paradas para cortar o nome da rua
-    separadores = [
-        ",", " - ", " NUMERO", " Nº",
-        " Q", " QD", " QUADRA", " Q.", " QU ", " QR ",
-        " L", " LT", " LOTE", " L.",
-        " ESQUINA", " ESQ" 
-    ]
-    
-    melhor_indice = len(texto)
-    for sep in separadores:
-        idx = texto.find(sep)
-        if idx != -1 and idx < melhor_indice and idx > 2:
-            melhor_indice = idx
+
+    # Corta no primeiro separador depois da posição 2. Um separador cuja primeira
+    # ocorrência está nas posições 0-2 é ignorado por inteiro (regra original).
+    # Todo separador começa com "," ou " ", então o caso comum nem precisa checar.
+    padrao = RE_SEPARADORES_RUA
+    cabeca = texto[:3]
+    if "," in cabeca or " " in cabeca:
+        ignorados = frozenset(
+            sep for sep in SEPARADORES_RUA if texto.find(sep, 0, len(sep) + 2) != -1
+        )
+        if ignorados:
+            padrao = _re_separadores_sem(ignorados)
+
+    match = padrao.search(texto, 3)
+    melhor_indice = match.start() if match else len(texto)
             
     return texto[:melhor_indice].strip()
 
+PALAVRAS_CONDOMINIO = ("COND", "COND.", "CONDOMINIO", "CONDOMÍNIO", "JARDINS", "EDIFÍCIO", "BLOCO", "APARTAMENTO", "APTO", "APT", "BL.", "BL")
+EXCECOES_CONDOMINIO = ("RESIDENCIAL CANADA", "VEREDA DOS BURITIS")
+PALAVRAS_RESERVADAS_CODIGO = frozenset({
+    'RUA', 'AV', 'AVENIDA', 'ALAMEDA', 'VIA', 'RODOVIA',
+    'QD', 'LT', 'Q', 'L', 'QU', 'QR', 'AP', 'BL', 'CASA',
+    'QUADRA', 'QDA', 'LOTE', 'LTO'
+})
+
+RE_CONDOMINIO = re.compile("|".join(re.escape(k) for k in PALAVRAS_CONDOMINIO))
+RE_EXCECAO_CONDOMINIO = re.compile("|".join(re.escape(k) for k in EXCECOES_CONDOMINIO))
+RE_PREFIXO_RUA = re.compile(r"(^|\s)R[.]?\s+(?=[A-Z])", re.IGNORECASE)
+RE_PREFIXO_AVENIDA = re.compile(r"(^|\s)AV[.]?\s+(?=[A-Z])", re.IGNORECASE)
+RE_CODIGO_RUA = re.compile(r"\b([A-Z]{1,4})\s*[-]?\s*(\d+)\b")
+RE_QUADRA_LOTE_NA_RUA = re.compile(r'\s*[-]?\s*(QD|LT|QU|QR|QUADRA|LOTE)\s*[-]?\s*\d+')
+
+def _e_nulo(valor):
+    # pd.isna só é chamado para o que não é str (o caso comum é sempre str)
+    if valor is None:
+        return True
+    if isinstance(valor, str):
+        return False
+    import pandas as pd
+    return pd.isna(valor)
+
+def formatar_codigo(match):
+    """Formata código de rua: 'RC 10' -> 'RC-010'. Palavras reservadas ficam como estão."""
+    prefixo = match.group(1).upper()
+    if prefixo in PALAVRAS_RESERVADAS_CODIGO:
+        return match.group(0)
+
+    numero = match.group(2).zfill(3)
+    return f"{prefixo}-{numero}"
+
+def _e_condominio(texto_completo):
+    return bool(RE_CONDOMINIO.search(texto_completo)) and not RE_EXCECAO_CONDOMINIO.search(texto_completo)
+
+def _montar_endereco(base_rua, quadra, lote):
+    if quadra and lote:
+        return f"{base_rua}, {quadra}-{lote}" 
+    elif quadra:
+        return f"{base_rua}, {quadra}-{lote}"
+    
+    return base_rua
+
 def normalizar_endereco(raw, bairro):
     try:
-        if pd.isna(raw) or str(raw).strip() == "": return ""
+        if _e_nulo(raw) or str(raw).strip() == "": return ""
         texto = str(raw).strip()
-        bairro_str = "" if pd.isna(bairro) else str(bairro).strip()
+        bairro_str = "" if _e_nulo(bairro) else str(bairro).strip()
 
         texto_completo = f"{texto} {bairro_str}".upper()
         
         # Filtro de Condomínios
-        palavras_condominio = ["COND", "COND.", "CONDOMINIO", "CONDOMÍNIO", "JARDINS", "EDIFÍCIO", "BLOCO", "APARTAMENTO", "APTO", "APT", "BL.", "BL"]
-        if any(k in texto_completo for k in palavras_condominio):
-             if "RESIDENCIAL CANADA" not in texto_completo and "VEREDA DOS BURITIS" not in texto_completo:
-                 return "Condominio"
+        if _e_condominio(texto_completo):
+            return "Condominio"
 
         texto_upper = texto.upper()
         
         # 1. Garante espaços entre letras e números (ex: RI17 -> RI 17)
-        texto_upper = separar_letras_numeros(texto_upper)
+        texto_upper = RE_SEPARA_NUMERO_LETRA.sub(r'\1 \2', texto_upper)
+        texto_upper = RE_SEPARA_LETRA_NUMERO.sub(r'\1 \2', texto_upper)
 
         # 2. Padronização de prefixos
-        texto_upper = re.sub(r"(^|\s)R[.]?\s+(?=[A-Z])", r"\1RUA ", texto_upper, flags=re.IGNORECASE)
-        texto_upper = re.sub(r"(^|\s)AV[.]?\s+(?=[A-Z])", r"\1AVENIDA ", texto_upper, flags=re.IGNORECASE)
+        texto_upper = RE_PREFIXO_RUA.sub(r"\1RUA ", texto_upper)
+        texto_upper = RE_PREFIXO_AVENIDA.sub(r"\1AVENIDA ", texto_upper)
 
         # 3. Formatação de Código de Rua (ex: RC-010)
-        def formatar_codigo(match):
-            prefixo = match.group(1).upper()
-            palavras_reservadas = [
-                'RUA', 'AV', 'AVENIDA', 'ALAMEDA', 'VIA', 'RODOVIA',
-                'QD', 'LT', 'Q', 'L', 'QU', 'QR', 'AP', 'BL', 'CASA',
-                'QUADRA', 'QDA', 'LOTE', 'LTO' 
-            ]
-            
-            if prefixo in palavras_reservadas:
-                return match.group(0)
-            
-            numero = match.group(2).zfill(3)
-            return f"{prefixo}-{numero}"
-
-        texto_upper = re.sub(r"\b([A-Z]{1,4})\s*[-]?\s*(\d+)\b", formatar_codigo, texto_upper)
+        texto_upper = RE_CODIGO_RUA.sub(formatar_codigo, texto_upper)
         
         quadra, lote = extrair_valores_quadra_lote(texto_upper)
         base_rua = extrair_base_rua(texto_upper)
         
-        base_rua = re.sub(r'\s*[-]?\s*(QD|LT|QU|QR|QUADRA|LOTE)\s*[-]?\s*\d+', '', base_rua).strip()
+        base_rua = RE_QUADRA_LOTE_NA_RUA.sub('', base_rua).strip()
         base_rua = base_rua.replace(" ,", ",")
 
-        if quadra and lote:
-            return f"{base_rua}, {quadra}-{lote}" 
-        elif quadra:
-            return f"{base_rua}, {quadra}-{lote}"
-        
-        return base_rua
+        return _montar_endereco(base_rua, quadra, lote)
+
+    except Exception as e:
+        log.warning("Erro normalizacao: %s", e)
+        return str(raw)
+
+def normalizar_dataframe(df, coluna_endereco="Destination Address", coluna_bairro="Bairro"):
+    """
+    Versão em lote de normalizar_endereco para uma planilha inteira.
+
+    Cada par (endereço, bairro) distinto é normalizado uma única vez com
+    operações vetorizadas do pandas; o resultado volta para todas as linhas
+    repetidas. Retorna um DataFrame com o mesmo índice de df e as colunas
+    endereco_normalizado (idêntica a normalizar_endereco), quadra, lote,
+    base_rua e condominio.
+    """
+    # pandas é importado no primeiro uso (o lifespan antecipa): pesa no cold start
+    import pandas as pd
+    vazio = pd.Series("", index=df.index, dtype=object)
+    pares = pd.DataFrame({
+        "raw": df[coluna_endereco] if coluna_endereco in df else vazio,
+        "bairro": df[coluna_bairro] if coluna_bairro in df else vazio
+    })
 
+    # ngroup(sort=False) numera os grupos na ordem da primeira aparição,
+    # a mesma ordem das linhas mantidas por duplicated()
+    codigos = pares.groupby(["raw", "bairro"], dropna=False, sort=False).ngroup().to_numpy()
+    distintos = pares[~pares.duplicated()].reset_index(drop=True)
+
+    try:
+        resultado = _normalizar_distintos(distintos["raw"], distintos["bairro"])
     except Exception as e:
-        print(f"Erro normalizacao: {e}")
-        return str(raw)
\ No newline at end of file
+        log.warning("Erro normalizacao em lote, usando linha a linha: %s", e)
+        resultado = pd.DataFrame({
+            "endereco_normalizado": [normalizar_endereco(r, b) for r, b in zip(distintos["raw"], distintos["bairro"])],
+            "quadra": None, "lote": None, "base_rua": None, "condominio": False
+        })
+        resultado["condominio"] = resultado["endereco_normalizado"] == "Condominio"
+
+    resultado = resultado.iloc[codigos]
+    resultado.index = df.index
+    return resultado
+
+def _normalizar_distintos(raw, bairro):
+    import pandas as pd
+    n = len(raw)
+    nulo = raw.map(_e_nulo).astype(bool)
+    texto = raw.map(lambda v: "" if _e_nulo(v) else str(v)).str.strip()
+    vazio = nulo | (texto == "")
+
+    bairro_str = bairro.map(lambda v: "" if _e_nulo(v) else str(v)).str.strip()
+    texto_completo = (texto + " " + bairro_str).str.upper()
+    condominio = (
+        texto_completo.str.contains(RE_CONDOMINIO, regex=True)
+        & ~texto_completo.str.contains(RE_EXCECAO_CONDOMINIO, regex=True)
+        & ~vazio
+    )
+
+    ativos = ~(vazio | condominio)
+    t = texto[ativos].str.upper()
+    t = t.str.replace(RE_SEPARA_NUMERO_LETRA, r'\1 \2', regex=True)
+    t = t.str.replace(RE_SEPARA_LETRA_NUMERO, r'\1 \2', regex=True)
+    t = t.str.replace(RE_PREFIXO_RUA, r"\1RUA ", regex=True)
+    t = t.str.replace(RE_PREFIXO_AVENIDA, r"\1AVENIDA ", regex=True)
+    t = t.str.replace(RE_CODIGO_RUA, formatar_codigo, regex=True)
+
+    quadra_lote = t.map(extrair_valores_quadra_lote)
+    quadra = quadra_lote.str[0]
+    lote = quadra_lote.str[1]
+    base_rua = (
+        t.map(extrair_base_rua)
+        .str.replace(RE_QUADRA_LOTE_NA_RUA, '', regex=True)
+        .str.strip()
+        .str.replace(" ,", ",", regex=False)
+    )
+
+    endereco = pd.Series([""] * n, dtype=object)
+    endereco[condominio] = "Condominio"
+    endereco[ativos] = [_montar_endereco(b, q, l) for b, q, l in zip(base_rua, quadra, lote)]
+
+    saida = pd.DataFrame({
+        "endereco_normalizado": endereco,
+        "quadra": pd.Series([None] * n, dtype=object),
+        "lote": pd.Series([None] * n, dtype=object),
+        "base_rua": pd.Series([None] * n, dtype=object),
+        "condominio": condominio.to_numpy()
+    })
+    saida.loc[ativos, "quadra"] = quadra
+    saida.loc[ativos, "lote"] = lote
+    saida.loc[ativos, "base_rua"] = base_rua
+    return saida
+
+
+def normalizar_campos(indices: list, enderecos: list, bairros: list) -> dict:
+    """
+    normalizar_dataframe a partir de listas simples (barato de enviar para
+    outro processo). Retorna {indice: endereco_normalizado}.
+    """
+    import pandas as pd
+    df = pd.DataFrame({"Destination Address": enderecos, "Bairro": bairros}, index=indices)
+    return normalizar_dataframe(df)["endereco_normalizado"].to_dict()
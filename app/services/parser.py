@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+from app.services.normalizer import (
+    extrair_valores_quadra_lote,
+    extrair_base_rua,
+    extrair_numeros
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedAddress:
+    """Endereço alvo de uma linha, extraído uma única vez e reutilizado pelo processador e pelo scorer."""
+    endereco_normalizado: str
+    base_rua: str
+    numeros_rua: frozenset
+    quadra: str = None
+    lote: str = None
+    bairro: str = ""
+    cidade: str = ""
+
+
+def analisar_endereco(endereco_bruto: str, endereco_normalizado: str, bairro: str, cidade: str) -> ParsedAddress:
+    # Quadra/lote vêm do texto bruto; se não houver quadra, do normalizado
+    quadra, lote = extrair_valores_quadra_lote(endereco_bruto)
+    if not quadra:
+        quadra, lote = extrair_valores_quadra_lote(endereco_normalizado)
+
+    base_rua = extrair_base_rua(endereco_normalizado)
+    return ParsedAddress(
+        endereco_normalizado=endereco_normalizado,
+        base_rua=base_rua,
+        numeros_rua=frozenset(int(n) for n in extrair_numeros(base_rua.upper())),
+        quadra=quadra,
+        lote=lote,
+        bairro=bairro,
+        cidade=cidade
+    )
+
+
+def quadra_do_candidato(endereco: dict):
+    """Quadra de um candidato da HERE: procura no label, depois na rua, depois no número."""
+    for campo in ("label", "street", "houseNumber"):
+        quadra, _ = extrair_valores_quadra_lote(endereco.get(campo, ""))
+        if quadra:
+            return quadra
+    return None
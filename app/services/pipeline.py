@@ -0,0 +1,236 @@
+import asyncio
+import math
+import threading
+import time
+from app.core.config import settings
+from app.core.logs import obter_logger, ctx_linha
+from app.core.metrics import cronometrar, observar_etapa, contar_linha
+from app.services.processor import (
+    buscar_melhor_localizacao,
+    consultas_previstas,
+    chave_resultado,
+    resultado_cacheavel
+)
+from app.services.cache import CacheLinhas
+from app.services.planejador import planejador
+from app.services.geocoder import BackendGeocoder, ctx_geocoder, geocoder_por_consulta
+from app.services.normalizer import normalizar_campos
+from app.services.executor_cpu import executor_cpu
+from app.services.database import buscar_coordenadas_em_lote, buffer_escrita
+
+log = obter_logger("pipeline")
+_FIM = object()
+LOTE_CACHE_LINHAS = 200
+
+# Resultado de cada linha já processada: reenvios da mesma planilha só
+# processam as linhas novas ou alteradas. Caminho vazio desliga.
+cache_linhas = None
+_cache_linhas_criado = False
+_lock_cache_linhas = threading.Lock()
+
+
+def obter_cache_linhas():
+    """CacheLinhas (None se ROW_CACHE_PATH estiver vazio), aberto no primeiro uso. Bloqueante: chamar fora do event loop."""
+    global cache_linhas, _cache_linhas_criado
+    if not _cache_linhas_criado:
+        with _lock_cache_linhas:
+            if not _cache_linhas_criado:
+                if cache_linhas is None and settings.ROW_CACHE_PATH:
+                    cache_linhas = CacheLinhas(settings.ROW_CACHE_PATH, settings.ROW_CACHE_TTL)
+                _cache_linhas_criado = True
+    return cache_linhas
+
+
+async def processar_linha(index, linha, enderecos_conhecidos: dict = None, endereco_normalizado: str = None):
+    inicio = time.perf_counter()
+    lat, lng, is_partial, is_cond, status, endereco_normalizado = await buscar_melhor_localizacao(
+        linha, enderecos_conhecidos, endereco_normalizado
+    )
+    duracao = time.perf_counter() - inicio
+    observar_etapa("linha", duracao)
+    contar_linha(status)
+    return {
+        "idx": index,
+        "Geo_Latitude": lat,
+        "Geo_Longitude": lng,
+        "Partial_Match": is_partial,
+        "Cond_Match": is_cond,
+        "Status_Log": status,
+        "Endereco Normalizado": endereco_normalizado,
+        "Tempo_ms": round(duracao * 1000, 1)
+    }
+
+
+def limpar_valores(registro: dict):
+    """Troca NaN/NaT por None para o registro ser serializável em JSON."""
+    limpo = {}
+    for chave, valor in registro.items():
+        if isinstance(valor, float) and math.isnan(valor):
+            valor = None
+        elif valor is not None and type(valor).__name__ in ("NaTType", "NAType"):
+            valor = None
+        limpo[chave] = valor
+    return limpo
+
+
+def campos_normalizacao(linhas) -> tuple:
+    """(indices, enderecos, bairros) de pares (idx, linha), com a mesma conversão de buscar_melhor_localizacao."""
+    return (
+        [idx for idx, _ in linhas],
+        [str(linha.get("Destination Address", "")) for _, linha in linhas],
+        [str(linha.get("Bairro", "")).strip() for _, linha in linhas]
+    )
+
+
+async def preparar_linhas(linhas) -> tuple:
+    """
+    Normaliza um bloco de linhas e resolve no banco, em lote, os endereços já conhecidos.
+    Retorna ({idx: endereco_normalizado}, {endereco_normalizado: registro}).
+    """
+    with cronometrar("normalizacao"):
+        normalizados = await executor_cpu.executar(normalizar_campos, *campos_normalizacao(linhas))
+    distintos = set(normalizados.values())
+    distintos.discard("Condominio")
+    return normalizados, await buscar_coordenadas_em_lote(distintos)
+
+
+async def consultas_do_job(blocos) -> list:
+    """
+    Consultas que as linhas dos blocos vão fazer na HERE, sem repetição, para
+    o backend em lote mandar todas de uma vez antes do processamento. Linhas
+    que o cache de linhas já resolve ficam de fora. Normaliza cada linha uma
+    vez a mais; em troca o job inteiro vai num lote só.
+    """
+    cache_linhas = await asyncio.to_thread(obter_cache_linhas)
+    consultas = {}
+    async for bloco in blocos:
+        if cache_linhas is not None:
+            chaves = {idx: chave_resultado(linha) for idx, linha in bloco}
+            em_cache = await asyncio.to_thread(cache_linhas.obter_lote, set(chaves.values()))
+            bloco = [(idx, linha) for idx, linha in bloco if chaves[idx] not in em_cache]
+        if not bloco:
+            continue
+        normalizados, enderecos_conhecidos = await preparar_linhas(bloco)
+        for idx, linha in bloco:
+            for consulta in consultas_previstas(linha, normalizados.get(idx), enderecos_conhecidos):
+                consultas.setdefault(consulta, None)
+    return list(consultas)
+
+
+async def processar_blocos_em_ordem_de_conclusao(blocos, backend: BackendGeocoder = geocoder_por_consulta):
+    """
+    Recebe um iterável assíncrono de blocos de (idx, linha) (ex.:
+    Planilha.blocos()) e entrega (idx, linha_original, resultado) assim que
+    cada linha termina, sem esperar a planilha inteira. Cada bloco
+    é normalizado e pré-buscado no banco assim que chega, e suas linhas entram
+    no geocoding antes do resto do arquivo ser lido. No máximo
+    INGEST_MAX_PENDING linhas lidas ficam sem entregar: acima disso a leitura espera.
+
+    backend: como as linhas chegam na HERE. Quem passa um backend em lote já
+    chamou preparar() com as consultas do job e o fecha no fim.
+    """
+    cache_linhas = await asyncio.to_thread(obter_cache_linhas)
+    sem = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
+    janela = asyncio.Semaphore(max(settings.INGEST_MAX_PENDING, settings.MAX_CONCURRENT_REQUESTS))
+    prontos = asyncio.Queue()
+    tarefas = set()
+    para_cache = []
+    # Linhas repetidas na planilha: vale o resultado da primeira que terminar
+    chaves_gravadas = set()
+
+    async def gravar_cache(forcar: bool = False):
+        if para_cache and (forcar or len(para_cache) >= LOTE_CACHE_LINHAS):
+            itens = para_cache[:]
+            para_cache.clear()
+            await asyncio.to_thread(cache_linhas.salvar_lote, itens)
+
+    async def servir_do_cache(bloco) -> list:
+        """Entrega as linhas do bloco que já estão no cache; devolve as que precisam ser processadas."""
+        chaves = {idx: chave_resultado(linha) for idx, linha in bloco}
+        em_cache = await asyncio.to_thread(cache_linhas.obter_lote, set(chaves.values()))
+        pendentes = []
+        for idx, linha in bloco:
+            resultado = em_cache.get(chaves[idx])
+            if resultado is None:
+                pendentes.append((idx, linha, chaves[idx]))
+                continue
+            await janela.acquire()
+            contar_linha(resultado["Status_Log"])
+            prontos.put_nowait((idx, linha, {"idx": idx, **resultado, "Tempo_ms": 0.0}))
+        return pendentes
+
+    async def executar(idx, linha, enderecos_conhecidos, endereco_normalizado, chave):
+        ctx_linha.set(idx)
+        async with sem:
+            try:
+                resultado = await processar_linha(idx, linha, enderecos_conhecidos, endereco_normalizado)
+            except Exception as e:
+                # Uma linha com erro não derruba o stream inteiro
+                log.exception("Erro ao processar linha %s: %s", idx, e)
+                contar_linha("ERRO_PROCESSAMENTO")
+                resultado = {
+                    "idx": idx,
+                    "Geo_Latitude": "Não encontrado",
+                    "Geo_Longitude": "Não encontrado",
+                    "Partial_Match": False,
+                    "Cond_Match": False,
+                    "Status_Log": "ERRO_PROCESSAMENTO",
+                    "Endereco Normalizado": ""
+                }
+        prontos.put_nowait((idx, linha, resultado))
+
+        if chave and chave not in chaves_gravadas and resultado_cacheavel(resultado["Status_Log"]):
+            chaves_gravadas.add(chave)
+            para_cache.append((chave, {k: v for k, v in resultado.items() if k not in ("idx", "Tempo_ms")}))
+            await gravar_cache()
+
+    async def produzir():
+        # As tarefas das linhas criadas aqui herdam o backend
+        ctx_geocoder.set(backend)
+        try:
+            async for bloco in blocos:
+                if cache_linhas is not None:
+                    pendentes = await servir_do_cache(bloco)
+                    bloco = [(idx, linha) for idx, linha, _ in pendentes]
+                    chaves = {idx: chave for idx, _, chave in pendentes}
+                else:
+                    chaves = {}
+                if not bloco:
+                    continue
+                normalizados, enderecos_conhecidos = await preparar_linhas(bloco)
+                for idx, linha in bloco:
+                    await janela.acquire()
+                    tarefa = asyncio.create_task(
+                        executar(idx, linha, enderecos_conhecidos, normalizados.get(idx), chaves.get(idx))
+                    )
+                    tarefas.add(tarefa)
+                    tarefa.add_done_callback(tarefas.discard)
+            if tarefas:
+                await asyncio.gather(*list(tarefas))
+            if cache_linhas is not None:
+                await gravar_cache(forcar=True)
+            await asyncio.to_thread(planejador.gravar)
+            prontos.put_nowait(_FIM)
+        except Exception as e:
+            prontos.put_nowait(e)
+        finally:
+            if hasattr(blocos, "aclose"):
+                await blocos.aclose()
+
+    produtor = asyncio.create_task(produzir())
+    try:
+        while True:
+            item = await prontos.get()
+            if item is _FIM:
+                break
+            if isinstance(item, Exception):
+                raise item
+            janela.release()
+            yield item
+        # Fim da planilha: grava o que ficou no buffer sem esperar o timer
+        await buffer_escrita.descarregar()
+    finally:
+        # Cliente desconectou no meio do stream: não deixa tarefas órfãs consumindo a API
+        produtor.cancel()
+        for tarefa in list(tarefas):
+            tarefa.cancel()
@@ -0,0 +1,249 @@
+import os
+import random
+import sqlite3
+import threading
+from app.core.config import settings
+from app.core.logs import obter_logger
+from app.core.metrics import registrar_coletor
+from app.services.indice_enderecos import canonizar_bairro, chave_rua
+from app.services.parser import ParsedAddress
+
+log = obter_logger("planejador")
+
+MODOS = ("off", "shadow", "on")
+# Bairro do agregado da cidade inteira, usado quando o bairro tem poucas amostras
+TODOS_BAIRROS = "*"
+
+
+def padrao_endereco(alvo: ParsedAddress) -> str:
+    """'QL_NUM': com quadra e lote, rua com código/número ('RC 10', 'Rua 1'); 'RUA_NOME': só a rua, por nome."""
+    if alvo.quadra and alvo.lote:
+        partes = "QL"
+    elif alvo.quadra:
+        partes = "Q"
+    else:
+        partes = "RUA"
+    _, assinatura = chave_rua(alvo.base_rua)
+    return f"{partes}_{'NUM' if assinatura else 'NOME'}"
+
+
+class EstatisticasEstrategias:
+    """
+    Tentativas, sucessos (score 100) e tempo de cada estratégia por
+    (cidade, bairro, padrão do endereço). Tudo fica em memória; gravar()
+    soma no SQLite só o que mudou desde a última gravação, então vários
+    workers podem dividir o mesmo arquivo.
+
+    O arquivo só é lido em carregar() (bloqueante: o lifespan chama numa
+    thread). Até lá obter() vê só o que foi registrado neste processo, e o
+    planejador fica na ordem fixa.
+    """
+
+    def __init__(self, caminho: str = None):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._dados = {}
+        self._pendentes = {}
+        self._conn = None
+
+    def carregar(self):
+        if not self.caminho or self._conn is not None:
+            return
+        if self.caminho != ":memory:":
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.caminho, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS estatisticas_estrategias (
+                cidade TEXT NOT NULL,
+                bairro TEXT NOT NULL,
+                padrao TEXT NOT NULL,
+                estrategia TEXT NOT NULL,
+                tentativas INTEGER NOT NULL,
+                sucessos INTEGER NOT NULL,
+                segundos REAL NOT NULL,
+                PRIMARY KEY (cidade, bairro, padrao, estrategia)
+            )
+        """)
+        conn.commit()
+        rows = conn.execute(
+            "SELECT cidade, bairro, padrao, estrategia, tentativas, sucessos, segundos FROM estatisticas_estrategias"
+        ).fetchall()
+        with self._lock:
+            if self._conn is not None:
+                conn.close()
+                return
+            # Soma ao que já foi registrado antes da carga (que continua pendente para gravar)
+            for cidade, bairro, padrao, estrategia, tentativas, sucessos, segundos in rows:
+                valores = self._dados.setdefault((cidade, bairro, padrao, estrategia), [0, 0, 0.0])
+                valores[0] += tentativas
+                valores[1] += sucessos
+                valores[2] += segundos
+            self._conn = conn
+
+    def __len__(self):
+        return len(self._dados)
+
+    def registrar(self, grupo: tuple, estrategia: str, sucesso: bool, segundos: float):
+        cidade, bairro, padrao = grupo
+        with self._lock:
+            for chave in ((cidade, bairro, padrao, estrategia), (cidade, TODOS_BAIRROS, padrao, estrategia)):
+                for tabela in (self._dados, self._pendentes):
+                    valores = tabela.get(chave)
+                    if valores is None:
+                        valores = tabela[chave] = [0, 0, 0.0]
+                    valores[0] += 1
+                    valores[1] += int(sucesso)
+                    valores[2] += segundos
+
+    def obter(self, grupo: tuple, estrategia: str):
+        """(tentativas, sucessos, segundos) ou None."""
+        valores = self._dados.get((*grupo, estrategia))
+        return tuple(valores) if valores else None
+
+    def itens(self) -> list:
+        """[((cidade, bairro, padrão, estratégia), (tentativas, sucessos, segundos)), ...]"""
+        with self._lock:
+            return [(chave, tuple(valores)) for chave, valores in self._dados.items()]
+
+    def gravar(self):
+        self.carregar()
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+        if not pendentes or self._conn is None:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO estatisticas_estrategias "
+                "(cidade, bairro, padrao, estrategia, tentativas, sucessos, segundos) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (cidade, bairro, padrao, estrategia) DO UPDATE SET "
+                "tentativas = tentativas + excluded.tentativas, "
+                "sucessos = sucessos + excluded.sucessos, "
+                "segundos = segundos + excluded.segundos",
+                ((*chave, *valores) for chave, valores in pendentes.items())
+            )
+            self._conn.commit()
+
+
+class Planejador:
+    """
+    Ordena as estratégias de cada linha pela taxa de sucesso observada no
+    grupo dela (cidade, bairro, padrão do endereço), caindo para o agregado
+    da cidade quando o bairro tem menos de min_amostras tentativas. As que
+    quase nunca acertam (taxa < taxa_min) viram reserva: só são tentadas se
+    o plano não achar score 100, então a taxa de match não cai. Enquanto
+    alguma estratégia da linha não tiver amostras suficientes, vale a ordem
+    fixa. Uma fração "exploracao" das linhas também usa a ordem fixa, para
+    as estratégias da reserva continuarem sendo medidas.
+
+    Modos: "off" (ordem fixa, sem estatísticas), "shadow" (ordem fixa,
+    só coleta) e "on".
+    """
+
+    def __init__(self, estatisticas: EstatisticasEstrategias, modo: str, min_amostras: int,
+                 taxa_min: float, exploracao: float, aleatorio: random.Random = None):
+        if modo not in MODOS:
+            raise ValueError(f"PLANNER_MODE inválido: {modo} (use {', '.join(MODOS)})")
+        self.estatisticas = estatisticas
+        self.modo = modo
+        self.min_amostras = min_amostras
+        self.taxa_min = taxa_min
+        self.exploracao = exploracao
+        self._aleatorio = aleatorio or random.Random()
+        self.planejadas = 0
+        self.reordenadas = 0
+        self.adiadas = 0
+
+    def grupo(self, alvo: ParsedAddress):
+        """Grupo de estatísticas da linha (None com o planejador desligado)."""
+        if self.modo == "off":
+            return None
+        return canonizar_bairro(alvo.cidade), canonizar_bairro(alvo.bairro), padrao_endereco(alvo)
+
+    def _taxa(self, grupo: tuple, estrategia: str):
+        for chave in (grupo, (grupo[0], TODOS_BAIRROS, grupo[2])):
+            valores = self.estatisticas.obter(chave, estrategia)
+            if valores and valores[0] >= self.min_amostras:
+                tentativas, sucessos, _ = valores
+                # Suavização de Laplace: poucas amostras não viram 0% nem 100%
+                return (sucessos + 1) / (tentativas + 2)
+        return None
+
+    def _ordenar(self, estrategias: list, grupo: tuple):
+        """(plano, reserva) pelas taxas do grupo; None enquanto faltar amostra de alguma estratégia."""
+        taxas = [self._taxa(grupo, strat["type"]) for strat in estrategias]
+        if None in taxas:
+            return None
+
+        # Empate mantém a ordem fixa
+        ordem = sorted(range(len(estrategias)), key=lambda i: -taxas[i])
+        plano = [estrategias[i] for i in ordem if taxas[i] >= self.taxa_min]
+        reserva = [estrategias[i] for i in ordem if taxas[i] < self.taxa_min]
+        if not plano:
+            plano, reserva = reserva, []
+        return plano, reserva
+
+    def planejar(self, estrategias: list, grupo) -> tuple:
+        """(plano, reserva): estratégias na ordem em que devem ser tentadas e as adiadas."""
+        if self.modo != "on" or grupo is None or self._aleatorio.random() < self.exploracao:
+            return estrategias, []
+        ordenado = self._ordenar(estrategias, grupo)
+        if ordenado is None:
+            return estrategias, []
+
+        plano, reserva = ordenado
+        self.planejadas += 1
+        if plano + reserva != estrategias:
+            self.reordenadas += 1
+        self.adiadas += len(reserva)
+        return plano, reserva
+
+    def prever(self, estrategias: list, grupo) -> list:
+        """
+        Estratégias do plano da linha, sem sortear a exploração nem contar nas
+        métricas: as consultas que o backend em lote deve mandar de antemão.
+        """
+        if self.modo != "on" or grupo is None:
+            return estrategias
+        ordenado = self._ordenar(estrategias, grupo)
+        return estrategias if ordenado is None else ordenado[0]
+
+    def registrar(self, grupo, estrategia: str, sucesso: bool, segundos: float):
+        if grupo is not None:
+            self.estatisticas.registrar(grupo, estrategia, sucesso, segundos)
+
+    def gravar(self):
+        try:
+            self.estatisticas.gravar()
+        except sqlite3.Error as e:
+            log.warning("Estatísticas do planejador não gravadas: %r", e)
+
+    def resumo(self) -> dict:
+        return {
+            "modo": self.modo,
+            "series": len(self.estatisticas),
+            "linhas_planejadas": self.planejadas,
+            "linhas_reordenadas": self.reordenadas,
+            "estrategias_adiadas": self.adiadas
+        }
+
+
+planejador = Planejador(
+    EstatisticasEstrategias(settings.PLANNER_STATS_PATH or None),
+    modo=settings.PLANNER_MODE,
+    min_amostras=settings.PLANNER_MIN_SAMPLES,
+    taxa_min=settings.PLANNER_SKIP_RATE,
+    exploracao=settings.PLANNER_EXPLORE
+)
+
+
+@registrar_coletor
+def _metricas_planejador():
+    return [
+        ("geoprocessor_planejador_linhas_total", "counter", "Linhas com estratégias ordenadas pelo planejador",
+         {}, planejador.planejadas),
+        ("geoprocessor_planejador_reordenadas_total", "counter", "Linhas em que o plano mudou a ordem fixa",
+         {}, planejador.reordenadas),
+        ("geoprocessor_planejador_adiadas_total", "counter", "Estratégias deixadas como reserva pelo planejador",
+         {}, planejador.adiadas),
+    ]
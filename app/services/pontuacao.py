@@ -0,0 +1,122 @@
+from app.core.logs import logger_candidatos
+from app.services.normalizer import extrair_numeros, similaridade_texto
+from app.services.parser import ParsedAddress, quadra_do_candidato
+
+
+def log_candidato(idx, status, msg, detalhes=""):
+    logger_candidatos.debug("Cand %s: [%s] %s | %s", idx, status, msg, detalhes)
+
+def selecionar_melhor_candidato(lista_candidatos, alvo: ParsedAddress, rastrear: bool = False):
+    """rastrear: registra a análise de cada candidato (linhas amostradas, ver amostrar_linha)."""
+    melhor_candidato = None
+    melhor_pontuacao = -1
+
+    # Dados alvo já extraídos em analisar_endereco
+    rua_alvo = alvo.base_rua.upper()
+    set_numeros_alvo = alvo.numeros_rua
+    
+    bairro_alvo = alvo.bairro.upper()
+    cidade_alvo = alvo.cidade.upper()
+    quadra_alvo = alvo.quadra
+    lote_alvo = alvo.lote
+    
+    if rastrear:
+        logger_candidatos.debug(
+            "ALVO: Rua: %s | Q: %s L: %s | Bairro: %s", rua_alvo, quadra_alvo, lote_alvo, bairro_alvo
+        )
+
+    if quadra_alvo is None or lote_alvo is None:
+        if rastrear:
+            logger_candidatos.debug("FALHA CRÍTICA: Sem Quadra/Lote no Alvo")
+        return ("Não encontrado", "Não encontrado", False, False, "FAILED_NO_QD_LT_TARGET")
+
+    for idx, candidato in enumerate(lista_candidatos):
+        endereco = candidato.get("address", {})
+        rua_encontrada = endereco.get("street", "").upper()
+        bairro_encontrado = endereco.get("district", "").upper()
+        rotulo = endereco.get("label", "")
+        
+        pontuacoes = candidato.get("scoring", {}).get("fieldScore", {})
+        posicao = candidato.get("position", {})
+
+        # 1. Exact Match HERE
+        score_cidade = pontuacoes.get("city", 0)
+        score_numero = pontuacoes.get("houseNumber", 0)
+        score_rua_lista = pontuacoes.get("streets", [0])
+        score_rua = score_rua_lista[0] if score_rua_lista else 0
+
+        if (score_cidade == 1.0 and score_numero == 1.0 and score_rua >= 0.83):
+            if rastrear:
+                log_candidato(idx, "SUCESSO", "API Exact Match (100%)", f"Rua: {rua_encontrada}")
+            return (posicao.get("lat"), posicao.get("lng"), False, False, "EXACT_MATCH_API")
+
+        # 2. Validação Cidade
+        cidade_encontrada = endereco.get("city", "").upper()
+        if cidade_alvo and cidade_alvo not in cidade_encontrada:
+             if similaridade_texto(cidade_alvo, cidade_encontrada) < 0.8:
+                if rastrear:
+                    log_candidato(idx, "IGNORADO", "Cidade Divergente", cidade_encontrada)
+                continue 
+
+        # Limpeza rua
+        rua_limpa = rua_encontrada.split("QUADRA")[0].strip()
+
+        # 3. Validação Números Rua
+        if set_numeros_alvo:
+            nums_enc = extrair_numeros(rua_limpa)
+            if nums_enc:
+                set_enc = {int(n) for n in nums_enc}
+                if not set_numeros_alvo.intersection(set_enc):
+                    if rastrear:
+                        log_candidato(idx, "IGNORADO", "Número da Rua Incompatível", f"Alvo:{set_numeros_alvo} vs Enc:{set_enc}")
+                    continue
+
+        # 4. Validação Quadra
+        q_enc = quadra_do_candidato(endereco)
+
+        if quadra_alvo and q_enc and quadra_alvo != q_enc:
+            if rastrear:
+                log_candidato(idx, "REJEITADO", "Quadra Diferente", f"Alvo:{quadra_alvo} vs Enc:{q_enc}")
+            continue
+
+        # 5. Validação Bairro
+        bairro_valido = True
+        if bairro_alvo:
+            if bairro_alvo not in rotulo.upper() and bairro_alvo not in bairro_encontrado:
+                sim = similaridade_texto(bairro_alvo, bairro_encontrado)
+                if sim < 0.45:
+                    if len(rua_alvo) < 6: 
+                        if rastrear:
+                            log_candidato(idx, "REJEITADO", "Bairro Errado (Rua Curta)", f"{bairro_alvo} vs {bairro_encontrado}")
+                        continue 
+                    bairro_valido = False
+
+        # --- Pontuação ---
+        pontuacao = 0
+        log_txt = ""
+
+        if quadra_alvo and q_enc and quadra_alvo == q_enc:
+            pontuacao += 100
+            log_txt = "MATCH_QUADRA_OK"
+        else:
+            pontuacao += 50
+            log_txt = "MATCH_RUA_ONLY"
+
+        if not bairro_valido:
+            pontuacao -= 30
+            log_txt += "_BAIRRO_MISMATCH"
+
+        if rastrear:
+            log_candidato(idx, "CANDIDATO", f"Score: {pontuacao}", f"Log: {log_txt} | Rua: {rua_encontrada}")
+
+        if pontuacao > melhor_pontuacao:
+            melhor_pontuacao = pontuacao
+            e_parcial = not (pontuacao >= 100 and bairro_valido)
+            melhor_candidato = (posicao.get("lat"), posicao.get("lng"), e_parcial, False, log_txt)
+
+    return melhor_candidato
+
+
+def pontuar_lote(pedidos: list) -> list:
+    """[(candidatos, alvo), ...] -> [resultado, ...]; uma ida ao pool de CPU por lote."""
+    return [selecionar_melhor_candidato(candidatos, alvo) for candidatos, alvo in pedidos]
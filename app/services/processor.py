@@ -1,146 +1,199 @@
 import asyncio
-import re
-import pandas as pd
-from app.services.geocoder import geocode_with_here
-from app.services.database import (salvar_endereco_encontrado, buscar_coordenadas)
-from app.services.normalizer import (
-    normalizar_endereco, 
-    extrair_valores_quadra_lote, 
-    extrair_base_rua,
-    extrair_numeros,
-    similaridade_texto
-)
-
-def log_candidato(idx, status, msg, detalhes=""):
-    print(f"   -> Cand {idx}: [{status}] {msg} | {detalhes}")
-
-def selecionar_melhor_candidato(lista_candidatos, dados_alvo):
-    melhor_candidato = None
-    melhor_pontuacao = -1
-    
-    print("\n--- INICIO ANALISE DE CANDIDATOS ---")
-
-    # Extração dados alvo
-    rua_alvo = dados_alvo['base_rua'].upper()
-    numeros_alvo = extrair_numeros(rua_alvo)
-    set_numeros_alvo = {int(n) for n in numeros_alvo} if numeros_alvo else set()
-    
-    bairro_alvo = dados_alvo['bairro'].upper()
-    cidade_alvo = dados_alvo['cidade_alvo'].upper()
-    quadra_alvo = dados_alvo['quadra']
-    lote_alvo = dados_alvo['lote']
-    
-    print(f"ALVO: Rua: {rua_alvo} | Q: {quadra_alvo} L: {lote_alvo} | Bairro: {bairro_alvo}")
-
-    if pd.isna(quadra_alvo) or pd.isna(lote_alvo):
-        print("!!! FALHA CRÍTICA: Sem Quadra/Lote no Alvo")
-        return ("Não encontrado", "Não encontrado", False, False, "FAILED_NO_QD_LT_TARGET")
-
-    for idx, candidato in enumerate(lista_candidatos):
-        endereco = candidato.get("address", {})
-        rua_encontrada = endereco.get("street", "").upper()
-        bairro_encontrado = endereco.get("district", "").upper()
-        numero_encontrado = endereco.get("houseNumber", "").upper()
-        rotulo = endereco.get("label", "")
-        
-        pontuacoes = candidato.get("scoring", {}).get("fieldScore", {})
-        posicao = candidato.get("position", {})
-
-        # 1. Exact Match HERE
-        score_cidade = pontuacoes.get("city", 0)
-        score_numero = pontuacoes.get("houseNumber", 0)
-        score_rua_lista = pontuacoes.get("streets", [0])
-        score_rua = score_rua_lista[0] if score_rua_lista else 0
-
-        if (score_cidade == 1.0 and score_numero == 1.0 and score_rua >= 0.83):
-            log_candidato(idx, "SUCESSO", "API Exact Match (100%)", f"Rua: {rua_encontrada}")
-            return (posicao.get("lat"), posicao.get("lng"), False, False, "EXACT_MATCH_API")
-
-        # 2. Validação Cidade
-        cidade_encontrada = endereco.get("city", "").upper()
-        if cidade_alvo and cidade_alvo not in cidade_encontrada:
-             if similaridade_texto(cidade_alvo, cidade_encontrada) < 0.8:
-                log_candidato(idx, "IGNORADO", "Cidade Divergente", cidade_encontrada)
-                continue 
-
-        # Limpeza rua
-        rua_limpa = rua_encontrada.split("QUADRA")[0].strip()
-
-        # 3. Validação Números Rua
-        if set_numeros_alvo:
-            nums_enc = extrair_numeros(rua_limpa)
-            if nums_enc:
-                set_enc = {int(n) for n in nums_enc}
-                if not set_numeros_alvo.intersection(set_enc):
-                    log_candidato(idx, "IGNORADO", "Número da Rua Incompatível", f"Alvo:{set_numeros_alvo} vs Enc:{set_enc}")
-                    continue
-
-        # 4. Validação Quadra
-        q_enc, _ = extrair_valores_quadra_lote(rotulo)
-        if not q_enc: q_enc, _ = extrair_valores_quadra_lote(rua_encontrada)
-        if not q_enc: q_enc, _ = extrair_valores_quadra_lote(numero_encontrado)
-
-        if quadra_alvo and q_enc and quadra_alvo != q_enc:
-            log_candidato(idx, "REJEITADO", "Quadra Diferente", f"Alvo:{quadra_alvo} vs Enc:{q_enc}")
-            continue
-
-        # 5. Validação Bairro
-        bairro_valido = True
-        if bairro_alvo:
-            if bairro_alvo not in rotulo.upper() and bairro_alvo not in bairro_encontrado:
-                sim = similaridade_texto(bairro_alvo, bairro_encontrado)
-                if sim < 0.45:
-                    if len(rua_alvo) < 6: 
-                        log_candidato(idx, "REJEITADO", "Bairro Errado (Rua Curta)", f"{bairro_alvo} vs {bairro_encontrado}")
-                        continue 
-                    bairro_valido = False
-
-        # --- Pontuação ---
-        pontuacao = 0
-        log_txt = ""
-
-        if quadra_alvo and q_enc and quadra_alvo == q_enc:
-            pontuacao += 100
-            log_txt = "MATCH_QUADRA_OK"
+import hashlib
+import json
+import time
+from app.core.config import settings
+from app.core.logs import obter_logger, ctx_estrategia, amostrar_linha, linha_rastreada
+from app.core.metrics import cronometrar, tempo_estrategia, consultas_banco
+from app.services.geocoder import geocodificar
+from app.services.database import (buffer_escrita, buscar_coordenadas)
+from app.services.normalizer import normalizar_endereco
+from app.services.parser import ParsedAddress, analisar_endereco
+from app.services.pontuacao import selecionar_melhor_candidato
+from app.services.executor_cpu import executor_cpu
+from app.services.indice_enderecos import indice_fuzzy, indice_vizinhos
+from app.services.planejador import planejador
+
+log = obter_logger("processor")
+
+# Entra na chave do cache de linhas: mudar normalização, estratégias ou
+# pontuação de um jeito que altere resultados (ou o que é cacheado) exige incrementar
+VERSAO_ALGORITMO = 2
+# Só resultados definitivos vão para o cache de linhas: endereço já na base
+# (invalidado pela correção manual), match perfeito da HERE e condomínio.
+# Parciais e falhas podem melhorar quando a base crescer; FUZZY_DB_MATCH e
+# NEIGHBOR_INTERPOLATED vêm de outros endereços, que podem ser corrigidos depois
+STATUS_CACHEAVEIS = ("EXACT", "EXACT_MATCH_API", "MATCH_QUADRA_OK", "CONDOMINIO_DETECTED")
+
+
+def chave_resultado(linha_planilha) -> str:
+    """Chave do cache de linhas: os mesmos campos (e conversões) que buscar_melhor_localizacao lê."""
+    campos = [
+        str(linha_planilha.get("Destination Address", "")),
+        str(linha_planilha.get("Bairro", "")).strip(),
+        str(linha_planilha.get("City", "Goiânia")).strip(),
+        VERSAO_ALGORITMO
+    ]
+    return hashlib.sha256(json.dumps(campos, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def resultado_cacheavel(status: str) -> bool:
+    return status in STATUS_CACHEAVEIS
+
+async def _executar_estrategia(strat, alvo: ParsedAddress, grupo=None):
+    """Consulta a HERE para uma estratégia e pontua. Retorna (score, resultado) ou None."""
+    ctx_estrategia.set(strat["type"])
+    log.debug("[SEARCH QUERY]: %s", strat["q"])
+    inicio = time.perf_counter()
+    try:
+        avaliado = await avaliar_estrategia(strat, alvo)
+    finally:
+        segundos = time.perf_counter() - inicio
+        tempo_estrategia.observar(segundos, estrategia=strat["type"])
+    # Cancelada no modo hedged não conta: não se sabe se teria acertado
+    planejador.registrar(grupo, strat["type"], bool(avaliado and avaliado[0] >= 100), segundos)
+    return avaliado
+
+
+async def avaliar_estrategia(strat, alvo: ParsedAddress):
+    """Geocodifica a consulta de uma estratégia e pontua os candidatos: (score, resultado), ou None."""
+    itens_retornados, status = await geocodificar(strat["q"])
+    if status != "OK" or not itens_retornados:
+        log.debug("0 resultados encontrados (%s)", status)
+        return None
+
+    log.debug("%s candidatos encontrados", len(itens_retornados))
+    with cronometrar("pontuacao"):
+        if linha_rastreada():
+            # Linha amostrada: pontua aqui para o rastreio dos candidatos sair no log deste processo
+            resultado = selecionar_melhor_candidato(itens_retornados, alvo, rastrear=True)
         else:
-            pontuacao += 50
-            log_txt = "MATCH_RUA_ONLY"
+            resultado = await executor_cpu.pontuar(itens_retornados, alvo)
+    if not resultado:
+        return None
+
+    status_log = resultado[4]
+    score_atual = 100 if "MATCH_QUADRA_OK" in status_log or "EXACT" in status_log else 50
+    if "BAIRRO_MISMATCH" in status_log:
+        score_atual -= 20
 
-        if not bairro_valido:
-            pontuacao -= 30
-            log_txt += "_BAIRRO_MISMATCH"
+    log.debug("[RESULTADO ESTRATÉGIA]: %s (Score: %s)", status_log, score_atual)
+    return score_atual, resultado
 
-        log_candidato(idx, "CANDIDATO", f"Score: {pontuacao}", f"Log: {log_txt} | Rua: {rua_encontrada}")
 
-        if pontuacao > melhor_pontuacao:
-            melhor_pontuacao = pontuacao
-            e_parcial = not (pontuacao >= 100 and bairro_valido)
-            melhor_candidato = (posicao.get("lat"), posicao.get("lng"), e_parcial, False, log_txt)
+def _melhor_parcial(avaliados):
+    # Empate fica com a estratégia que vem antes na lista
+    melhor = None
+    for avaliado in avaliados:
+        if avaliado and (melhor is None or avaliado[0] > melhor[0]):
+            melhor = avaliado
+    return melhor
 
-    return melhor_candidato
 
+async def _buscar_estrategias_em_sequencia(estrategias, alvo: ParsedAddress, grupo=None):
+    avaliados = []
+    for strat in estrategias:
+        avaliado = await _executar_estrategia(strat, alvo, grupo)
+        if avaliado and avaliado[0] >= 100:
+            return avaliado
+        avaliados.append(avaliado)
+    return _melhor_parcial(avaliados)
+
+
+async def _buscar_estrategias_em_paralelo(estrategias, alvo: ParsedAddress, grupo=None):
+    """
+    Modo hedged: dispara as estratégias ao mesmo tempo (a i-ésima com atraso de
+    i * HEDGE_STAGGER_MS) e cancela as restantes no primeiro score 100.
+    Sem score 100, vale o mesmo critério do modo sequencial.
+    """
+    atraso = settings.HEDGE_STAGGER_MS / 1000
+
+    async def executar(i, strat):
+        if i and atraso:
+            await asyncio.sleep(i * atraso)
+        return i, await _executar_estrategia(strat, alvo, grupo)
+
+    tarefas = [asyncio.create_task(executar(i, strat)) for i, strat in enumerate(estrategias)]
+    avaliados = [None] * len(estrategias)
+    try:
+        for proxima in asyncio.as_completed(tarefas):
+            i, avaliado = await proxima
+            if avaliado and avaliado[0] >= 100:
+                return avaliado
+            avaliados[i] = avaliado
+    finally:
+        for tarefa in tarefas:
+            if not tarefa.done():
+                tarefa.cancel()
+
+    return _melhor_parcial(avaliados)
+
+
+def montar_estrategias(alvo: ParsedAddress, bairro_input: str, cidade_input: str) -> list:
+    """Consultas à HERE para uma linha, na ordem em que são tentadas."""
+    estrategias = []
+    estrategias.append({"q": f"{alvo.endereco_normalizado}, {cidade_input}", "type": "NORMALIZED"})
+
+    if alvo.quadra and alvo.lote:
+        estrategias.append({"q": f"{alvo.base_rua}, QD {alvo.quadra} LT {alvo.lote}, {cidade_input}", "type": "EXPLICIT_QL"})
+
+    rua_limpa = alvo.base_rua.replace("-", " ")
+    estrategias.append({"q": f"{rua_limpa}, {bairro_input}, {cidade_input}", "type": "STREET_ONLY"})
+    return estrategias
+
+
+def consultas_previstas(linha_planilha, endereco_normalizado: str, enderecos_conhecidos: dict) -> list:
+    """
+    Consultas que buscar_melhor_localizacao pode fazer para a linha (vazio se
+    ela resolve sem a HERE: condomínio ou endereço já na base). Inclui todas as
+    estratégias do plano: no modo sequencial as seguintes só são usadas se a
+    primeira falhar, mas em lote sai mais barato mandar todas do que
+    consultá-las uma a uma. A reserva do planejador fica de fora: quase nunca
+    acerta, e se for preciso cai no cliente por consulta.
+    """
+    if endereco_normalizado == "Condominio":
+        return []
+    endereco_base = (enderecos_conhecidos or {}).get(endereco_normalizado)
+    if isinstance(endereco_base, dict) and (endereco_base.get("lat") is not None or endereco_base.get("latitude") is not None):
+        return []
 
-async def buscar_melhor_localizacao(linha_planilha):
-    print("\n" + "="*60)
     endereco_bruto = str(linha_planilha.get("Destination Address", ""))
-    print(f"[INPUT RAW]: {endereco_bruto}")
+    bairro_input = str(linha_planilha.get("Bairro", "")).strip()
+    cidade_input = str(linha_planilha.get("City", "Goiânia")).strip()
+    alvo = analisar_endereco(endereco_bruto, endereco_normalizado, bairro_input, cidade_input)
+    estrategias = montar_estrategias(alvo, bairro_input, cidade_input)
+    return [strat["q"] for strat in planejador.prever(estrategias, planejador.grupo(alvo))]
+
+
+async def buscar_melhor_localizacao(linha_planilha, enderecos_conhecidos: dict = None, endereco_normalizado: str = None):
+    """
+    enderecos_conhecidos: resultado de buscar_coordenadas_em_lote para a planilha
+    inteira. Quando informado, substitui a consulta individual ao banco.
+    endereco_normalizado: já calculado em lote (normalizar_dataframe); se None,
+    a linha é normalizada aqui.
+    """
+    endereco_bruto = str(linha_planilha.get("Destination Address", ""))
+    amostrar_linha()
+    log.debug("[INPUT RAW]: %s", endereco_bruto)
     
     bairro_input = str(linha_planilha.get("Bairro", "")).strip()
     cidade_input = str(linha_planilha.get("City", "Goiânia")).strip()
 
     # Normalização
-    endereco_normalizado = normalizar_endereco(endereco_bruto, bairro_input)
-    print(f"[NORMALIZED]: {endereco_normalizado}")
+    if endereco_normalizado is None:
+        endereco_normalizado = normalizar_endereco(endereco_bruto, bairro_input)
+    log.debug("[NORMALIZED]: %s", endereco_normalizado)
 
     # Condominio detectado
     if endereco_normalizado == "Condominio":
         return "", "", False, True, "CONDOMINIO_DETECTED", endereco_normalizado
 
     #Validar se exite na base
-    endereco_base = buscar_coordenadas(endereco_normalizado)
-
-    if asyncio.iscoroutine(endereco_base):
-        endereco_base = await endereco_base
+    if enderecos_conhecidos is not None:
+        endereco_base = enderecos_conhecidos.get(endereco_normalizado)
+    else:
+        endereco_base = await buscar_coordenadas(endereco_normalizado)
+    consultas_banco.inc(resultado="hit" if endereco_base and "erro" not in endereco_base else "miss")
 
     if endereco_base and isinstance(endereco_base, dict):
         lat_b = endereco_base.get("latitude")
@@ -156,71 +209,54 @@ async def buscar_melhor_localizacao(linha_planilha):
             return lat_b, lng_b, False, False, "EXACT", end_norm_ret
 
 
-    target_q, target_l = extrair_valores_quadra_lote(endereco_bruto)
-    if not target_q:
-        target_q, target_l = extrair_valores_quadra_lote(endereco_normalizado)
+    alvo = analisar_endereco(endereco_bruto, endereco_normalizado, bairro_input, cidade_input)
+    target_q, target_l = alvo.quadra, alvo.lote
 
-    print(f"[EXTRACTED]: Q: {target_q} | L: {target_l}")
-    base_rua = extrair_base_rua(endereco_normalizado)
-    
-    dados_alvo = {
-        'base_rua': base_rua,
-        'bairro': bairro_input,
-        'cidade_alvo': cidade_input,
-        'quadra': target_q,
-        'lote': target_l
-    }
+    log.debug("[EXTRACTED]: Q: %s | L: %s", target_q, target_l)
 
-    estrategias = []
-    estrategias.append({"q": f"{endereco_normalizado}, {cidade_input}", "type": "NORMALIZED"})
+    # Variação de grafia de um endereço já geocodificado: resolve sem chamar a HERE
+    if settings.FUZZY_INDEX_ENABLED:
+        similar = indice_fuzzy.buscar(alvo)
+        if similar:
+            entrada, score = similar
+            log.debug("[FUZZY]: %s (%s)", entrada.endereco_normalizado, score)
+            return entrada.lat, entrada.lng, False, False, f"FUZZY_DB_MATCH ({score})", endereco_normalizado
 
-    if target_q and target_l:
-        estrategias.append({"q": f"{base_rua}, QD {target_q} LT {target_l}, {cidade_input}", "type": "EXPLICIT_QL"})
-
-    rua_limpa = base_rua.replace("-", " ") 
-    estrategias.append({"q": f"{rua_limpa}, {bairro_input}, {cidade_input}", "type": "STREET_ONLY"})
+    estrategias = montar_estrategias(alvo, bairro_input, cidade_input)
+    grupo = planejador.grupo(alvo)
+    plano, reserva = planejador.planejar(estrategias, grupo)
 
     melhor_resultado_global = ("Não encontrado", "Não encontrado", False, False, "FAILED")
     maior_score_global = -1
-    
-    for strat in estrategias:
-        print(f"[SEARCH QUERY]: {strat['q']} ({strat['type']})")
-        
-        itens_retornados, status = await geocode_with_here(strat["q"])
-        if status != "OK" or not itens_retornados:
-            print("   -> 0 resultados encontrados.")
-            continue
-
-        print(f"   -> {len(itens_retornados)} candidatos encontrados.")
-        resultado = selecionar_melhor_candidato(itens_retornados, dados_alvo)
-        
-        if resultado:
-            lat, lng, parcial, cond, log = resultado
-            
-            score_atual = 100 if "MATCH_QUADRA_OK" in log or "EXACT" in log else 50
-            if "BAIRRO_MISMATCH" in log: 
-                score_atual -= 20
-            
-            print(f"   -> [RESULTADO ESTRATÉGIA]: {log} (Score: {score_atual})")
-            
-            if score_atual >= 100:
-                print("[DECISÃO]: Match Perfeito. Salvando na base.")
-                salvar_endereco_encontrado({
-                    "endereco_normalizado": endereco_normalizado,
-                    "bairro": bairro_input,
-                    "cidade": cidade_input,
-                    "lat": lat,
-                    "lng": lng
-                })
-                return lat, lng, parcial, cond, log, endereco_normalizado
-            
-            if score_atual > maior_score_global:
-                maior_score_global = score_atual
-                melhor_resultado_global = (lat, lng, parcial, cond, log)
-
-    if target_q and target_l and maior_score_global < 100:
-        print("[NEIGHBOR]: Tentando vizinhos...")
-        pass
-
-    lat, lng, parcial, cond, log = melhor_resultado_global
-    return lat, lng, parcial, cond, log, endereco_normalizado
+
+    buscar = _buscar_estrategias_em_paralelo if settings.SEARCH_MODE == "hedged" else _buscar_estrategias_em_sequencia
+    melhor = await buscar(plano, alvo, grupo)
+    if reserva and not (melhor and melhor[0] >= 100):
+        log.debug("[PLANEJADOR]: Plano sem match perfeito, tentando reserva")
+        melhor = _melhor_parcial([melhor, await buscar(reserva, alvo, grupo)])
+
+    if melhor:
+        maior_score_global, melhor_resultado_global = melhor
+        lat, lng, parcial, cond, status_log = melhor_resultado_global
+
+        if maior_score_global >= 100:
+            log.debug("[DECISÃO]: Match Perfeito. Salvando na base.")
+            buffer_escrita.adicionar({
+                "endereco_normalizado": endereco_normalizado,
+                "bairro": bairro_input,
+                "cidade": cidade_input,
+                "lat": lat,
+                "lng": lng
+            })
+            return lat, lng, parcial, cond, status_log, endereco_normalizado
+
+    # A HERE só achou a rua (ou nada): estima o lote entre vizinhos já geocodificados
+    if target_q and target_l and maior_score_global < 100 and settings.NEIGHBOR_INDEX_ENABLED:
+        vizinho = indice_vizinhos.interpolar(alvo)
+        if vizinho:
+            lat, lng, abaixo, acima = vizinho
+            log.debug("[NEIGHBOR]: Lote %s estimado entre %s e %s", target_l, abaixo, acima)
+            return lat, lng, True, False, "NEIGHBOR_INTERPOLATED", endereco_normalizado
+
+    lat, lng, parcial, cond, status_log = melhor_resultado_global
+    return lat, lng, parcial, cond, status_log, endereco_normalizado
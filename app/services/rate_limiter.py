@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Limita a taxa (QPS). Cada chamada reserva um token; sem token, espera a reposição."""
+
+    def __init__(self, taxa: float, capacidade: float):
+        self.taxa = taxa
+        self.capacidade = max(1.0, capacidade)
+        self.tokens = self.capacidade
+        self._atualizado_em = time.monotonic()
+
+    async def adquirir(self):
+        if self.taxa <= 0:
+            return
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self._atualizado_em) * self.taxa)
+        self._atualizado_em = agora
+
+        # Reserva antes de esperar (o saldo pode ficar negativo): a ordem de chegada é respeitada
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.taxa)
+
+
+class ConcorrenciaAdaptativa:
+    """
+    Limite de chamadas simultâneas ajustado por AIMD: +1/limite a cada sucesso,
+    metade a cada sobrecarga (429/503), no máximo uma redução por segundo.
+    Também respeita pausas globais pedidas via Retry-After.
+    """
+
+    def __init__(self, minimo: int, maximo: int):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.limite = float(self.maximo)
+        self.em_uso = 0
+        self.reducoes = 0
+        self._fila = deque()
+        self._ultima_reducao = 0.0
+        self._pausa_ate = 0.0
+
+    async def adquirir(self):
+        while self.em_uso >= int(self.limite):
+            fut = asyncio.get_running_loop().create_future()
+            self._fila.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut in self._fila:
+                    self._fila.remove(fut)
+                elif not fut.cancelled():
+                    # Foi acordado e cancelado ao mesmo tempo: passa a vez adiante
+                    self._acordar()
+                raise
+        self.em_uso += 1
+
+        espera = self._pausa_ate - time.monotonic()
+        if espera > 0:
+            try:
+                await asyncio.sleep(espera)
+            except BaseException:
+                # Cancelada na pausa (modo hedged, cliente desconectou): devolve a vaga
+                self.liberar("erro")
+                raise
+
+    def liberar(self, resultado: str):
+        """resultado: "ok", "sobrecarga" (429/503) ou "erro" (não mexe no limite)."""
+        self.em_uso -= 1
+        if resultado == "ok":
+            self.limite = min(self.maximo, self.limite + 1 / self.limite)
+        elif resultado == "sobrecarga":
+            agora = time.monotonic()
+            if agora - self._ultima_reducao >= 1.0:
+                self.limite = max(self.minimo, self.limite / 2)
+                self._ultima_reducao = agora
+                self.reducoes += 1
+        self._acordar()
+
+    def pausar(self, segundos: float):
+        self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+
+    def _acordar(self):
+        vagas = int(self.limite) - self.em_uso
+        while vagas > 0 and self._fila:
+            fut = self._fila.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                vagas -= 1
+
+
+class LimitadorHERE:
+    """Limitador do processo inteiro para a HERE: QPS (token bucket) + concorrência AIMD."""
+
+    def __init__(self, qps: float, burst: float, concorrencia_min: int, concorrencia_max: int,
+                 backoff_base: float, backoff_max: float):
+        self.bucket = TokenBucket(qps, burst)
+        self.concorrencia = ConcorrenciaAdaptativa(concorrencia_min, concorrencia_max)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retentativas = 0
+
+    async def adquirir(self):
+        await self.concorrencia.adquirir()
+        try:
+            await self.bucket.adquirir()
+        except BaseException:
+            self.concorrencia.liberar("erro")
+            raise
+
+    def liberar(self, resultado: str, retry_after: float = None):
+        if retry_after:
+            self.concorrencia.pausar(retry_after)
+        self.concorrencia.liberar(resultado)
+
+    def tempo_backoff(self, tentativa: int, retry_after: float = None) -> float:
+        # Exponencial com jitter completo; Retry-After é o piso quando informado
+        espera = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+        return max(espera, retry_after or 0)
+
+    def estatisticas(self) -> dict:
+        return {
+            "limite_concorrencia": round(self.concorrencia.limite, 2),
+            "em_uso": self.concorrencia.em_uso,
+            "aguardando": len(self.concorrencia._fila),
+            "reducoes": self.concorrencia.reducoes,
+            "retentativas": self.retentativas
+        }
+
+
+def ler_retry_after(valor) -> float:
+    """Retry-After em segundos (a HERE usa segundos; datas HTTP são ignoradas)."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        return None
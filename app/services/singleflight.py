@@ -0,0 +1,51 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes com a mesma chave em uma única execução.
+    Quem chega enquanto a chamada está em voo aguarda o mesmo resultado.
+    """
+
+    def __init__(self):
+        self._em_voo = {}
+        self._interessados = {}
+        self.execucoes = 0
+        self.coalescidas = 0
+
+    async def executar(self, chave, fabrica):
+        tarefa = self._em_voo.get(chave)
+        if tarefa is None:
+            self.execucoes += 1
+            tarefa = asyncio.ensure_future(fabrica())
+            self._em_voo[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._liberar(chave, t))
+        else:
+            self.coalescidas += 1
+
+        self._interessados[tarefa] = self._interessados.get(tarefa, 0) + 1
+        try:
+            # shield: cancelar um dos interessados não cancela a consulta dos demais
+            return await asyncio.shield(tarefa)
+        except asyncio.CancelledError:
+            # ...mas se ninguém mais espera o resultado, a consulta é cancelada
+            if self._interessados.get(tarefa) == 1 and not tarefa.done():
+                tarefa.cancel()
+            raise
+        finally:
+            restantes = self._interessados.get(tarefa, 1) - 1
+            if restantes:
+                self._interessados[tarefa] = restantes
+            else:
+                self._interessados.pop(tarefa, None)
+
+    def _liberar(self, chave, tarefa):
+        if self._em_voo.get(chave) is tarefa:
+            del self._em_voo[chave]
+
+    def estatisticas(self) -> dict:
+        return {
+            "execucoes": self.execucoes,
+            "coalescidas": self.coalescidas,
+            "em_voo": len(self._em_voo)
+        }
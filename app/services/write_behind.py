@@ -0,0 +1,71 @@
+import asyncio
+from app.core.logs import obter_logger
+
+log = obter_logger("write_behind")
+
+
+class BufferEscrita:
+    """
+    Acumula registros novos e grava em lote (write-behind).
+    Deduplica pela chave; descarrega ao atingir tamanho_max, a cada
+    intervalo segundos, no fim de cada job e no shutdown.
+    """
+
+    def __init__(self, gravar_lote, chave: str, tamanho_max: int, intervalo: float):
+        self._gravar_lote = gravar_lote
+        self._chave = chave
+        self.tamanho_max = tamanho_max
+        self.intervalo = intervalo
+        self._pendentes = {}
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._descargas = set()
+        self.gravados = 0
+        self.descartados_duplicados = 0
+
+    def adicionar(self, registro: dict):
+        chave = registro.get(self._chave)
+        if not chave:
+            return
+        if chave in self._pendentes:
+            self.descartados_duplicados += 1
+            return
+
+        self._pendentes[chave] = registro
+        if len(self._pendentes) >= self.tamanho_max:
+            tarefa = asyncio.ensure_future(self.descarregar())
+            self._descargas.add(tarefa)
+            tarefa.add_done_callback(self._descargas.discard)
+
+    async def descarregar(self):
+        async with self._lock:
+            if not self._pendentes:
+                return
+            lote = list(self._pendentes.values())
+            self._pendentes = {}
+            try:
+                await self._gravar_lote(lote)
+                self.gravados += len(lote)
+            except Exception as e:
+                log.error("Erro ao gravar lote de %s endereços: %s", len(lote), e)
+
+    async def iniciar(self):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._descarregar_periodicamente())
+
+    async def parar(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        if self._descargas:
+            await asyncio.gather(*self._descargas, return_exceptions=True)
+        await self.descarregar()
+
+    async def _descarregar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            await self.descarregar()
+
+    def __len__(self):
+        return len(self._pendentes)
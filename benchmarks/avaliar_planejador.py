@@ -0,0 +1,163 @@
+"""
+Compara o planejador de estratégias (app/services/planejador.py) com a
+ordem fixa, reexecutando planilhas já processadas: jobs gravados no banco
+de jobs e/ou arquivos de planilha.
+
+    python -m benchmarks.avaliar_planejador --jobs data/jobs.db
+    python -m benchmarks.avaliar_planejador --planilha rota1.xlsx --planilha rota2.csv
+
+Cada linha que iria para a HERE tem todas as suas estratégias consultadas
+uma vez, pelo cache de geocode (GEOCODE_CACHE_PATH): consultas já feitas
+em uploads anteriores e reexecuções saem de graça. Depois as duas políticas
+são simuladas sobre esses resultados, no modo sequencial e na ordem das
+planilhas: a ordem fixa e o planejador aprendendo online, a partir de
+estatísticas vazias ou das de produção (--estatisticas). Os atalhos da
+base de endereços e do índice fuzzy não entram: valem igual para as duas.
+
+Estratégias nunca consultadas custam uma chamada real; para testar sem
+cota, aponte HERE_GEOCODE_URL para o benchmarks.here_stub.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+from collections import Counter
+from app.core.config import settings
+from app.services.geocoder import cache_geocode
+from app.services.http_client import iniciar_sessao_http, fechar_sessao_http
+from app.services.ingestao import LEITORES, detectar_formato
+from app.services.normalizer import normalizar_endereco
+from app.services.parser import analisar_endereco
+from app.services.planejador import EstatisticasEstrategias, Planejador, TODOS_BAIRROS
+from app.services.processor import montar_estrategias, avaliar_estrategia
+
+
+def ler_jobs(caminho: str, ids: list):
+    """Linhas de entrada dos jobs (todos os concluídos, se ids vier vazio), na ordem de criação."""
+    conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        if not ids:
+            ids = [r[0] for r in conn.execute("SELECT id FROM jobs WHERE status = 'done' ORDER BY criado_em")]
+        for job_id in ids:
+            for (entrada,) in conn.execute(
+                "SELECT entrada FROM job_linhas WHERE job_id = ? ORDER BY idx", (job_id,)
+            ):
+                yield {k: (float("nan") if v is None else v) for k, v in json.loads(entrada).items()}
+    finally:
+        conn.close()
+
+
+def ler_planilha(caminho: str):
+    for bloco in LEITORES[detectar_formato(caminho)](caminho, settings.INGEST_CHUNK_ROWS):
+        yield from bloco
+
+
+async def avaliar_linha(linha: dict, sem: asyncio.Semaphore):
+    """(alvo, estratégias, {tipo: score}) da linha, ou None se ela não iria para a HERE."""
+    endereco_bruto = str(linha.get("Destination Address", ""))
+    bairro = str(linha.get("Bairro", "")).strip()
+    cidade = str(linha.get("City", "Goiânia")).strip()
+    normalizado = normalizar_endereco(endereco_bruto, bairro)
+    if normalizado == "Condominio":
+        return None
+    alvo = analisar_endereco(endereco_bruto, normalizado, bairro, cidade)
+    estrategias = montar_estrategias(alvo, bairro, cidade)
+    scores = {}
+    async with sem:
+        for strat in estrategias:
+            avaliado = await avaliar_estrategia(strat, alvo)
+            scores[strat["type"]] = avaliado[0] if avaliado else 0
+    return alvo, estrategias, scores
+
+
+def simular(avaliadas: list, planejador: Planejador) -> dict:
+    """Tenta plano e reserva em sequência até o primeiro score 100, como buscar_melhor_localizacao."""
+    chamadas, resultado, por_estrategia = 0, Counter(), Counter()
+    for alvo, estrategias, scores in avaliadas:
+        grupo = planejador.grupo(alvo)
+        plano, reserva = planejador.planejar(estrategias, grupo)
+        melhor = 0
+        for strat in plano + reserva:
+            score = scores[strat["type"]]
+            chamadas += 1
+            por_estrategia[strat["type"]] += 1
+            planejador.registrar(grupo, strat["type"], score >= 100, 0.0)
+            melhor = max(melhor, score)
+            if score >= 100:
+                break
+        resultado["match" if melhor >= 100 else "parcial" if melhor > 0 else "falha"] += 1
+    return {"chamadas": chamadas, "resultado": resultado, "por_estrategia": por_estrategia}
+
+
+def imprimir(nome: str, simulado: dict, linhas: int, latencia_ms: float):
+    chamadas = simulado["chamadas"]
+    resultado = simulado["resultado"]
+    print(
+        f"{nome:<12} {chamadas / linhas:6.3f} consultas/linha "
+        f"| ~{chamadas * latencia_ms / linhas:7.1f} ms/linha "
+        f"| match {resultado['match'] / linhas:6.1%} | parcial {resultado['parcial'] / linhas:6.1%} "
+        f"| falha {resultado['falha'] / linhas:6.1%}"
+    )
+    print("             " + ", ".join(f"{tipo}={n}" for tipo, n in simulado["por_estrategia"].most_common()))
+
+
+def imprimir_taxas(estatisticas: EstatisticasEstrategias):
+    print("taxa de sucesso aprendida por (cidade, padrão):")
+    agregados = sorted(
+        (chave, valores) for chave, valores in estatisticas.itens() if chave[1] == TODOS_BAIRROS
+    )
+    for (cidade, _, padrao, estrategia), (tentativas, sucessos, _) in agregados:
+        print(f"    {cidade or '-':<12} {padrao:<10} {estrategia:<12} {sucessos:>6}/{tentativas:<6} {sucessos / tentativas:6.1%}")
+
+
+async def main(args):
+    linhas = []
+    if args.jobs:
+        linhas.extend(ler_jobs(args.jobs, args.job))
+    for caminho in args.planilha:
+        linhas.extend(ler_planilha(caminho))
+    if args.limite:
+        linhas = linhas[:args.limite]
+    if not linhas:
+        raise SystemExit("Nenhuma linha: informe --jobs e/ou --planilha")
+
+    await iniciar_sessao_http()
+    await cache_geocode.iniciar()
+    try:
+        sem = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
+        avaliadas = await asyncio.gather(*(avaliar_linha(linha, sem) for linha in linhas))
+    finally:
+        # Grava no disco o que foi consultado: a próxima execução sai de graça
+        await cache_geocode.parar()
+        await fechar_sessao_http()
+    avaliadas = [a for a in avaliadas if a]
+    print(f"{len(linhas)} linhas lidas, {len(avaliadas)} iriam para a HERE\n")
+
+    fixa = Planejador(EstatisticasEstrategias(), "off", 0, 0.0, 0.0)
+    # A simulação nunca chama gravar(): o arquivo de produção não é alterado
+    estatisticas = EstatisticasEstrategias(args.estatisticas)
+    estatisticas.carregar()
+    planejada = Planejador(
+        estatisticas, "on", args.min_amostras, args.taxa_min, args.exploracao, random.Random(args.semente)
+    )
+
+    imprimir("ordem fixa", simular(avaliadas, fixa), len(avaliadas), args.latencia_ms)
+    imprimir("planejador", simular(avaliadas, planejada), len(avaliadas), args.latencia_ms)
+    print(f"             {planejada.resumo()}\n")
+    imprimir_taxas(estatisticas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", help="banco de jobs (JOBS_DB_PATH) com as planilhas já processadas")
+    parser.add_argument("--job", action="append", default=[], help="só este job (repetível); padrão: todos os concluídos")
+    parser.add_argument("--planilha", action="append", default=[], help="arquivo de planilha (repetível)")
+    parser.add_argument("--limite", type=int, help="no máximo N linhas")
+    parser.add_argument("--estatisticas", help="começa das estatísticas deste arquivo (PLANNER_STATS_PATH)")
+    parser.add_argument("--min-amostras", type=int, default=settings.PLANNER_MIN_SAMPLES)
+    parser.add_argument("--taxa-min", type=float, default=settings.PLANNER_SKIP_RATE)
+    parser.add_argument("--exploracao", type=float, default=settings.PLANNER_EXPLORE)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--latencia-ms", type=float, default=150.0, help="latência de uma consulta à HERE, para estimar ms/linha")
+    asyncio.run(main(parser.parse_args()))
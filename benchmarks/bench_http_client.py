@@ -0,0 +1,70 @@
+"""
+Compara uma ClientSession nova por consulta (comportamento antigo) com a
+sessão compartilhada de app.services.http_client, contra o stub local.
+
+    python -m benchmarks.bench_http_client --consultas 2000 --concorrencia 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import aiohttp
+from app.core.config import settings
+from app.services import http_client
+from app.services import geocoder
+from app.services.geocoder import geocode_with_here
+from benchmarks.here_stub import iniciar_stub
+
+
+async def _consulta_sessao_nova(url: str, q: str):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, params={"q": q, "apiKey": "stub"}, timeout=10) as response:
+            return await response.json()
+
+
+async def _medir(nome: str, chamada, consultas: int, concorrencia: int):
+    sem = asyncio.Semaphore(concorrencia)
+    latencias = []
+
+    async def uma(i):
+        async with sem:
+            inicio = time.perf_counter()
+            # Consultas únicas: o cache de geocode não pode mascarar a medição
+            await chamada(f"RUA RC-{i:05d}, {i}-1, Goiânia")
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uma(i) for i in range(consultas)))
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    p95 = latencias[int(len(latencias) * 0.95) - 1]
+    print(
+        f"{nome:<22} {consultas / total:8.1f} req/s | "
+        f"p50 {statistics.median(latencias):6.2f} ms | p95 {p95:6.2f} ms"
+    )
+
+
+async def main(consultas: int, concorrencia: int, latencia_ms: float):
+    runner, url = await iniciar_stub(latencia_ms=latencia_ms)
+    settings.HERE_GEOCODE_URL = url
+    settings.HERE_API_KEY = "stub"
+    geocoder.cache_geocode.caminho_disco = None
+    # Mede só o cliente: sem limite de QPS e com concorrência fixa no máximo
+    geocoder.limitador_here.bucket.taxa = 0
+    geocoder.limitador_here.concorrencia.limite = geocoder.limitador_here.concorrencia.maximo = concorrencia
+    try:
+        await _medir("sessao por consulta", lambda q: _consulta_sessao_nova(url, q), consultas, concorrencia)
+        await _medir("sessao compartilhada", geocode_with_here, consultas, concorrencia)
+    finally:
+        await http_client.fechar_sessao_http()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=10)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.consultas, args.concorrencia, args.latencia_ms))
@@ -0,0 +1,54 @@
+"""
+Microbenchmark da normalização: normalizar_endereco linha a linha x
+normalizar_dataframe em lote. A paridade com a versão original fica em
+tests/test_normalizer.py.
+
+    python -m benchmarks.bench_normalizer --linhas 20000
+"""
+import argparse
+import random
+import time
+import pandas as pd
+from app.services.normalizer import normalizar_endereco, normalizar_dataframe
+from benchmarks.planilhas import RUAS, FORMATOS_QL, BAIRROS, ESPECIAIS
+
+
+def gerar_enderecos(linhas: int, semente: int = 42, repeticao: int = 5) -> pd.DataFrame:
+    """Planilha sintética; cada par (endereço, bairro) aparece ~repeticao vezes, como nas rotas reais."""
+    rnd = random.Random(semente)
+    pool = []
+    for _ in range(max(50, linhas // repeticao)):
+        if rnd.random() < 0.03:
+            endereco = rnd.choice(ESPECIAIS)
+        else:
+            ql = rnd.choice(FORMATOS_QL).format(q=rnd.randint(1, 120), l=rnd.randint(1, 40))
+            endereco = f"{rnd.choice(RUAS)}{rnd.choice([', ', ' ', ' - '])}{ql}"
+        pool.append((endereco, rnd.choice(BAIRROS)))
+
+    enderecos, bairros = zip(*(rnd.choice(pool) for _ in range(linhas)))
+    return pd.DataFrame({"Destination Address": enderecos, "Bairro": bairros})
+
+
+def main(linhas: int):
+    df = gerar_enderecos(linhas)
+
+    inicio = time.perf_counter()
+    for raw, bairro in zip(df["Destination Address"], df["Bairro"]):
+        normalizar_endereco(raw, bairro)
+    t_linha = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    normalizar_dataframe(df)
+    t_lote = time.perf_counter() - inicio
+
+    distintos = len(df.drop_duplicates())
+    print(f"linhas={linhas} pares distintos={distintos}")
+    print(f"linha a linha: {t_linha * 1000:8.1f} ms | {linhas / t_linha:9.0f} linhas/s")
+    print(f"em lote:       {t_lote * 1000:8.1f} ms | {linhas / t_lote:9.0f} linhas/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.linhas)
@@ -0,0 +1,73 @@
+"""
+Consulta individual (buscar_coordenadas por linha) x prefetch em lote
+(buscar_coordenadas_em_lote) contra o backend SQLite local. A latência de
+rede do Supabase é simulada com um atraso fixo por round trip.
+
+    python -m benchmarks.bench_prefetch --linhas 2000 --latencia-ms 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from app.core.config import settings
+from app.services import database
+
+
+class RepositorioComLatencia(database.RepositorioSQLite):
+    def __init__(self, caminho, latencia_ms):
+        super().__init__(caminho)
+        self.latencia = latencia_ms / 1000
+        self.round_trips = 0
+
+    def buscar(self, endereco_normalizado):
+        self.round_trips += 1
+        time.sleep(self.latencia)
+        return super().buscar(endereco_normalizado)
+
+    def buscar_em_lote(self, enderecos):
+        self.round_trips += 1
+        time.sleep(self.latencia)
+        return super().buscar_em_lote(enderecos)
+
+
+async def main(linhas: int, conhecidos: float, latencia_ms: float):
+    caminho = os.path.join(tempfile.mkdtemp(), "enderecos.db")
+    repo = RepositorioComLatencia(caminho, latencia_ms)
+    database.repositorio = repo
+
+    enderecos = [f"RUA RC-{i % 400:03d}, {i % 37 + 1}-{i % 23 + 1}" for i in range(linhas)]
+    repo.upsert_em_lote([
+        {"endereco_normalizado": endereco, "bairro": "", "cidade": "Goiânia", "lat": -16.6, "lng": -49.2}
+        for endereco in random.sample(sorted(set(enderecos)), int(len(set(enderecos)) * conhecidos))
+    ])
+
+    repo.round_trips = 0
+    inicio = time.perf_counter()
+    individuais = 0
+    for e in enderecos:
+        if await database.buscar_coordenadas(e):
+            individuais += 1
+    t_individual = time.perf_counter() - inicio
+    rt_individual = repo.round_trips
+
+    repo.round_trips = 0
+    inicio = time.perf_counter()
+    lote = await database.buscar_coordenadas_em_lote(enderecos)
+    em_lote = sum(1 for e in enderecos if e in lote)
+    t_lote = time.perf_counter() - inicio
+
+    assert individuais == em_lote
+    print(f"linhas={linhas} encontradas={em_lote} chunk={settings.DB_PREFETCH_CHUNK}")
+    print(f"individual: {t_individual * 1000:9.1f} ms | {rt_individual} round trips")
+    print(f"em lote:    {t_lote * 1000:9.1f} ms | {repo.round_trips} round trips")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=2000)
+    parser.add_argument("--conhecidos", type=float, default=0.5, help="fração de endereços já no banco")
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.linhas, args.conhecidos, args.latencia_ms))
@@ -0,0 +1,182 @@
+"""
+Cold start: tempo de import do app e tempo até o primeiro /upload de um
+processo novo, comparados com a baseline versionada em
+benchmarks/baseline_startup.json.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --atualizar-baseline
+
+Cada rodada sobe um uvicorn novo (banco em memória, caches desligados, stub
+da HERE sem latência nem limite de QPS) e mede, a partir do início do
+processo: a primeira resposta HTTP, o primeiro /upload (enviado assim que o
+servidor responde, antes do aquecimento terminar) e o GET /ready com 200.
+Vale a mediana das rodadas. Sai com código 1 se alguma métrica passar da
+baseline mais a tolerância; os números dependem da máquina, então atualize
+a baseline quando mudar o ambiente de referência.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+from benchmarks.bench_upload import _aguardar, _porta_livre
+from benchmarks.planilhas import gerar_planilha
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline_startup.json")
+METRICAS = ("import_ms", "ms_ate_responder", "ms_ate_primeiro_upload", "ms_ate_pronto")
+
+
+def _ambiente(porta_stub: int, pasta: str) -> dict:
+    return {
+        **os.environ,
+        "HERE_API_KEY": "stub",
+        "HERE_GEOCODE_URL": f"http://127.0.0.1:{porta_stub}/v1/geocode",
+        # Sem limite de QPS: o primeiro /upload mede o cold start, não o limitador
+        "HERE_QPS": "0",
+        "DATABASE_BACKEND": "memoria",
+        "GEOCODE_CACHE_PATH": "",
+        "ROW_CACHE_PATH": "",
+        "PLANNER_STATS_PATH": "",
+        "JOBS_DB_PATH": os.path.join(pasta, "jobs.db"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    }
+
+
+def medir_import(env: dict) -> float:
+    codigo = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    saida = subprocess.run([sys.executable, "-c", codigo], env=env, capture_output=True, text=True, check=True)
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def modulos_mais_pesados(env: dict, n: int = 10) -> list:
+    """[(ms acumulado, módulo)] dos imports mais caros de main (python -X importtime)."""
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], env=env, capture_output=True, text=True
+    )
+    modulos = []
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|")
+        # Só os dois primeiros níveis: o resto é detalhe do que já aparece
+        profundidade = (len(nome) - len(nome.lstrip())) // 2
+        if acumulado.strip().isdigit() and profundidade <= 2:
+            modulos.append((int(acumulado) / 1000, nome.strip()))
+    return sorted(modulos, reverse=True)[:n]
+
+
+async def medir_primeiro_upload(env: dict, conteudo: bytes) -> dict:
+    porta = _porta_livre()
+    url = f"http://127.0.0.1:{porta}"
+    inicio = time.perf_counter()
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta),
+        "--log-level", "warning"
+    ], env=env)
+    try:
+        await _aguardar(f"{url}/metrics", timeout=60)
+        respondeu = time.perf_counter()
+
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            form = aiohttp.FormData()
+            form.add_field("file", conteudo, filename="rota.xlsx")
+            async with session.post(f"{url}/upload", data=form) as response:
+                response.raise_for_status()
+                await response.read()
+            primeiro_upload = time.perf_counter()
+
+            while True:
+                async with session.get(f"{url}/ready") as response:
+                    # 404: versão sem /ready (comparação com commits antigos)
+                    if response.status in (200, 404):
+                        break
+                await asyncio.sleep(0.02)
+            pronto = time.perf_counter()
+    finally:
+        app.terminate()
+        app.wait()
+    return {
+        "ms_ate_responder": (respondeu - inicio) * 1000,
+        "ms_ate_primeiro_upload": (primeiro_upload - inicio) * 1000,
+        "ms_ate_pronto": (pronto - inicio) * 1000,
+    }
+
+
+async def main(args):
+    porta_stub = _porta_livre()
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.here_stub", "--port", str(porta_stub)
+    ], stdout=subprocess.DEVNULL)
+    env = _ambiente(porta_stub, tempfile.mkdtemp(prefix="bench_startup_"))
+
+    buffer = io.BytesIO()
+    gerar_planilha(args.linhas, 42).to_excel(buffer, index=False)
+    conteudo = buffer.getvalue()
+
+    try:
+        await _aguardar(f"http://127.0.0.1:{porta_stub}/stats")
+        rodadas = []
+        for _ in range(args.rodadas):
+            medidas = {"import_ms": medir_import(env)}
+            medidas.update(await medir_primeiro_upload(env, conteudo))
+            rodadas.append(medidas)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    resultado = {m: round(statistics.median(r[m] for r in rodadas), 1) for m in METRICAS}
+
+    print("imports mais pesados de main:")
+    for ms, modulo in modulos_mais_pesados(env):
+        print(f"    {ms:8.1f} ms  {modulo}")
+    print()
+
+    baseline = None
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding="utf-8") as arquivo:
+            baseline = json.load(arquivo)
+
+    regressoes = []
+    for metrica in METRICAS:
+        atual = resultado[metrica]
+        linha = f"{metrica:<24} {atual:9.1f} ms"
+        referencia = (baseline or {}).get("metricas", {}).get(metrica)
+        if referencia:
+            variacao = atual / referencia - 1
+            linha += f" | baseline {referencia:9.1f} ms ({variacao:+.0%})"
+            if variacao > args.tolerancia:
+                regressoes.append(metrica)
+                linha += "  <- regressão"
+        print(linha)
+
+    if args.atualizar_baseline:
+        with open(BASELINE, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "metricas": resultado,
+                "rodadas": args.rodadas,
+                "linhas_upload": args.linhas,
+                "python": platform.python_version(),
+                "cpus": os.cpu_count()
+            }, arquivo, indent=2)
+            arquivo.write("\n")
+        print(f"\nbaseline gravada em {BASELINE}")
+    elif regressoes:
+        print(f"\nRegressão acima de {args.tolerancia:.0%}: {', '.join(regressoes)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--linhas", type=int, default=20, help="linhas da planilha do primeiro /upload")
+    parser.add_argument("--tolerancia", type=float, default=0.3, help="piora aceita sobre a baseline (0.3 = 30%%)")
+    parser.add_argument("--atualizar-baseline", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,204 @@
+"""
+Benchmark ponta a ponta do /upload: sobe o stub da HERE e o backend (uvicorn)
+em processos separados, envia uma planilha sintética e mede vazão (linhas/s)
+e latência por linha (p50/p95/p99 do Tempo_ms de cada linha).
+
+    python -m benchmarks.bench_upload --linhas 2000 --latencia-ms 80 --jitter-ms 40 --taxa-429 0.02
+
+A primeira rodada começa com caches vazios (banco em memória, cache de
+geocode sem disco, cache de linhas novo); as seguintes mostram o efeito
+do cache. Para medir um servidor já rodando, use --url http://host:8000
+(nada é iniciado).
+
+O backend herda o ambiente: os limites da HERE valem aqui também
+(ex.: HERE_QPS=10 limita a primeira rodada; o padrão 0 não põe teto).
+--rota jobs mede pelo POST /jobs (envia, espera o job e lê os resultados).
+--backend lote aponta BATCH_PROXY_URL para o stub e força o geocoding em
+lote, que só vale nos jobs: use junto com --rota jobs.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+import aiohttp
+from benchmarks.planilhas import gerar_planilha, salvar_planilha
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _aguardar(url: str, timeout: float = 30):
+    limite = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < limite:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} não respondeu em {timeout}s")
+
+
+def _percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def subir_processos(args) -> tuple:
+    """Sobe stub e backend; devolve (url_backend, url_stub, [processos])."""
+    porta_stub, porta_app = _porta_livre(), _porta_livre()
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.here_stub", "--port", str(porta_stub),
+        "--latencia-ms", str(args.latencia_ms), "--jitter-ms", str(args.jitter_ms),
+        "--taxa-429", str(args.taxa_429), "--latencia-lote-ms", str(args.latencia_lote_ms)
+    ], stdout=subprocess.DEVNULL)
+
+    pasta = tempfile.mkdtemp(prefix="bench_upload_")
+    env = {
+        **os.environ,
+        "HERE_API_KEY": "stub",
+        "HERE_GEOCODE_URL": f"http://127.0.0.1:{porta_stub}/v1/geocode",
+        "BATCH_PROXY_URL": f"http://127.0.0.1:{porta_stub}/v1/batch",
+        "GEOCODER_BACKEND": args.backend,
+        "DATABASE_BACKEND": "memoria",
+        "GEOCODE_CACHE_PATH": "",
+        "JOBS_DB_PATH": os.path.join(pasta, "jobs.db"),
+        "ROW_CACHE_PATH": os.path.join(pasta, "row_cache.db"),
+        # Sem estatísticas de produção: a ordem das estratégias não muda entre rodadas
+        "PLANNER_STATS_PATH": "",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    }
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+        "--port", str(porta_app), "--log-level", "warning"
+    ], env=env)
+    return f"http://127.0.0.1:{porta_app}", f"http://127.0.0.1:{porta_stub}", [app, stub]
+
+
+async def rodada(session: aiohttp.ClientSession, url: str, conteudo: bytes, nome_arquivo: str) -> dict:
+    form = aiohttp.FormData()
+    form.add_field("file", conteudo, filename=nome_arquivo)
+    inicio = time.perf_counter()
+    async with session.post(f"{url}/upload", data=form) as response:
+        response.raise_for_status()
+        corpo = await response.json()
+    decorrido = time.perf_counter() - inicio
+    return _resultado(corpo["data"], decorrido, corpo.get("timings", {}))
+
+
+async def rodada_job(session: aiohttp.ClientSession, url: str, conteudo: bytes, nome_arquivo: str) -> dict:
+    form = aiohttp.FormData()
+    form.add_field("file", conteudo, filename=nome_arquivo)
+    inicio = time.perf_counter()
+    async with session.post(f"{url}/jobs", data=form) as response:
+        response.raise_for_status()
+        job_id = (await response.json())["job_id"]
+    while True:
+        async with session.get(f"{url}/jobs/{job_id}") as response:
+            response.raise_for_status()
+            job = await response.json()
+        if job["status"] not in ("ingesting", "queued", "running"):
+            break
+        await asyncio.sleep(0.2)
+    decorrido = time.perf_counter() - inicio
+    if job["status"] != "done":
+        raise RuntimeError(f"job {job_id} terminou como {job['status']}: {job['erro']}")
+
+    dados = []
+    while True:
+        params = {"offset": len(dados), "limit": 5000}
+        async with session.get(f"{url}/jobs/{job_id}/results", params=params) as response:
+            response.raise_for_status()
+            pagina = (await response.json())["data"]
+        dados.extend(pagina)
+        if len(pagina) < params["limit"]:
+            break
+    return _resultado(dados, decorrido, {})
+
+
+def _resultado(dados: list, decorrido: float, timings: dict) -> dict:
+    return {
+        "linhas": len(dados),
+        "segundos": decorrido,
+        "latencias": [r["Tempo_ms"] for r in dados if r.get("Tempo_ms") is not None],
+        "status": Counter(r.get("Status_Log") for r in dados),
+        "timings": timings
+    }
+
+
+def imprimir(i: int, resultado: dict):
+    lat = resultado["latencias"]
+    print(
+        f"rodada {i}: {resultado['linhas']} linhas em {resultado['segundos']:.2f}s "
+        f"| {resultado['linhas'] / resultado['segundos']:8.1f} linhas/s "
+        f"| p50 {_percentil(lat, 50):7.1f} ms | p95 {_percentil(lat, 95):7.1f} ms | p99 {_percentil(lat, 99):7.1f} ms"
+    )
+    for etapa, dados in resultado["timings"].get("etapas", {}).items():
+        print(f"    {etapa:<18} n={dados['n']:<6} media {dados['media_ms']:8.2f} ms | max {dados['max_ms']:8.1f} ms")
+    print("    status: " + ", ".join(f"{s}={n}" for s, n in resultado["status"].most_common()))
+
+
+async def main(args):
+    processos = []
+    url_stub = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        url, url_stub, processos = subir_processos(args)
+
+    try:
+        await _aguardar(f"{url}/metrics")
+        if args.planilha:
+            with open(args.planilha, "rb") as arquivo:
+                conteudo = arquivo.read()
+            nome = os.path.basename(args.planilha)
+        else:
+            with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp:
+                caminho = tmp.name
+            salvar_planilha(gerar_planilha(args.linhas, args.semente), caminho)
+            with open(caminho, "rb") as arquivo:
+                conteudo = arquivo.read()
+            os.unlink(caminho)
+            nome = "rota_sintetica.xlsx"
+
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            medir = rodada_job if args.rota == "jobs" else rodada
+            for i in range(1, args.rodadas + 1):
+                imprimir(i, await medir(session, url, conteudo, nome))
+            if url_stub:
+                async with session.get(f"{url_stub}/stats") as response:
+                    print(f"stub: {await response.json()}")
+    finally:
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--planilha", help="usa esta planilha em vez de gerar uma")
+    parser.add_argument("--rodadas", type=int, default=2)
+    parser.add_argument("--latencia-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument("--taxa-429", type=float, default=0.0)
+    parser.add_argument("--rota", choices=["upload", "jobs"], default="upload")
+    parser.add_argument("--backend", choices=["auto", "consulta", "lote"], default="auto")
+    parser.add_argument("--latencia-lote-ms", type=float, default=1000.0)
+    parser.add_argument("--url", help="servidor já em execução (não sobe stub nem backend)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,205 @@
+"""
+Servidor local que imita o GET /v1/geocode da HERE, para medir o cliente
+sem gastar cota.
+
+    python -m benchmarks.here_stub --port 8081 --latencia-ms 80 --jitter-ms 40 --taxa-429 0.02
+
+Depois aponte o backend para ele:
+    HERE_GEOCODE_URL=http://127.0.0.1:8081/v1/geocode HERE_API_KEY=stub
+
+Também faz o papel do proxy de geocoding em lote (contrato em
+app/services/geocoder_lote.py):
+    BATCH_PROXY_URL=http://127.0.0.1:8081/v1/batch
+
+As respostas seguem o formato da HERE (items, address, position,
+scoring.fieldScore) e são determinísticas por consulta: a mesma rua cai
+sempre no mesmo ponto, quadras e lotes vizinhos ficam próximos. Uma fração
+das consultas não encontra nada e uma fração das requisições recebe 429.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+import random
+import re
+from aiohttp import web
+
+RE_QD_LT = re.compile(r"\bQD\s*(\d+)\s*LT\s*(\d+)\b", re.I)
+RE_PAR = re.compile(r"^(\d+)-(\d+)$")
+BAIRROS = ["Setor Bueno", "Jardim América", "Setor Sul", "Residencial Canadá", "Vila Nova", "Setor Oeste"]
+CENTRO = (-16.6868, -49.2647)
+
+
+def _semente(texto: str) -> int:
+    return int(hashlib.md5(texto.upper().encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _interpretar(query: str) -> dict:
+    partes = [p.strip() for p in query.split(",") if p.strip()]
+    rua = partes[0] if partes else query
+    quadra = lote = None
+    bairro = None
+    for parte in partes[1:]:
+        achado = RE_QD_LT.search(parte) or RE_PAR.match(parte)
+        if achado:
+            quadra, lote = achado.groups()
+        elif parte.upper() not in ("GOIÂNIA", "GOIANIA") and not bairro:
+            bairro = parte
+    return {"rua": rua.upper(), "quadra": quadra, "lote": lote, "bairro": bairro}
+
+
+def _posicao(rua: str, quadra, lote) -> dict:
+    # Cada rua tem um ponto fixo; quadra e lote deslocam em direções diferentes
+    rnd = random.Random(_semente(rua))
+    lat = CENTRO[0] + rnd.uniform(-0.08, 0.08)
+    lng = CENTRO[1] + rnd.uniform(-0.08, 0.08)
+    if quadra:
+        lat += int(quadra) * 0.0004
+    if lote:
+        lng += int(lote) * 0.00005
+    return {"lat": round(lat, 6), "lng": round(lng, 6)}
+
+
+def _item(rua: str, bairro: str, quadra, lote, score_rua: float, exato: bool) -> dict:
+    complemento = f", QD {quadra} LT {lote}" if quadra and lote else ""
+    label = f"{rua}{complemento} - {bairro}, Goiânia - GO, Brasil"
+    field_score = {"city": 1.0, "streets": [score_rua]}
+    if exato:
+        field_score["houseNumber"] = 1.0
+    return {
+        "title": label,
+        "resultType": "houseNumber" if complemento else "street",
+        "address": {
+            "label": label,
+            "countryCode": "BRA",
+            "state": "Goiás",
+            "city": "Goiânia",
+            "district": bairro,
+            "street": rua,
+            "houseNumber": f"QD {quadra} LT {lote}" if complemento else "",
+        },
+        "position": _posicao(rua, quadra, lote),
+        "scoring": {"queryScore": round(score_rua, 2), "fieldScore": field_score},
+    }
+
+
+def gerar_resposta(query: str, taxa_vazio: float = 0.05, taxa_exato: float = 0.1, candidatos: int = 3) -> dict:
+    """Resposta determinística para a consulta: o mesmo q devolve sempre os mesmos items."""
+    rnd = random.Random(_semente(query))
+    if rnd.random() < taxa_vazio:
+        return {"items": []}
+
+    alvo = _interpretar(query)
+    bairro = alvo["bairro"] or BAIRROS[_semente(alvo["rua"]) % len(BAIRROS)]
+    items = [_item(alvo["rua"], bairro, alvo["quadra"], alvo["lote"], rnd.choice([0.9, 0.95, 1.0]),
+                   rnd.random() < taxa_exato)]
+
+    # Candidatos "errados" típicos: quadra vizinha e outra rua com o mesmo número
+    for i in range(1, candidatos):
+        if alvo["quadra"] and i == 1:
+            items.append(_item(alvo["rua"], bairro, str(int(alvo["quadra"]) + 1), alvo["lote"], 0.9, False))
+        else:
+            items.append(_item(f"{alvo['rua']} {i}", rnd.choice(BAIRROS), None, None, 0.7, False))
+    return {"items": items}
+
+
+def criar_app(latencia_ms: float = 0.0, jitter_ms: float = 0.0, taxa_429: float = 0.0,
+              retry_after: float = None, latencia_lote_ms: float = 1000.0,
+              ms_por_consulta_lote: float = 0.5, **opcoes_resposta) -> web.Application:
+    """
+    latencia_ms/jitter_ms: atraso de cada requisição (uniforme em latencia ± jitter).
+    taxa_429: fração das requisições respondidas com 429 (sorteio por requisição,
+    então a retentativa pode passar). opcoes_resposta vão para gerar_resposta.
+    Um job de lote fica "running" por latencia_lote_ms + ms_por_consulta_lote
+    por consulta.
+    """
+    contadores = {"requisicoes": 0, "429": 0, "lotes": 0, "consultas_lote": 0}
+    lotes = {}
+
+    async def geocode(request: web.Request):
+        contadores["requisicoes"] += 1
+        atraso = latencia_ms + random.uniform(-jitter_ms, jitter_ms)
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+        if taxa_429 and random.random() < taxa_429:
+            contadores["429"] += 1
+            headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+            return web.json_response({"title": "Too Many Requests", "status": 429}, status=429, headers=headers)
+        return web.json_response(gerar_resposta(request.query.get("q", ""), **opcoes_resposta))
+
+    async def criar_lote(request: web.Request):
+        consultas = (await request.json()).get("queries") or []
+        lote_id = uuid.uuid4().hex
+        pronto_em = time.monotonic() + (latencia_lote_ms + ms_por_consulta_lote * len(consultas)) / 1000
+        lotes[lote_id] = (consultas, pronto_em)
+        contadores["lotes"] += 1
+        contadores["consultas_lote"] += len(consultas)
+        return web.json_response({"id": lote_id, "status": "accepted"}, status=201)
+
+    async def status_lote(request: web.Request):
+        lote = lotes.get(request.match_info["id"])
+        if lote is None:
+            return web.json_response({"title": "Not Found", "status": 404}, status=404)
+        status = "completed" if time.monotonic() >= lote[1] else "running"
+        return web.json_response({"id": request.match_info["id"], "status": status, "total": len(lote[0])})
+
+    async def resultados_lote(request: web.Request):
+        lote = lotes.get(request.match_info["id"])
+        if lote is None or time.monotonic() < lote[1]:
+            return web.json_response({"title": "Not Found", "status": 404}, status=404)
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for consulta in lote[0]:
+            linha = {"query": consulta, **gerar_resposta(consulta, **opcoes_resposta)}
+            await response.write((json.dumps(linha, ensure_ascii=False) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def estatisticas(request: web.Request):
+        return web.json_response(contadores)
+
+    app = web.Application()
+    app["contadores"] = contadores
+    app.router.add_get("/v1/geocode", geocode)
+    app.router.add_post("/v1/batch/jobs", criar_lote)
+    app.router.add_get("/v1/batch/jobs/{id}", status_lote)
+    app.router.add_get("/v1/batch/jobs/{id}/results", resultados_lote)
+    app.router.add_get("/stats", estatisticas)
+    return app
+
+
+async def iniciar_stub(host: str = "127.0.0.1", port: int = 0, **opcoes) -> tuple:
+    """Sobe o stub e devolve (runner, url_do_geocode). port=0 escolhe uma porta livre."""
+    runner = web.AppRunner(criar_app(**opcoes))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    porta = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{porta}/v1/geocode"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--taxa-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--taxa-vazio", type=float, default=0.05)
+    parser.add_argument("--latencia-lote-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+    web.run_app(
+        criar_app(
+            latencia_ms=args.latencia_ms,
+            jitter_ms=args.jitter_ms,
+            taxa_429=args.taxa_429,
+            retry_after=args.retry_after,
+            latencia_lote_ms=args.latencia_lote_ms,
+            taxa_vazio=args.taxa_vazio
+        ),
+        host=args.host,
+        port=args.port
+    )
@@ -0,0 +1,92 @@
+"""
+Gerador de planilhas sintéticas de entregas em Goiânia, no mesmo layout das
+planilhas de rota (AT ID, Stop, SPX TN, Destination Address, Bairro, City...).
+
+    python -m benchmarks.planilhas --linhas 5000 --saida /tmp/rota.xlsx
+
+Cobre o que aparece nas planilhas reais: quadra/lote em vários formatos,
+códigos de rua (RC-10, T 63, C-138), ruas que se repetem com lotes
+diferentes, o mesmo endereço repetido na rota e condomínios.
+"""
+import argparse
+import random
+import pandas as pd
+
+RUAS = ["Rua RC-10", "RUA RC 10", "r. t-63", "Av. T-9", "AV 85", "Rua 1", "RUA C-138", "Alameda dos Buritis",
+        "Rua das Orquídeas", "Avenida Rio Verde", "RUA RI17", "Rua SB-3", "RUA JC 20", "Av Independencia"]
+FORMATOS_QL = ["Qd {q} Lt {l}", "Q{q} L{l}", "QUADRA {q} LOTE {l}", "qd.{q} lt.{l}", "{q}-{l}", "Q {q}, L {l}",
+               "D{q} L{l}", "qd {q}", "N 25", ""]
+BAIRROS = ["Setor Bueno", "Jardim América", "Residencial Canada", "Vereda dos Buritis", "Setor Sul", "", None]
+ESPECIAIS = [None, "", "   ", float("nan"), 12345, "Cond. Jardins Madri Bl 3 Apto 202", "Edifício Solar, apto 12",
+             "Rua 3 Bloco B", "AV T-63 1234 - ESQUINA COM T-9", "Rua 5 Nº 40", "nan"]
+CONDOMINIOS = ["Cond. Jardins Madri Bl {b} Apto {a}", "Residencial Eldorado Torre {b} Ap {a}",
+               "Condominio Aldeia do Vale Casa {a}", "Edifício Solar, apto {a}", "Cond Portal do Sol Qd {b} Lt {a}"]
+PREFIXOS = ["Rua", "RUA", "R.", "Av.", "AVENIDA", "Alameda"]
+SIGLAS = ["RC", "T", "C", "SB", "JC", "RI", "S", "VB"]
+
+
+def _rua_aleatoria(rnd: random.Random) -> str:
+    if rnd.random() < 0.6:
+        # Código de rua com grafias variadas: RC-10, RC 10, RC10, rc-010
+        sigla = rnd.choice(SIGLAS)
+        numero = rnd.randint(1, 150)
+        codigo = rnd.choice([f"{sigla}-{numero}", f"{sigla} {numero}", f"{sigla}{numero}", f"{sigla}-{numero:03d}"])
+        return f"{rnd.choice(PREFIXOS)} {rnd.choice([codigo, codigo.lower()])}"
+    return rnd.choice(RUAS)
+
+
+def gerar_planilha(linhas: int, semente: int = 42, ruas: int = None, repeticao: float = 0.2,
+                   taxa_condominio: float = 0.05, taxa_especiais: float = 0.02) -> pd.DataFrame:
+    """
+    ruas: quantas ruas distintas na rota (padrão linhas // 15: várias entregas por rua).
+    repeticao: fração das linhas que repete um endereço já visto (mesma entrega, outro pacote).
+    """
+    rnd = random.Random(semente)
+    ruas = ruas or max(5, linhas // 15)
+    # Cada rua fica em um bairro; é comum o bairro vir vazio na planilha
+    catalogo = [(_rua_aleatoria(rnd), rnd.choice(BAIRROS)) for _ in range(ruas)]
+
+    enderecos, bairros = [], []
+    for _ in range(linhas):
+        sorteio = rnd.random()
+        if enderecos and sorteio < repeticao:
+            i = rnd.randrange(len(enderecos))
+            endereco, bairro = enderecos[i], bairros[i]
+        elif sorteio < repeticao + taxa_condominio:
+            endereco = rnd.choice(CONDOMINIOS).format(b=rnd.randint(1, 12), a=rnd.randint(1, 400))
+            bairro = rnd.choice(BAIRROS)
+        elif sorteio < repeticao + taxa_condominio + taxa_especiais:
+            endereco, bairro = rnd.choice(ESPECIAIS), rnd.choice(BAIRROS)
+        else:
+            rua, bairro = rnd.choice(catalogo)
+            ql = rnd.choice(FORMATOS_QL).format(q=rnd.randint(1, 120), l=rnd.randint(1, 40))
+            endereco = f"{rua}{rnd.choice([', ', ' ', ' - '])}{ql}"
+        enderecos.append(endereco)
+        bairros.append(bairro)
+
+    return pd.DataFrame({
+        "AT ID": [f"AT{semente:02d}{i:06d}" for i in range(linhas)],
+        "Stop": range(1, linhas + 1),
+        "SPX TN": [f"BR{rnd.randrange(10**12):012d}" for _ in range(linhas)],
+        "Destination Address": enderecos,
+        "Bairro": bairros,
+        "City": "Goiânia",
+        "Zipcode/Postal code": [f"74{rnd.randint(0, 999):03d}-{rnd.randint(0, 999):03d}" for _ in range(linhas)],
+    })
+
+
+def salvar_planilha(df: pd.DataFrame, caminho: str):
+    if caminho.endswith(".csv"):
+        df.to_csv(caminho, index=False)
+    else:
+        df.to_excel(caminho, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="rota_sintetica.xlsx")
+    args = parser.parse_args()
+    salvar_planilha(gerar_planilha(args.linhas, args.semente), args.saida)
+    print(f"{args.linhas} linhas -> {args.saida}")
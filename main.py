@@ -1,9 +1,56 @@
+from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.api.routes import router
+from app.services.jobs import gerenciador_jobs
+from app.services.http_client import iniciar_sessao_http, fechar_sessao_http
+from app.services.geocoder import cache_geocode
+from app.services.database import buffer_escrita, listar_enderecos, obter_repositorio
+from app.services.indice_enderecos import carregar_indices
+from app.services.executor_cpu import executor_cpu
+from app.services.pipeline import obter_cache_linhas
+from app.services.planejador import planejador
+from app.core.logs import iniciar_logging, parar_logging
+from app.core.prontidao import prontidao
 
-app = FastAPI(title="GeoProcessor Enterprise")
+
+def _importar_bibliotecas():
+    # Leitura e normalização de planilhas (pandas) e exportação XLSX (openpyxl)
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    iniciar_logging()
+    executor_cpu.iniciar()
+    await iniciar_sessao_http()
+    await buffer_escrita.iniciar()
+    await cache_geocode.iniciar()
+    # Clientes e bibliotecas pesados aquecem em segundo plano (GET /ready); os
+    # opcionais só ficam de fora até terminar: linhas sem o atalho do índice,
+    # sem o cache de linhas e com a ordem fixa de estratégias
+    aquecimento = [
+        prontidao.aquecer("banco", obter_repositorio),
+        prontidao.aquecer("bibliotecas", _importar_bibliotecas),
+        prontidao.aquecer("indices", partial(carregar_indices, listar_enderecos), obrigatorio=False),
+        prontidao.aquecer("cache_linhas", obter_cache_linhas, obrigatorio=False),
+        prontidao.aquecer("planejador", planejador.estatisticas.carregar, obrigatorio=False)
+    ]
+    await gerenciador_jobs.iniciar()
+    yield
+    for tarefa in aquecimento:
+        tarefa.cancel()
+    await gerenciador_jobs.parar()
+    await buffer_escrita.parar()
+    await cache_geocode.parar()
+    planejador.gravar()
+    await fechar_sessao_http()
+    executor_cpu.parar()
+    parar_logging()
+
+app = FastAPI(title="GeoProcessor Enterprise", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,4 +29,50 @@ export async function uploadFile(file, onProgress) {
         xhr.open("POST", "/upload", true); // Rota do FastAPI
         xhr.send(formData);
     });
-}
\ No newline at end of file
+}
+
+// Lê o /upload/stream (NDJSON): cada linha do corpo é um evento
+// {type: "start" | "row" | "end" | "error", ...} entregue assim que o backend termina a linha.
+// Rejeita se o backend mandar "error" ou se o corpo acabar sem o "end".
+export async function uploadFileStream(file, onEvent) {
+    const formData = new FormData();
+    formData.append("file", file);
+
+    const response = await fetch("/upload/stream", { method: "POST", body: formData });
+    if (!response.ok) {
+        throw "Erro no servidor: " + response.statusText;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder("utf-8");
+    let buffer = "";
+    let finished = false;
+
+    const handle = (line) => {
+        if (!line.trim()) return;
+        const event = JSON.parse(line);
+        if (event.type === "error") {
+            throw "Erro no servidor: " + event.detail;
+        }
+        if (event.type === "end") finished = true;
+        onEvent(event);
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+
+        for (const line of lines) handle(line);
+    }
+
+    buffer += decoder.decode();
+    handle(buffer);
+
+    if (!finished) {
+        throw "Conexão encerrada antes do fim do processamento";
+    }
+}
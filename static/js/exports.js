@@ -2,6 +2,14 @@
 // EXPORTS.JS - Lógica de geração de arquivos
 // ============================================================
 
+// Exportação gerada pelo backend a partir dos resultados gravados do job:
+// o navegador só baixa o arquivo, sem montar a planilha em memória.
+export function exportFromServer(jobId, formato) {
+    const a = document.createElement("a");
+    a.href = `/jobs/${encodeURIComponent(jobId)}/export?formato=${formato}`;
+    a.click();
+}
+
 export function exportToExcel(data, fileName) {
     if (!data || !data.length) return alert("Não há dados para exportar!");
     
@@ -1,5 +1,6 @@
 import * as UI from './ui.js';
 import * as Exports from './exports.js';
+import * as API from './api.js';
 
 // ============================================================
 // CONFIGURAÇÃO E ESTADO GLOBAL
@@ -11,6 +12,10 @@ let map, behavior, ui, marker;
 let platform;
 let globalData = [];
 let globalFileName = "resultado";
+// Job do backend com os resultados do último upload; correções manuais só existem
+// no navegador, então com elas a exportação volta a ser feita aqui
+let globalJobId = null;
+let hasLocalEdits = false;
 let currentEditingIndex = null;
 
 // ============================================================
@@ -67,69 +72,89 @@ if (btnUpload) {
         }
 
         globalFileName = file.name.split('.')[0] + "_processado";
+        globalJobId = null;
+        hasLocalEdits = false;
         
         UI.toggleUploadState(true);
         UI.updateProgress(0, "Carregando arquivo...");
 
-        const formData = new FormData();
-        formData.append("file", file);
-
-        const xhr = new XMLHttpRequest();
-
-        xhr.upload.onprogress = (event) => {
-            if (event.lengthComputable) {
-                const pct = Math.round((event.loaded / event.total) * 100);
-                UI.updateProgress(pct, pct === 100 ? "Processando dados (Aguarde)..." : null);
+        globalData = [];
+        currentEditingIndex = null;
+        let renderedCount = 0;
+        let lastRender = 0;
+
+        // Durante o stream as linhas só são acrescentadas (globalData e tabela), então
+        // os índices já na tela não mudam; a renderização completa, em ordem, fica para o "end"
+        const renderNewRows = () => {
+            if (renderedCount === 0) {
+                showResult();
+                const columns = globalData.length ? Object.keys(globalData[0]) : [];
+                UI.renderTable(columns, globalData);
+            } else {
+                UI.appendTableRows(globalData.slice(renderedCount), renderedCount);
             }
+            renderedCount = globalData.length;
         };
 
-        xhr.onload = () => {
-            UI.toggleUploadState(false);
-            
-            if (xhr.status >= 200 && xhr.status < 300) {
-                try {
-                    const resp = JSON.parse(xhr.responseText);
-                    handleSuccess(resp);
-                } catch (e) {
-                    alert("Erro ao ler resposta do servidor.");
-                    console.error(e);
+        API.uploadFileStream(file, (event) => {
+            if (event.type === "start") {
+                globalJobId = event.job_id || null;
+                const deTotal = event.total ? ` de ${event.total}` : "";
+                UI.updateProgress(0, `Processando 0${deTotal} linhas...`);
+            } else if (event.type === "row") {
+                const row = cleanRow(event.row);
+                if (row) globalData.push(row);
+                // O total é estimado (ou desconhecido, em CSV): a barra não passa de 99% antes do "end"
+                const pct = event.total ? Math.min(99, Math.round((event.done / event.total) * 100)) : 0;
+                const deTotal = event.total ? ` de ${event.total}` : "";
+                UI.updateProgress(pct, `Processando ${event.done}${deTotal} linhas...`);
+
+                // Acrescenta as linhas novas no máximo a cada 500ms enquanto o stream chega
+                const now = Date.now();
+                if (now - lastRender > 500) {
+                    lastRender = now;
+                    renderNewRows();
                 }
-            } else {
-                alert("Erro ao processar: " + xhr.statusText);
+            } else if (event.type === "end") {
+                renderAll();
             }
-        };
-
-        xhr.onerror = () => {
-            UI.toggleUploadState(false);
-            alert("Erro de conexão.");
-        };
-
-        xhr.open("POST", "/upload", true);
-        xhr.send(formData);
+        })
+            .then(() => UI.toggleUploadState(false))
+            .catch((err) => {
+                // O que chegou até o erro continua na tela
+                if (globalData.length) renderAll();
+                UI.toggleUploadState(false);
+                alert("Erro ao processar: " + err);
+                console.error(err);
+            });
     };
 }
 
-function handleSuccess(resp) {
-    let data = resp.data;
-
-    data = data.map(row => {
-        const cleaned = { ...row };
-        delete cleaned["Unnamed: 0"];
-        return cleaned;
-    });
-
-    data = data.filter(row => Object.values(row).some(v => v !== null && v !== "" && v !== undefined));
+// Linha como veio do backend, sem a coluna de índice do pandas; null se estiver vazia
+function cleanRow(row) {
+    const cleaned = { ...row };
+    delete cleaned["Unnamed: 0"];
+    return Object.values(cleaned).some(v => v !== null && v !== "" && v !== undefined) ? cleaned : null;
+}
 
-    globalData = data;
-    
+function showResult() {
     const resultDiv = document.getElementById("result");
     if(resultDiv) resultDiv.classList.remove("hidden");
+}
+
+// Renderização completa, na ordem da planilha
+function renderAll() {
+    // A linha aberta no editor continua a mesma depois de reordenar
+    const editingRow = currentEditingIndex !== null ? globalData[currentEditingIndex] : null;
+    globalData.sort((a, b) => a.idx - b.idx);
+    if (editingRow) currentEditingIndex = globalData.indexOf(editingRow);
+
+    showResult();
+    UI.updateStats(globalData);
+    UI.updateTitle(globalData);
     
-    UI.updateStats(data);
-    UI.updateTitle(data);
-    
-    const columns = data.length ? Object.keys(data[0]) : [];
-    UI.renderTable(columns, data); 
+    const columns = globalData.length ? Object.keys(globalData[0]) : [];
+    UI.renderTable(columns, globalData); 
 }
 
 // ============================================================
@@ -140,7 +165,11 @@ if (btnExpExcel) {
     btnExpExcel.onclick = () => {
         document.getElementById("exportPopup").classList.add("hidden");
         document.getElementById("exportPopup").classList.remove("flex");
-        Exports.exportToExcel(globalData, globalFileName);
+        if (globalJobId && !hasLocalEdits) {
+            Exports.exportFromServer(globalJobId, "xlsx");
+        } else {
+            Exports.exportToExcel(globalData, globalFileName);
+        }
     };
 }
 
@@ -149,7 +178,11 @@ if (btnExpCircuit) {
     btnExpCircuit.onclick = () => {
         document.getElementById("exportPopup").classList.add("hidden");
         document.getElementById("exportPopup").classList.remove("flex");
-        Exports.exportToCircuit(globalData, globalFileName);
+        if (globalJobId && !hasLocalEdits) {
+            Exports.exportFromServer(globalJobId, "circuit");
+        } else {
+            Exports.exportToCircuit(globalData, globalFileName);
+        }
     };
 }
 
@@ -261,6 +294,7 @@ if (btnConfirm) {
         globalData[currentEditingIndex]["Geo_Longitude"] = lng;
         globalData[currentEditingIndex]["Status_Log"] = "MANUAL_FIX";
         globalData[currentEditingIndex]["Partial_Match"] = false;
+        hasLocalEdits = true;
 
         await salvarEnderecoEditadoManualmente(row, lat, lng);
 
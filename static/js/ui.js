@@ -72,11 +72,21 @@ export function updateTitle(data) {
 // =========================
 // Lógica da Tabela
 // =========================
+// Colunas da tabela renderizada, usadas pelo appendTableRows
+let tableColumns = [];
+
 export function renderTable(columns, data) {
-    columns = columns.filter(c => !["AT ID", "Stop", "SPX TN", "Latitude", "Longitude", "idx", "Partial_Match", "Cond_Match","Status_Log"].includes(c));
+    columns = columns.filter(c => !["AT ID", "Stop", "SPX TN", "Latitude", "Longitude", "idx", "Partial_Match", "Cond_Match","Status_Log", "Tempo_ms"].includes(c));
+    tableColumns = columns;
     const table = document.getElementById("dataTable");
     const thead = table.querySelector("thead");
     const tbody = document.getElementById("tableBody");
+
+    // Filtros digitados sobrevivem à re-renderização (fim do stream, correção manual)
+    const previousFilters = {};
+    thead.querySelectorAll("input").forEach(input => {
+        if (input.value) previousFilters[input.dataset.column] = input.value;
+    });
     
     // 1. Limpa tudo
     thead.innerHTML = "";
@@ -105,6 +115,7 @@ export function renderTable(columns, data) {
         input.type = "text";
         input.placeholder = "Filtrar...";
         input.className = "w-full px-2 py-1 text-xs font-normal border rounded focus:outline-none focus:border-blue-500 text-gray-600";
+        input.dataset.column = colName;
         
         input.addEventListener("keyup", filterTableLogic);
 
@@ -123,137 +134,156 @@ export function renderTable(columns, data) {
     // ---------------------------------------------------------
     // B. CRIAÇÃO DO CORPO (Dados)
     // ---------------------------------------------------------
-    data.forEach((row, index) => {
-        const tr = document.createElement("tr");
-        tr.className = "border-b hover:bg-gray-50 transition duration-150";
-
-        // --- Lógica de Status (Copiada do seu código anterior) ---
-        const lat = row["Geo_Latitude"];
-        const isFound = lat && lat !== "Não encontrado";
-        const isPartial = row["Partial_Match"] === true;
-        const isCond = row["Status_Log"] === "CONDOMINIO_DETECTED";
-        const statusLog = row["Status_Log"];
-
-        let statusBadge = "";
-        let needsFix = false;
-
-        if (!isFound && !isCond) {
-            let tooltipText = "Endereço Incorreto ou não encontrado."; 
-            statusBadge = `
-            <div class="group relative inline-flex flex-col items-center cursor-help">
-                <span class="bg-red-100 text-red-800 text-xs font-bold px-2 py-0.5 rounded border border-red-200">
-                    Erro
-                </span>
-                
-                <div class="invisible opacity-0 group-hover:visible group-hover:opacity-100 transition-all duration-200 ease-in-out absolute bottom-full mb-2 w-48 p-2 bg-gray-800 text-white text-xs text-center rounded shadow-lg z-50 pointer-events-none transform group-hover:-translate-y-1">
-                    ${tooltipText}
-                    <div class="absolute top-full left-1/2 transform -translate-x-1/2 border-4 border-transparent border-t-gray-800"></div>
-                </div>
-            </div>`;
-            
-            needsFix = true;
-
-        } else if (isPartial) {
-            let tooltipText = "Atenção necessária no endereço."; 
-
-            if (statusLog === "BAIRRO_MISMATCH") {
-                tooltipText = "Endereço encontrado parcialmente: Bairro divergente.";
-            } else if (statusLog === "CONDOMINIO_DETECTED") {
-                tooltipText = "Endereço identificado como condomínio.";
-            } else if (statusLog === "STREET_FOUND_NO_QUADRA") {
-                tooltipText = "Apenas a rua foi encontrada.";
-            }else if (statusLog === "NEIGHBOR_LOTE_") {
-                tooltipText = "Encontrado lote vizinho.";
-            } else if (statusLog) {
-                tooltipText = `Divergência: ${statusLog}`;
-            }
+    data.forEach((row, index) => tbody.appendChild(createRow(row, index, columns)));
 
-            statusBadge = `
-            <div class="group relative inline-flex flex-col items-center cursor-help">
-                <span class="bg-yellow-100 text-yellow-800 text-xs font-bold px-2 py-0.5 rounded border border-yellow-200">
-                    Parcial
-                </span>
-                
-                <div class="invisible opacity-0 group-hover:visible group-hover:opacity-100 transition-all duration-200 ease-in-out absolute bottom-full mb-2 w-48 p-2 bg-gray-800 text-white text-xs text-center rounded shadow-lg z-50 pointer-events-none transform group-hover:-translate-y-1">
-                    ${tooltipText}
-                    <div class="absolute top-full left-1/2 transform -translate-x-1/2 border-4 border-transparent border-t-gray-800"></div>
-                </div>
-            </div>`;
-            
-            needsFix = true;
-
-        } else if (isCond) {
-            let tooltipText = "Endereço Identificado como Condimínio."; 
-
-            statusBadge = `
-            <div class="group relative inline-flex flex-col items-center cursor-help">
-                <span class="bg-purple-100 text-purple-800 text-xs font-bold px-2 py-0.5 rounded border border-purple-200">
-                    Condomínio
-                </span>
-                
-                <div class="invisible opacity-0 group-hover:visible group-hover:opacity-100 transition-all duration-200 ease-in-out absolute bottom-full mb-2 w-48 p-2 bg-gray-800 text-white text-xs text-center rounded shadow-lg z-50 pointer-events-none transform group-hover:-translate-y-1">
-                    ${tooltipText}
-                    <div class="absolute top-full left-1/2 transform -translate-x-1/2 border-4 border-transparent border-t-gray-800"></div>
-                </div>
-            </div>`;
-            
-            needsFix = true;
+    restoreFilters(previousFilters);
+}
 
-        } else {
-            statusBadge = `<span class="bg-green-100 text-green-800 text-xs font-bold px-2 py-0.5 rounded border border-green-200">OK</span>`;
-        }
-        if (row["Status_Log"] === "MANUAL_FIX") {
-            statusBadge = `<span class="bg-blue-100 text-blue-800 text-xs font-bold px-2 py-0.5 rounded border border-blue-200">Manual</span>`;
-            needsFix = false; 
-        }
-        // --- Coluna 1: Ação (Botão Mapa) ---
-        const tdAction = document.createElement("td");
-        tdAction.className = "px-4 py-3 text-center border-r";
+// Acrescenta linhas ao fim da tabela já renderizada (durante o stream), sem
+// refazer cabeçalho nem linhas existentes: os filtros digitados continuam valendo
+export function appendTableRows(rows, startIndex) {
+    const tbody = document.getElementById("tableBody");
+    const newRows = rows.map((row, offset) => createRow(row, startIndex + offset, tableColumns));
+    const fragment = document.createDocumentFragment();
+    newRows.forEach(tr => fragment.appendChild(tr));
+    tbody.appendChild(fragment);
+
+    const filters = currentFilters();
+    if (filters.some(Boolean)) newRows.forEach(tr => applyFilters(tr, filters));
+}
+
+function createRow(row, index, columns) {
+    const tr = document.createElement("tr");
+    tr.className = "border-b hover:bg-gray-50 transition duration-150";
+
+    // --- Lógica de Status (Copiada do seu código anterior) ---
+    const lat = row["Geo_Latitude"];
+    const isFound = lat && lat !== "Não encontrado";
+    const isPartial = row["Partial_Match"] === true;
+    const isCond = row["Status_Log"] === "CONDOMINIO_DETECTED";
+    const statusLog = row["Status_Log"];
+
+    let statusBadge = "";
+    let needsFix = false;
+
+    if (!isFound && !isCond) {
+        let tooltipText = "Endereço Incorreto ou não encontrado."; 
+        statusBadge = `
+        <div class="group relative inline-flex flex-col items-center cursor-help">
+            <span class="bg-red-100 text-red-800 text-xs font-bold px-2 py-0.5 rounded border border-red-200">
+                Erro
+            </span>
+            
+            <div class="invisible opacity-0 group-hover:visible group-hover:opacity-100 transition-all duration-200 ease-in-out absolute bottom-full mb-2 w-48 p-2 bg-gray-800 text-white text-xs text-center rounded shadow-lg z-50 pointer-events-none transform group-hover:-translate-y-1">
+                ${tooltipText}
+                <div class="absolute top-full left-1/2 transform -translate-x-1/2 border-4 border-transparent border-t-gray-800"></div>
+            </div>
+        </div>`;
         
-        if (needsFix) {
-            tdAction.innerHTML = `
-                <div class="flex justify-center items-center gap-2">
-                <button onclick="window.deleteRow(${index})" 
-                    class="bg-red-50 hover:bg-red-600 hover:text-white text-red-600 rounded-full w-8 h-8 flex items-center justify-center transition shadow-sm border border-red-200" 
-                    title="Excluir Linha">
-                    <svg xmlns="http://www.w3.org/2000/svg" class="h-4 w-4" fill="none" viewBox="0 0 24 24" stroke="currentColor">
-                        <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16" />
-                    </svg>
-                </button>
-
-                <button onclick="window.openEditor(${index})" 
-                    class="bg-blue-50 hover:bg-blue-600 hover:text-white text-blue-600 rounded-full w-8 h-8 flex items-center justify-center transition shadow-sm border border-blue-200" 
-                    title="Corrigir no Mapa">
-                    ➤
-                </button>`;
-        } else {
-            tdAction.innerHTML = `<span class="text-green-500 font-bold text-xl">✓</span>`;
+        needsFix = true;
+
+    } else if (isPartial) {
+        let tooltipText = "Atenção necessária no endereço."; 
+
+        if (statusLog === "BAIRRO_MISMATCH") {
+            tooltipText = "Endereço encontrado parcialmente: Bairro divergente.";
+        } else if (statusLog === "CONDOMINIO_DETECTED") {
+            tooltipText = "Endereço identificado como condomínio.";
+        } else if (statusLog === "STREET_FOUND_NO_QUADRA") {
+            tooltipText = "Apenas a rua foi encontrada.";
+        }else if (statusLog === "NEIGHBOR_LOTE_") {
+            tooltipText = "Encontrado lote vizinho.";
+        } else if (statusLog === "NEIGHBOR_INTERPOLATED") {
+            tooltipText = "Posição estimada entre lotes vizinhos da mesma quadra.";
+        } else if (statusLog) {
+            tooltipText = `Divergência: ${statusLog}`;
         }
-        tr.appendChild(tdAction);
 
-        // --- Coluna 2: Status ---
-        const tdStatus = document.createElement("td");
-        tdStatus.className = "px-4 py-3 text-center border-r overflow-visible";
-        tdStatus.innerHTML = statusBadge;
+        statusBadge = `
+        <div class="group relative inline-flex flex-col items-center cursor-help">
+            <span class="bg-yellow-100 text-yellow-800 text-xs font-bold px-2 py-0.5 rounded border border-yellow-200">
+                Parcial
+            </span>
+            
+            <div class="invisible opacity-0 group-hover:visible group-hover:opacity-100 transition-all duration-200 ease-in-out absolute bottom-full mb-2 w-48 p-2 bg-gray-800 text-white text-xs text-center rounded shadow-lg z-50 pointer-events-none transform group-hover:-translate-y-1">
+                ${tooltipText}
+                <div class="absolute top-full left-1/2 transform -translate-x-1/2 border-4 border-transparent border-t-gray-800"></div>
+            </div>
+        </div>`;
         
-        tdStatus.setAttribute("data-search", row["Status_Log"] || (isFound ? "OK" : "Erro")); 
-        tr.appendChild(tdStatus);
+        needsFix = true;
 
-        // --- Colunas 3...N: Dados Originais do Excel ---
-        columns.forEach(col => {
-            const td = document.createElement("td");
-            td.className = "px-4 py-3 text-sm text-gray-700 border-r whitespace-nowrap max-w-xs overflow-hidden text-ellipsis";
-            
-            let value = row[col];
-            if (value === null || value === undefined) value = "";
+    } else if (isCond) {
+        let tooltipText = "Endereço Identificado como Condimínio."; 
+
+        statusBadge = `
+        <div class="group relative inline-flex flex-col items-center cursor-help">
+            <span class="bg-purple-100 text-purple-800 text-xs font-bold px-2 py-0.5 rounded border border-purple-200">
+                Condomínio
+            </span>
             
-            td.textContent = value;
-            td.title = value;
-            tr.appendChild(td);
-        });
+            <div class="invisible opacity-0 group-hover:visible group-hover:opacity-100 transition-all duration-200 ease-in-out absolute bottom-full mb-2 w-48 p-2 bg-gray-800 text-white text-xs text-center rounded shadow-lg z-50 pointer-events-none transform group-hover:-translate-y-1">
+                ${tooltipText}
+                <div class="absolute top-full left-1/2 transform -translate-x-1/2 border-4 border-transparent border-t-gray-800"></div>
+            </div>
+        </div>`;
+        
+        needsFix = true;
 
-        tbody.appendChild(tr);
+    } else {
+        statusBadge = `<span class="bg-green-100 text-green-800 text-xs font-bold px-2 py-0.5 rounded border border-green-200">OK</span>`;
+    }
+    if (row["Status_Log"] === "MANUAL_FIX") {
+        statusBadge = `<span class="bg-blue-100 text-blue-800 text-xs font-bold px-2 py-0.5 rounded border border-blue-200">Manual</span>`;
+        needsFix = false; 
+    }
+    // --- Coluna 1: Ação (Botão Mapa) ---
+    const tdAction = document.createElement("td");
+    tdAction.className = "px-4 py-3 text-center border-r";
+    
+    if (needsFix) {
+        tdAction.innerHTML = `
+            <div class="flex justify-center items-center gap-2">
+            <button onclick="window.deleteRow(${index})" 
+                class="bg-red-50 hover:bg-red-600 hover:text-white text-red-600 rounded-full w-8 h-8 flex items-center justify-center transition shadow-sm border border-red-200" 
+                title="Excluir Linha">
+                <svg xmlns="http://www.w3.org/2000/svg" class="h-4 w-4" fill="none" viewBox="0 0 24 24" stroke="currentColor">
+                    <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16" />
+                </svg>
+            </button>
+
+            <button onclick="window.openEditor(${index})" 
+                class="bg-blue-50 hover:bg-blue-600 hover:text-white text-blue-600 rounded-full w-8 h-8 flex items-center justify-center transition shadow-sm border border-blue-200" 
+                title="Corrigir no Mapa">
+                ➤
+            </button>`;
+    } else {
+        tdAction.innerHTML = `<span class="text-green-500 font-bold text-xl">✓</span>`;
+    }
+    tr.appendChild(tdAction);
+
+    // --- Coluna 2: Status ---
+    const tdStatus = document.createElement("td");
+    tdStatus.className = "px-4 py-3 text-center border-r overflow-visible";
+    tdStatus.innerHTML = statusBadge;
+    
+    tdStatus.setAttribute("data-search", row["Status_Log"] || (isFound ? "OK" : "Erro")); 
+    tr.appendChild(tdStatus);
+
+    // --- Colunas 3...N: Dados Originais do Excel ---
+    columns.forEach(col => {
+        const td = document.createElement("td");
+        td.className = "px-4 py-3 text-sm text-gray-700 border-r whitespace-nowrap max-w-xs overflow-hidden text-ellipsis";
+        
+        let value = row[col];
+        if (value === null || value === undefined) value = "";
+        
+        td.textContent = value;
+        td.title = value;
+        tr.appendChild(td);
     });
+
+    return tr;
 }
 
 // =========================
@@ -264,28 +294,47 @@ function filterTableLogic() {
     const tbody = table.querySelector("tbody");
     const trs = tbody.getElementsByTagName("tr");
     
-    const inputs = table.querySelector("thead").getElementsByTagName("input");
-    
-    const filters = Array.from(inputs).map(i => i.value.toUpperCase().trim());
+    const filters = currentFilters();
 
     for (let row of trs) {
-        let show = true;
-        const tds = row.getElementsByTagName("td");
+        applyFilters(row, filters);
+    }
+}
+
+function currentFilters() {
+    const inputs = document.getElementById("dataTable").querySelector("thead").getElementsByTagName("input");
+    return Array.from(inputs).map(i => i.value.toUpperCase().trim());
+}
+
+function applyFilters(row, filters) {
+    let show = true;
+    const tds = row.getElementsByTagName("td");
+
+    for (let i = 0; i < filters.length; i++) {
+        if (!filters[i]) continue;
+    
+        if (!tds[i]) continue;
 
-        for (let i = 0; i < filters.length; i++) {
-            if (!filters[i]) continue;
+        const cellText = tds[i].innerText || tds[i].getAttribute("data-search") || "";
         
-            if (!tds[i]) continue;
+        if (!cellText.toUpperCase().includes(filters[i])) {
+            show = false;
+            break; 
+        }
+    }
+    row.style.display = show ? "" : "none";
+}
 
-            const cellText = tds[i].innerText || tds[i].getAttribute("data-search") || "";
-            
-            if (!cellText.toUpperCase().includes(filters[i])) {
-                show = false;
-                break; 
-            }
+function restoreFilters(values) {
+    const inputs = document.getElementById("dataTable").querySelector("thead").getElementsByTagName("input");
+    let restored = false;
+    for (const input of inputs) {
+        if (values[input.dataset.column]) {
+            input.value = values[input.dataset.column];
+            restored = true;
         }
-        row.style.display = show ? "" : "none";
     }
+    if (restored) filterTableLogic();
 }
 
 // =========================
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from app.services.cache import CacheDisco, CacheGeocode
+
+
+def test_disco_limpa_vencidos_e_excesso():
+    disco = CacheDisco(":memory:", max_linhas=3)
+    agora = time.time()
+    disco.salvar_lote(
+        [{"chave": "VENCIDA", "items": [], "status": "NOT_FOUND", "expira_em": agora - 1}]
+        + [{"chave": f"RUA {i}", "items": [{"id": i}], "status": "OK", "expira_em": agora + 100 + i} for i in range(4)]
+    )
+    assert disco.obter("VENCIDA") is None
+
+    assert disco.limpar() == 2
+    assert len(disco) == 3
+    # Sai primeiro quem vence primeiro
+    assert disco.obter("RUA 0") is None
+    assert disco.obter("RUA 3")[0] == ([{"id": 3}], "OK")
+
+
+def test_disco_conta_linhas_sem_recontar_a_tabela(tmp_path):
+    caminho = str(tmp_path / "geocode.db")
+    agora = time.time()
+    disco = CacheDisco(caminho, max_linhas=3)
+    disco.salvar_lote([{"chave": f"RUA {i}", "items": [], "status": "OK", "expira_em": agora + 100} for i in range(2)])
+    # Chave regravada não conta de novo
+    disco.salvar_lote([{"chave": "RUA 1", "items": [], "status": "OK", "expira_em": agora + 200}])
+    assert len(disco) == 2
+
+    disco.salvar_lote([
+        {"chave": f"RUA {i}", "items": [], "status": "OK", "expira_em": agora + 100 + i} for i in range(2, 5)
+    ])
+    assert disco.limpar() == 2
+    assert len(disco) == 3
+
+    # Outro worker gravou no mesmo arquivo: a recontagem periódica pega
+    CacheDisco(caminho).salvar_lote([{"chave": "OUTRO", "items": [], "status": "OK", "expira_em": agora + 500}])
+    disco.max_linhas = 0
+    disco._limpezas = CacheDisco.RECONTAR_A_CADA - 1
+    disco.limpar()
+    assert len(disco) == 4
+
+
+def test_gravacao_em_lote_e_leitura_do_disco(tmp_path):
+    caminho = str(tmp_path / "geocode.db")
+
+    async def gravar():
+        cache = CacheGeocode(100, 60, 60, caminho_disco=caminho, lote_disco=100, intervalo_disco=60)
+        await cache.iniciar()
+        cache.salvar("Rua 10, Goiânia", [{"id": 1}], "OK")
+        # Ainda só em memória: o lote não encheu
+        assert cache.estatisticas()["disco_pendentes"] == 1
+        await cache.parar()
+        assert cache.estatisticas()["disco_pendentes"] == 0
+
+    async def ler():
+        cache = CacheGeocode(100, 60, 60, caminho_disco=caminho)
+        assert await cache.obter("rua 10,  goiânia") == ([{"id": 1}], "OK")
+        assert cache.hits_disco == 1
+        assert not cache.contem("Rua 20, Goiânia")
+        assert cache.misses == 0
+
+    asyncio.run(gravar())
+    asyncio.run(ler())
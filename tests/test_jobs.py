@@ -0,0 +1,66 @@
+import asyncio
+from app.core.config import settings
+from app.services.jobs import GerenciadorJobs, LoteResultados, SQLiteJobStore
+
+
+def _store_com_linhas(n: int) -> tuple:
+    store = SQLiteJobStore(":memory:")
+    job_id = store.criar_job("rota.csv", [(idx, {"Destination Address": f"Rua {idx}"}) for idx in range(n)])
+    return store, job_id
+
+
+def test_salvar_resultados_conta_cada_linha_uma_vez():
+    store, job_id = _store_com_linhas(3)
+    store.salvar_resultados(job_id, [(0, {"Status_Log": "EXACT"}), (1, {"Status_Log": "FAILED"})])
+    # Linha já gravada (retomada) não conta de novo
+    store.salvar_resultados(job_id, [(1, {"Status_Log": "EXACT"}), (2, {"Status_Log": "EXACT"})])
+
+    assert store.obter_job(job_id)["concluidas"] == 3
+    assert [r["Status_Log"] for r in store.listar_resultados(job_id)] == ["EXACT", "FAILED", "EXACT"]
+
+
+def test_lote_grava_ao_encher_e_no_fim(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_WRITE_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "JOBS_WRITE_FLUSH_INTERVAL", 60)
+    store, job_id = _store_com_linhas(3)
+
+    async def cenario():
+        lote = LoteResultados(store, job_id)
+        await lote.adicionar(0, {"Status_Log": "EXACT"})
+        assert store.obter_job(job_id)["concluidas"] == 0
+        await lote.adicionar(1, {"Status_Log": "EXACT"})
+        assert store.obter_job(job_id)["concluidas"] == 2
+        await lote.adicionar(2, {"Status_Log": "EXACT"})
+        await lote.descarregar()
+        assert store.obter_job(job_id)["concluidas"] == 3
+
+    asyncio.run(cenario())
+
+
+def test_iniciar_marca_envios_interrompidos(monkeypatch):
+    store = SQLiteJobStore(":memory:")
+    ids = {status: store.criar_job("rota.csv", [], status) for status in ("ingesting", "streaming", "queued", "done")}
+    gerenciador = GerenciadorJobs(store)
+    retomados = []
+    monkeypatch.setattr(gerenciador, "enfileirar", retomados.append)
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_JOBS", 0)
+
+    asyncio.run(gerenciador.iniciar())
+
+    # Só parte da planilha chegou: nem retomados agora nem pelo /resume
+    assert store.obter_job(ids["ingesting"])["status"] == "interrupted"
+    assert store.obter_job(ids["streaming"])["status"] == "interrupted"
+    assert not gerenciador.pode_retomar(store.obter_job(ids["ingesting"]))
+    assert store.obter_job(ids["done"])["status"] == "done"
+    assert retomados == [ids["queued"]]
+
+
+def test_blocos_pendentes_pagina_so_as_linhas_sem_resultado(monkeypatch):
+    store, job_id = _store_com_linhas(5)
+    store.salvar_resultados(job_id, [(1, {"Status_Log": "EXACT"})])
+    monkeypatch.setattr(settings, "INGEST_CHUNK_ROWS", 2)
+
+    async def cenario():
+        return [[idx for idx, _ in bloco] async for bloco in GerenciadorJobs(store).blocos_pendentes(job_id)]
+
+    assert asyncio.run(cenario()) == [[0, 2], [3, 4]]
@@ -0,0 +1,41 @@
+"""
+Paridade com a normalização original (linha a linha, antes do
+normalizar_dataframe). fixtures/normalizer_baseline.json tem pares
+[endereço, bairro, esperado] gerados com o normalizar_endereco daquela
+versão, incluindo nulos (null / {"nan": true}) e valores que não são texto.
+Não regenere a fixture com o código atual: ela é a referência.
+"""
+import json
+import os
+import pandas as pd
+import pytest
+from app.services.normalizer import normalizar_endereco, normalizar_dataframe
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "normalizer_baseline.json")
+
+
+def _decodificar(valor):
+    return float("nan") if valor == {"nan": True} else valor
+
+
+with open(FIXTURE, encoding="utf-8") as arquivo:
+    CASOS = [(_decodificar(raw), _decodificar(bairro), esperado) for raw, bairro, esperado in json.load(arquivo)]
+
+
+@pytest.mark.parametrize("raw, bairro, esperado", CASOS, ids=[repr(c[:2]) for c in CASOS])
+def test_normalizar_endereco_igual_a_versao_original(raw, bairro, esperado):
+    assert normalizar_endereco(raw, bairro) == esperado
+
+
+def test_normalizar_dataframe_igual_a_versao_original():
+    df = pd.DataFrame({
+        "Destination Address": pd.Series([raw for raw, _, _ in CASOS], dtype=object),
+        "Bairro": pd.Series([bairro for _, bairro, _ in CASOS], dtype=object)
+    })
+    obtidos = normalizar_dataframe(df)["endereco_normalizado"].tolist()
+    divergencias = [
+        (raw, bairro, esperado, obtido)
+        for (raw, bairro, esperado), obtido in zip(CASOS, obtidos)
+        if obtido != esperado
+    ]
+    assert not divergencias, f"{len(divergencias)} divergências, ex.: {divergencias[:5]}"
@@ -0,0 +1,48 @@
+import random
+from app.services.planejador import EstatisticasEstrategias, Planejador
+
+GRUPO = ("GOIANIA", "SETOR OESTE", "QL_NUM")
+ESTRATEGIAS = [{"q": "a", "type": "NORMALIZED"}, {"q": "b", "type": "EXPLICIT_QL"}, {"q": "c", "type": "STREET_ONLY"}]
+
+
+def _planejador(exploracao: float = 0.0) -> Planejador:
+    estatisticas = EstatisticasEstrategias()
+    for tipo, sucessos in (("NORMALIZED", 2), ("EXPLICIT_QL", 18), ("STREET_ONLY", 0)):
+        for i in range(20):
+            estatisticas.registrar(GRUPO, tipo, i < sucessos, 0.1)
+    return Planejador(estatisticas, "on", 10, 0.15, exploracao, random.Random(1))
+
+
+def test_planejar_ordena_pela_taxa_e_adia_as_que_nao_acertam():
+    planejador = _planejador()
+    plano, reserva = planejador.planejar(ESTRATEGIAS, GRUPO)
+    assert [s["type"] for s in plano] == ["EXPLICIT_QL"]
+    assert [s["type"] for s in reserva] == ["NORMALIZED", "STREET_ONLY"]
+    assert (planejador.planejadas, planejador.reordenadas, planejador.adiadas) == (1, 1, 2)
+
+
+def test_prever_devolve_o_plano_sem_efeitos_colaterais():
+    planejador = _planejador(exploracao=1.0)
+    assert [s["type"] for s in planejador.prever(ESTRATEGIAS, GRUPO)] == ["EXPLICIT_QL"]
+    assert (planejador.planejadas, planejador.reordenadas, planejador.adiadas) == (0, 0, 0)
+    # Grupo sem amostras: ordem fixa inteira
+    assert planejador.prever(ESTRATEGIAS, ("GOIANIA", "CENTRO", "RUA_NOME")) == ESTRATEGIAS
+
+
+def test_estatisticas_so_leem_o_arquivo_no_carregar(tmp_path):
+    caminho = str(tmp_path / "planner.db")
+    anteriores = EstatisticasEstrategias(caminho)
+    anteriores.registrar(GRUPO, "NORMALIZED", True, 0.1)
+    anteriores.gravar()
+
+    estatisticas = EstatisticasEstrategias(caminho)
+    assert estatisticas.obter(GRUPO, "NORMALIZED") is None
+    # Registrado antes da carga: somado ao que vem do arquivo e gravado só uma vez
+    estatisticas.registrar(GRUPO, "NORMALIZED", False, 0.1)
+    estatisticas.carregar()
+    assert estatisticas.obter(GRUPO, "NORMALIZED")[:2] == (2, 1)
+    estatisticas.gravar()
+
+    relida = EstatisticasEstrategias(caminho)
+    relida.carregar()
+    assert relida.obter(GRUPO, "NORMALIZED")[:2] == (2, 1)
@@ -0,0 +1,72 @@
+import asyncio
+from app.core.config import settings
+from app.services import geocoder
+from app.services.cache import CacheGeocode
+from app.services.parser import analisar_endereco
+from app.services.processor import _buscar_estrategias_em_paralelo, resultado_cacheavel
+from app.services.rate_limiter import LimitadorHERE
+
+
+class _Resposta429:
+    status = 429
+    headers = {"Retry-After": "5"}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *erro):
+        return False
+
+
+class _SessaoSobrecarregada:
+    def __init__(self):
+        self.chamadas = 0
+
+    def get(self, url):
+        self.chamadas += 1
+        return _Resposta429()
+
+
+def test_hedged_cancelado_no_backoff_devolve_as_vagas(monkeypatch):
+    limitador = LimitadorHERE(qps=0, burst=1, concorrencia_min=1, concorrencia_max=3,
+                              backoff_base=0.01, backoff_max=0.01)
+    sessao = _SessaoSobrecarregada()
+    monkeypatch.setattr(geocoder, "limitador_here", limitador)
+    monkeypatch.setattr(geocoder, "cache_geocode", CacheGeocode(100, 60, 60))
+    monkeypatch.setattr(geocoder, "obter_sessao_http", lambda: sessao)
+    monkeypatch.setattr(settings, "HERE_API_KEY", "teste")
+    monkeypatch.setattr(settings, "HEDGE_STAGGER_MS", 20)
+
+    alvo = analisar_endereco("Rua 10 Qd 5 Lt 3", "RUA 10 QD 5 LT 3", "Setor Oeste", "Goiânia")
+    estrategias = [
+        {"q": "Rua 10, QD 5 LT 3, Goiânia", "type": "NORMALIZED"},
+        {"q": "Rua 10, QD 5 LT 3, Setor Oeste, Goiânia", "type": "EXPLICIT_QL"},
+        {"q": "Rua 10, Setor Oeste, Goiânia", "type": "STREET_ONLY"},
+    ]
+
+    async def cenario():
+        busca = asyncio.create_task(_buscar_estrategias_em_paralelo(estrategias, alvo))
+        await asyncio.sleep(0.15)
+        # A primeira levou 429 e está no backoff; o limite caiu para 1: uma segura a
+        # vaga na pausa do Retry-After e a outra espera na fila
+        assert sessao.chamadas == 1
+        assert limitador.concorrencia.em_uso == 1
+        assert len(limitador.concorrencia._fila) == 1
+
+        busca.cancel()
+        await asyncio.gather(busca, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert limitador.concorrencia.em_uso == 0
+        assert not limitador.concorrencia._fila
+        assert not geocoder.singleflight_here._em_voo
+
+    asyncio.run(cenario())
+
+
+def test_so_resultados_definitivos_vao_para_o_cache_de_linhas():
+    for status in ("EXACT", "EXACT_MATCH_API", "MATCH_QUADRA_OK", "CONDOMINIO_DETECTED"):
+        assert resultado_cacheavel(status), status
+    for status in ("MATCH_RUA_ONLY", "MATCH_QUADRA_OK_BAIRRO_MISMATCH", "MATCH_RUA_ONLY_BAIRRO_MISMATCH",
+                   "FUZZY_DB_MATCH (93.5)", "NEIGHBOR_INTERPOLATED", "FAILED", "FAILED_NO_QD_LT_TARGET",
+                   "ERRO_PROCESSAMENTO"):
+        assert not resultado_cacheavel(status), status
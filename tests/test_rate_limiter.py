@@ -0,0 +1,49 @@
+import asyncio
+from app.services.rate_limiter import ConcorrenciaAdaptativa, LimitadorHERE
+
+
+def _limitador(concorrencia: int) -> LimitadorHERE:
+    return LimitadorHERE(qps=0, burst=1, concorrencia_min=1, concorrencia_max=concorrencia,
+                         backoff_base=0.01, backoff_max=0.01)
+
+
+def test_cancelar_na_pausa_devolve_a_vaga():
+    async def cenario():
+        limitador = _limitador(2)
+        limitador.concorrencia.pausar(10)
+        tarefas = [asyncio.create_task(limitador.adquirir()) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        # Duas na pausa do Retry-After (com a vaga), duas na fila
+        assert limitador.concorrencia.em_uso == 2
+        assert len(limitador.concorrencia._fila) == 2
+
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        assert limitador.concorrencia.em_uso == 0
+        assert not limitador.concorrencia._fila
+
+        limitador.concorrencia._pausa_ate = 0.0
+        await asyncio.wait_for(limitador.adquirir(), timeout=1)
+        await asyncio.wait_for(limitador.adquirir(), timeout=1)
+        assert limitador.concorrencia.em_uso == 2
+
+    asyncio.run(cenario())
+
+
+def test_cancelar_na_pausa_acorda_quem_espera():
+    async def cenario():
+        concorrencia = ConcorrenciaAdaptativa(1, 1)
+        concorrencia.pausar(0.2)
+        na_pausa = asyncio.create_task(concorrencia.adquirir())
+        await asyncio.sleep(0.02)
+        na_fila = asyncio.create_task(concorrencia.adquirir())
+        await asyncio.sleep(0.02)
+
+        na_pausa.cancel()
+        await asyncio.gather(na_pausa, return_exceptions=True)
+        # A da fila herda a vaga e termina depois da pausa, sem deadlock
+        await asyncio.wait_for(na_fila, timeout=1)
+        assert concorrencia.em_uso == 1
+
+    asyncio.run(cenario())
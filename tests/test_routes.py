@@ -0,0 +1,68 @@
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import routes
+from app.services.jobs import SQLiteJobStore, gerenciador_jobs
+
+PLANILHA = "Destination Address,Bairro,City\nRua 10 Qd 5 Lt 3,Setor Oeste,Goiânia\nRua 20,Centro,Goiânia\n"
+
+
+def _cliente(monkeypatch, tmp_path) -> TestClient:
+    monkeypatch.setattr(gerenciador_jobs, "store", SQLiteJobStore(str(tmp_path / "jobs.db")))
+    app = FastAPI()
+    app.include_router(routes.router)
+    return TestClient(app)
+
+
+def _eventos(resposta) -> list:
+    return [json.loads(linha) for linha in resposta.text.splitlines() if linha.strip()]
+
+
+def test_stream_com_erro_no_meio_manda_evento_error(monkeypatch, tmp_path):
+    async def falha_na_segunda_linha(blocos):
+        async for bloco in blocos:
+            idx, linha = bloco[0]
+            yield idx, linha, {"Status_Log": "EXACT"}
+            raise RuntimeError("banco fora do ar")
+
+    monkeypatch.setattr(routes, "processar_blocos_em_ordem_de_conclusao", falha_na_segunda_linha)
+    cliente = _cliente(monkeypatch, tmp_path)
+
+    resposta = cliente.post("/upload/stream", files={"file": ("rota.csv", PLANILHA, "text/csv")})
+    eventos = _eventos(resposta)
+
+    assert [e["type"] for e in eventos] == ["start", "row", "error"]
+    assert "banco fora do ar" in eventos[-1]["detail"]
+    # A falha veio antes do fim da planilha: o job não pode ser retomado
+    job = gerenciador_jobs.store.obter_job(eventos[0]["job_id"])
+    assert job["status"] == "interrupted"
+    assert "banco fora do ar" in job["erro"]
+
+
+def test_resume_so_aceita_jobs_parados(monkeypatch, tmp_path):
+    cliente = _cliente(monkeypatch, tmp_path)
+    store = gerenciador_jobs.store
+    enfileirados = []
+    monkeypatch.setattr(gerenciador_jobs, "enfileirar", enfileirados.append)
+
+    for status, esperado in [("queued", 200), ("failed", 200), ("running", 200),
+                             ("done", 409), ("ingesting", 409), ("streaming", 409),
+                             ("interrupted", 409)]:
+        job_id = store.criar_job("rota.csv", [], status)
+        assert cliente.post(f"/jobs/{job_id}/resume").status_code == esperado, status
+
+    # Rodando neste processo: já está com um worker
+    job_id = store.criar_job("rota.csv", [], "running")
+    monkeypatch.setattr(gerenciador_jobs, "_enfileirados", {job_id})
+    assert cliente.post(f"/jobs/{job_id}/resume").status_code == 409
+    assert len(enfileirados) == 3
+
+
+def test_export_recusa_job_interrompido(monkeypatch, tmp_path):
+    cliente = _cliente(monkeypatch, tmp_path)
+    job_id = gerenciador_jobs.store.criar_job("rota.csv", [], "interrupted")
+
+    resposta = cliente.get(f"/jobs/{job_id}/export?formato=csv")
+
+    assert resposta.status_code == 409
+    assert "interrompido" in resposta.json()["detail"]